@@ -28,6 +28,11 @@ st.markdown("""
 3.  Haz clic en el botón **"Procesar y Generar Reportes"**.
 4.  **Espera** a que la herramienta valide y segmente los datos.
 5.  **Descarga el archivo .zip** con todos los reportes individuales.
+    Si el servidor tiene configurada una carpeta raíz (`SEGMENTADOR_DESTINO`), también puedes elegir
+    **"Escribir en carpeta compartida"** para dejar cada reporte directamente dentro de esa raíz,
+    en `tipo de reporte / zona / agencia` junto con un `manifiesto.json` (tamaños y checksums).
+6.  Para revisar que Corte 2 cuadre con Corte 1, usa `Cruce Cortes` (o la sección **"Cruce con Corte 1"**
+    de las páginas de Corte 2): lista las agencias que faltan en un corte y las diferencias de ALTAS y montos.
 """)
 
 st.markdown("---")
@@ -0,0 +1,2 @@
+# herramientas/__init__.py
+"""Herramientas de desarrollo: datos sintéticos, presupuestos de memoria, benchmarks."""
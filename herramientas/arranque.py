@@ -0,0 +1,76 @@
+# herramientas/arranque.py
+"""
+Mide el arranque en frío y la latencia de rerun de cada página de Streamlit.
+
+Cada página se ejecuta con streamlit.testing (AppTest) en un intérprete nuevo:
+- primera: primera ejecución del script en el proceso (incluye importaciones).
+- rerun: promedio de las ejecuciones siguientes (lo que paga cada interacción).
+
+Uso:
+    python -m herramientas.arranque [--reruns 10]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Todas las páginas de pages/, en el orden del menú de Streamlit, para que ninguna nueva quede sin medir
+PAGINAS = ['Inicio.py'] + sorted(os.path.relpath(ruta, RAIZ).replace(os.sep, '/')
+                                 for ruta in glob.glob(os.path.join(RAIZ, 'pages', '*.py')))
+MARCA_RESULTADO = '@@ARRANQUE@@'
+
+
+def medir_pagina(pagina, reruns):
+    """Corre la página en ESTE proceso; devuelve segundos de la primera ejecución y del rerun promedio."""
+    from streamlit.testing.v1 import AppTest
+
+    inicio = time.perf_counter()
+    app = AppTest.from_file(os.path.join(RAIZ, pagina), default_timeout=120)
+    app.run()
+    primera = time.perf_counter() - inicio
+    tiempos = []
+    for _ in range(reruns):
+        inicio = time.perf_counter()
+        app.run()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        'pagina': pagina,
+        'primera_s': round(primera, 3),
+        'rerun_ms': round(1000 * sum(tiempos) / max(len(tiempos), 1), 1),
+        'pandas_importado': 'pandas' in sys.modules,
+        'errores': [str(e.value) for e in app.exception],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranque y latencia de rerun por página.")
+    parser.add_argument('--reruns', type=int, default=10)
+    parser.add_argument('--hijo', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(MARCA_RESULTADO + json.dumps(medir_pagina(args.hijo, args.reruns)))
+        return 0
+
+    print(f"{'página':<40} {'primera (s)':>12} {'rerun (ms)':>11}  pandas")
+    for pagina in PAGINAS:
+        proceso = subprocess.run(
+            [sys.executable, '-m', 'herramientas.arranque', '--hijo', pagina, '--reruns', str(args.reruns)],
+            cwd=RAIZ, capture_output=True, text=True,
+        )
+        linea = next((l for l in proceso.stdout.splitlines() if l.startswith(MARCA_RESULTADO)), None)
+        if linea is None:
+            print(f"{pagina:<40} falló:\n{proceso.stderr[-1000:]}")
+            continue
+        r = json.loads(linea[len(MARCA_RESULTADO):])
+        print(f"{pagina:<40} {r['primera_s']:>12.3f} {r['rerun_ms']:>11.1f}  {'sí' if r['pandas_importado'] else 'no'}"
+              + (f"  ERROR: {r['errores']}" if r['errores'] else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+# herramientas/carga.py
+"""
+Prueba de carga: N sesiones concurrentes de las cuatro páginas, en un solo proceso.
+
+Cada sesión es un hilo que hace, con un libro sintético (herramientas/sinteticos.py),
+lo mismo que la página cuando el usuario sube el archivo y pulsa "Procesar": recibe
+un UploadedFile de Streamlit, lee las zonas (Provincia Corte 1) y llama a
+ui.ejecutar_con_cache con el proceso de cargar_proceso, los mismos argumentos y la
+misma zona. Como en el servidor de Streamlit, todas las sesiones comparten el
+intérprete y sus cachés (procesos importados, BASE leída, almacén de resultados), así
+que lo medido incluye la contención. No se usa streamlit.testing (AppTest): cada
+ejecución reemplaza el Runtime y la caché de scripts globales, y no admite
+ejecuciones superpuestas en hilos.
+
+Se informa, por página y en total:
+- p50/p95 del tiempo hasta el resultado (de la subida al zip con su log);
+- agencias por segundo: agencias generadas por todas las sesiones / tiempo de pared;
+- RSS pico del servidor: el proceso más sus procesos de lectura (muestreado).
+
+Cada sesión sube un libro distinto (otra semilla), así nadie reutiliza el resultado
+de otro; con --mismo-archivo todas las sesiones de una página suben el mismo, para
+ver la caché compartida bajo concurrencia. Las sesiones se reparten entre las
+páginas elegidas en orden y arrancan juntas (o cada --escalonado segundos).
+
+Uso:
+    python -m herramientas.carga --sesiones 10 --filas 20000 --agencias 100
+    python -m herramientas.carga --sesiones 4 --perfil lima_corte_1 --perfil lima_corte_2 --mismo-archivo
+    python -m herramientas.carga --sesiones 8 --json carga.json
+
+Devuelve código 1 si alguna sesión no llegó al resultado.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from segmentador.base_salida import FORMATO_XLSX, formatos_disponibles
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# perfil -> (página, tipo de reporte, módulo, función del proceso, zona): lo que usa la página al procesar
+PAGINAS = {
+    'lima_corte_1': ('1_Reportes_Lima', "Lima Corte 1", 'lima_corte_1', 'procesar_archivos_excel', None),
+    'provincia_corte_1': ('2_Reportes_Provincia', "Provincia Corte 1", 'provincia_corte_1',
+                          'procesar_reportes_provincia', 'NORTE'),
+    'lima_corte_2': ('3_Reportes_Lima_Corte_2', "Lima Corte 2", 'lima_corte_2', 'procesar_reporte_corte_2', None),
+    'provincia_corte_2': ('4_Reportes_Provincia_Corte_2', "Provincia Corte 2", 'provincia_corte_2',
+                          'procesar_provincia_corte_2', 'NORTE'),
+}
+ZONA_LIMA = "LIMA"
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+MARCA_RESULTADO = '@@CARGA@@'
+MB = 1024 * 1024
+
+
+# --- RSS del servidor ---
+
+def _rss_proceso_mb(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / MB
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _hijos(pid):
+    hijos = []
+    for ruta in glob.glob(f"/proc/{pid}/task/*/children"):
+        try:
+            with open(ruta) as f:
+                hijos.extend(int(p) for p in f.read().split())
+        except OSError:
+            pass
+    return hijos
+
+
+class MuestreoRss:
+    """Hilo que suma el RSS del proceso y de sus hijos (trabajadores de lectura) y guarda el pico."""
+
+    def __init__(self, intervalo=0.1):
+        self.intervalo = intervalo
+        self.pico_mb = 0.0
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        pid = os.getpid()
+        while True:
+            total = _rss_proceso_mb(pid) + sum(_rss_proceso_mb(h) for h in _hijos(pid))
+            self.pico_mb = max(self.pico_mb, total)
+            if self._parar.wait(self.intervalo):
+                return
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+        # Sin /proc (macOS) queda al menos el pico del propio proceso
+        propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (MB if sys.platform == 'darwin' else 1024)
+        self.pico_mb = max(self.pico_mb, propio)
+
+
+# --- Sesiones ---
+
+def subida(ruta, numero):
+    """El UploadedFile que recibe la página (un file_id por sesión, como cada subida real)."""
+    from streamlit.proto.Common_pb2 import FileURLs
+    from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    return UploadedFile(UploadedFileRec(f"carga-{numero}", os.path.basename(ruta), TIPO_XLSX, contenido), FileURLs())
+
+
+def procesar_como_pagina(perfil, archivo, formato_base):
+    """Lo que hace la página al pulsar "Procesar": (id del zip, bitácora, reutilizado)."""
+    from segmentador.ui import cargar_proceso, ejecutar_con_cache
+
+    _, tipo_reporte, modulo, funcion, zona = PAGINAS[perfil]
+    if perfil == 'provincia_corte_1':
+        # La página lee antes las zonas del archivo para armar el selector
+        zonas = cargar_proceso(modulo).leer_zonas(archivo)
+        if zona not in zonas:
+            raise RuntimeError(f"El archivo no tiene la zona {zona}")
+    argumentos = (zona,) if zona else ()
+    return ejecutar_con_cache(
+        archivo, None, tipo_reporte, zona or ZONA_LIMA, {"formato_base": formato_base},
+        lambda salida: getattr(cargar_proceso(modulo), funcion)(archivo, *argumentos, salida, formato_base))
+
+
+def correr_sesion(numero, perfil, ruta, formato_base, barrera, retraso):
+    """Una sesión de punta a punta; devuelve su registro (segundos hasta el resultado, agencias, error)."""
+    registro = {'sesion': numero, 'perfil': perfil, 'archivo': os.path.basename(ruta),
+                'segundos': None, 'agencias': 0, 'reutilizado': False, 'error': None}
+    try:
+        import segmentador.ui  # noqa: F401 (la página ya está cargada cuando el usuario sube el archivo)
+        archivo = subida(ruta, numero)
+    except OSError as e:
+        archivo = None
+        registro['error'] = f"{type(e).__name__}: {e}"
+    barrera.wait()  # todas las sesiones con su archivo: arrancan juntas
+    if archivo is None:
+        return registro
+    time.sleep(retraso)
+
+    inicio = time.perf_counter()
+    try:
+        resultado, bitacora, reutilizado = procesar_como_pagina(perfil, archivo, formato_base)
+    except Exception as e:
+        registro['error'] = f"{type(e).__name__}: {e}"
+        return registro
+    registro['segundos'] = round(time.perf_counter() - inicio, 3)
+    registro['reutilizado'] = reutilizado
+    if not resultado:
+        registro['error'] = "El proceso no generó resultado: " + ' | '.join(bitacora.lineas_log()[-3:])
+        return registro
+    resumen = bitacora.resumen()
+    registro['agencias'] = resumen['ok'] + resumen['descuadres']
+    return registro
+
+
+def correr_sesiones(plan, formato_base, escalonado):
+    """Corre el plan [(perfil, ruta)...] con una sesión por elemento, todas a la vez, en ESTE proceso."""
+    # Fuera de `streamlit run` las cachés avisan que no hay runtime ni ScriptRunContext: no aporta nada
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+    registros = [None] * len(plan)
+    barrera = threading.Barrier(len(plan) + 1)
+
+    def sesion(i, perfil, ruta):
+        registros[i] = correr_sesion(i, perfil, ruta, formato_base, barrera, i * escalonado)
+
+    hilos = [threading.Thread(target=sesion, args=(i, perfil, ruta), daemon=True) for i, (perfil, ruta) in enumerate(plan)]
+    rss_inicial = _rss_proceso_mb(os.getpid())
+    with MuestreoRss() as muestreo:
+        for hilo in hilos:
+            hilo.start()
+        barrera.wait()  # todas las sesiones con su archivo: empieza la medición
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.join()
+        pared = time.perf_counter() - inicio
+    return {
+        'registros': registros,
+        'pared_s': round(pared, 3),
+        'rss_inicial_mb': round(rss_inicial, 1),
+        'rss_pico_mb': round(muestreo.pico_mb, 1),
+    }
+
+
+# --- Informe ---
+
+def resumir(registros, pared):
+    """p50/p95/máximo de segundos hasta el resultado, agencias y agencias/s de esos registros."""
+    segundos = [r['segundos'] for r in registros if r['segundos'] is not None and not r['error']]
+    agencias = sum(r['agencias'] for r in registros if not r['error'])
+    p50, p95, maximo = np.percentile(segundos, [50, 95, 100]) if segundos else (float('nan'),) * 3
+    return {
+        'sesiones': len(registros),
+        'errores': sum(bool(r['error']) for r in registros),
+        'reutilizadas': sum(r['reutilizado'] for r in registros),
+        'p50_s': round(float(p50), 2),
+        'p95_s': round(float(p95), 2),
+        'max_s': round(float(maximo), 2),
+        'agencias': agencias,
+        'agencias_por_s': round(agencias / pared, 2) if pared else 0.0,
+    }
+
+
+def imprimir_informe(resultado, perfiles):
+    registros = resultado['registros']
+    pared = resultado['pared_s']
+    print(f"\n{'página':<20} {'sesiones':>8} {'p50 (s)':>8} {'p95 (s)':>8} {'máx (s)':>8} "
+          f"{'agencias':>9} {'agencias/s':>10} {'reutil.':>7} {'errores':>7}")
+    filas = [(p, [r for r in registros if r['perfil'] == p]) for p in perfiles]
+    for nombre, grupo in filas + [('TOTAL', registros)]:
+        if not grupo:
+            continue
+        r = resumir(grupo, pared)
+        print(f"{nombre:<20} {r['sesiones']:>8} {r['p50_s']:>8.2f} {r['p95_s']:>8.2f} {r['max_s']:>8.2f} "
+              f"{r['agencias']:>9} {r['agencias_por_s']:>10.2f} {r['reutilizadas']:>7} {r['errores']:>7}")
+    print(f"\nTiempo de pared: {pared:.2f} s | RSS inicial {resultado['rss_inicial_mb']:.0f} MB | "
+          f"RSS pico del servidor {resultado['rss_pico_mb']:.0f} MB")
+    for r in registros:
+        if r['error']:
+            print(f"  ✗ sesión {r['sesion']} ({r['perfil']}, {r['archivo']}): {r['error'][:300]}")
+
+
+def armar_plan(perfiles, sesiones, filas, agencias, mismo_archivo):
+    """[(perfil, ruta del libro)] por sesión; genera los libros que falten."""
+    from herramientas.sinteticos import ruta_en_cache
+
+    plan = []
+    for i in range(sesiones):
+        perfil = perfiles[i % len(perfiles)]
+        semilla = 7 if mismo_archivo else 7 + i // len(perfiles)
+        plan.append((perfil, ruta_en_cache(perfil, filas, agencias, semilla=semilla)))
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sesiones concurrentes de las páginas de Streamlit.")
+    parser.add_argument('--sesiones', type=int, default=4)
+    parser.add_argument('--perfil', choices=list(PAGINAS), action='append',
+                        help="Páginas a usar (se repite; por defecto las cuatro)")
+    parser.add_argument('--filas', type=int, default=20_000)
+    parser.add_argument('--agencias', type=int, default=100)
+    parser.add_argument('--mismo-archivo', action='store_true',
+                        help="Todas las sesiones de una página suben el mismo libro")
+    parser.add_argument('--escalonado', type=float, default=0.0, help="Segundos entre el arranque de cada sesión")
+    parser.add_argument('--formato', choices=formatos_disponibles(), default=FORMATO_XLSX, help="Formato de la BASE")
+    parser.add_argument('--json', help="Escribe también el resultado completo en este archivo")
+    parser.add_argument('--hijo', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        with open(args.hijo, encoding='utf-8') as f:
+            plan = [tuple(p) for p in json.load(f)]
+        print(MARCA_RESULTADO + json.dumps(correr_sesiones(plan, args.formato, args.escalonado)))
+        return 0
+
+    perfiles = args.perfil or list(PAGINAS)
+    plan = armar_plan(perfiles, args.sesiones, args.filas, args.agencias, args.mismo_archivo)
+    print(f"{args.sesiones} sesiones | {args.filas} filas | {args.agencias} agencias | BASE en {args.formato} | "
+          f"{'mismo archivo' if args.mismo_archivo else 'un archivo por sesión'}")
+
+    # Servidor limpio: intérprete nuevo (sin cachés ni el RSS de generar los libros)
+    # y almacén de resultados propio, que se borra al terminar
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_plan = os.path.join(carpeta, 'plan.json')
+        with open(ruta_plan, 'w', encoding='utf-8') as f:
+            json.dump(plan, f)
+        entorno = dict(os.environ, SEGMENTADOR_RESULTADOS=os.path.join(carpeta, 'resultados'))
+        comando = [sys.executable, '-m', 'herramientas.carga', '--hijo', ruta_plan,
+                   '--formato', args.formato, '--escalonado', str(args.escalonado)]
+        proceso = subprocess.run(comando, cwd=RAIZ, capture_output=True, text=True, env=entorno)
+    linea = next((l for l in proceso.stdout.splitlines() if l.startswith(MARCA_RESULTADO)), None)
+    if linea is None:
+        print(f"La prueba de carga falló:\n{proceso.stderr[-2000:]}")
+        return 1
+    resultado = json.loads(linea[len(MARCA_RESULTADO):])
+
+    imprimir_informe(resultado, perfiles)
+    if args.json:
+        resultado['resumen'] = resumir(resultado['registros'], resultado['pared_s'])
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    return 1 if any(r['error'] for r in resultado['registros']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+# herramientas/lector_xlsx.py
+"""
+Paridad y tiempos del lector por streaming (segmentador.xlsx_rapido) frente a
+pd.read_excel con openpyxl.
+
+Uso:
+    python -m herramientas.lector_xlsx                         # paridad con libros de prueba
+    python -m herramientas.lector_xlsx --paridad libro.xlsx    # paridad con libros propios
+    python -m herramientas.lector_xlsx --benchmark --filas 200000 --repeticiones 1
+
+La paridad lee cada hoja con las mismas combinaciones de argumentos que usan los
+procesos (cabecera simple y de dos filas, dtype=str, usecols, nrows, header=None)
+y compara los DataFrames con pd.testing.assert_frame_equal. Además de los
+perfiles sintéticos incluye un libro con los casos raros: fechas y horas, época
+1904, booleanos, errores, cadenas en línea con formato, filas y celdas ausentes y
+fórmulas con su resultado guardado. Sale con código 1 si algo difiere.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date, datetime, time as hora, timedelta
+
+import pandas as pd
+
+from herramientas.sinteticos import PERFILES, generar, ruta_en_cache
+from segmentador.xlsx_rapido import leer_excel
+
+# Combinaciones de argumentos a comparar en cada hoja
+LECTURAS = [
+    {},
+    {'header': None},
+    {'header': None, 'nrows': 1},
+    {'header': None, 'nrows': 2},
+    {'header': 0, 'nrows': 0},
+    {'header': 1, 'nrows': 0},
+    {'dtype': str},
+    {'header': [0, 1]},
+]
+LECTURAS_POR_HOJA = {
+    'BASE': [{'usecols': ['ZONA']}, {'usecols': ['ASESOR', 'COD_PEDIDO']}, {'usecols': ['NO_EXISTE']}],
+}
+
+
+def libro_casos_raros(ruta, epoca_1904=False):
+    """Libro pequeño con los tipos de celda y estructuras que más difieren entre lectores."""
+    from openpyxl import Workbook
+    from openpyxl.cell.rich_text import CellRichText, TextBlock
+    from openpyxl.cell.text import InlineFont
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904
+
+    wb = Workbook()
+    if epoca_1904:
+        wb.epoch = CALENDAR_MAC_1904
+    hoja = wb.active
+    hoja.title = 'TIPOS'
+    hoja.append(['TEXTO', 'ENTERO', 'DECIMAL', 'FECHA', 'FECHA_HORA', 'HORA', 'DURACION', 'BOOL', 'RICO', 'VACIA'])
+    hoja.append(['uno', 1, 1.5, date(2024, 1, 31), datetime(2024, 2, 29, 13, 45, 10), hora(8, 30), timedelta(hours=30), True,
+                 CellRichText('negrita ', TextBlock(InlineFont(b=True), 'y normal')), None])
+    hoja.append(['', 0, -0.25, date(1904, 1, 2), datetime(2030, 12, 31), hora(0, 0, 1), timedelta(0), False, 'plano', None])
+    hoja.append([None, 10 ** 12, 1e-9, None, None, None, None, None, None, None])
+    hoja['A7'] = 'fila 7 tras dos filas ausentes'
+    hoja['F7'] = 3.0
+    hoja['L9'] = 'celda lejana'
+    hoja['B10'] = 'x005F_escapado'
+    hoja['C10'] = '  espacios  '
+    hoja['D10'] = 45000
+    hoja['D10'].number_format = 'yyyy-mm-dd'
+    hoja['E10'] = 45000.5
+    hoja['E10'].number_format = '[h]:mm:ss'
+
+    ralas = wb.create_sheet('RALAS')
+    ralas['C3'] = 'cabecera'
+    ralas['E3'] = 'otra'
+    ralas['C5'] = 1
+    ralas['E8'] = 'fin'
+
+    wb.create_sheet('VACIA')
+    wb.save(ruta)
+
+
+def libro_formulas(ruta):
+    """Fórmulas con resultado guardado (texto, número, booleano y error), escritas con xlsxwriter."""
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(ruta)
+    hoja = wb.add_worksheet('FORMULAS')
+    hoja.write_row(0, 0, ['A', 'B', 'C', 'D'])
+    hoja.write_formula(1, 0, '="te"&"xto"', None, 'texto')
+    hoja.write_formula(1, 1, '=1+1', None, 2)
+    hoja.write_formula(1, 2, '=1=1', None, True)
+    hoja.write_formula(1, 3, '=1/0', None, '#DIV/0!')
+    hoja.write_formula(2, 0, '=""', None, '')
+    hoja.write_formula(2, 1, '=0.1+0.2', None, 0.30000000000000004)
+    hoja.write_string(2, 3, 'sin fórmula')
+    wb.close()
+
+
+def _comparar(datos, hoja, argumentos):
+    """None si ambos lectores coinciden (en resultado o en el tipo de error); si no, el motivo."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            esperado = pd.read_excel(io.BytesIO(datos), sheet_name=hoja, engine='openpyxl', **argumentos)
+        except Exception as e:
+            esperado = e
+        try:
+            obtenido = leer_excel(io.BytesIO(datos), sheet_name=hoja, **argumentos)
+        except Exception as e:
+            obtenido = e
+    if isinstance(esperado, Exception) or isinstance(obtenido, Exception):
+        if type(esperado) is type(obtenido) and str(esperado) == str(obtenido):
+            return None
+        return f"openpyxl: {esperado!r} | streaming: {obtenido!r}"
+    try:
+        pd.testing.assert_frame_equal(obtenido, esperado)
+    except AssertionError as e:
+        return str(e).splitlines()[0] if str(e) else 'DataFrames distintos'
+    return None
+
+
+def paridad(rutas):
+    """Compara todas las hojas de cada libro con todas las lecturas; devuelve la cantidad de diferencias."""
+    diferencias = 0
+    for ruta in rutas:
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        hojas = pd.ExcelFile(io.BytesIO(datos), engine='openpyxl').sheet_names
+        casos = 0
+        for hoja in hojas + ['NO_EXISTE']:
+            for argumentos in LECTURAS + LECTURAS_POR_HOJA.get(hoja, []):
+                casos += 1
+                motivo = _comparar(datos, hoja, argumentos)
+                if motivo:
+                    diferencias += 1
+                    print(f"  DIFERENCIA {os.path.basename(ruta)} | {hoja} | {argumentos} -> {motivo}")
+        print(f"{os.path.basename(ruta):<28} {len(hojas)} hojas, {casos} lecturas comparadas")
+    return diferencias
+
+
+def _mejor_tiempo(funcion, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor
+
+
+def benchmark(filas, agencias, repeticiones):
+    """Tiempo de lectura de BASE y del reporte en cada perfil sintético, con ambos lectores."""
+    print(f"{'perfil':<20} {'hoja':<16} {'openpyxl':>10} {'streaming':>10} {'veces':>7}")
+    for perfil in PERFILES:
+        ruta = ruta_en_cache(perfil, filas, agencias)
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        hoja_reporte, cabecera = ('Reporte CORTE 2', [0, 1]) if perfil.endswith('corte_2') else (0, 0)
+        for hoja, argumentos in ((hoja_reporte, {'header': cabecera}), ('BASE', {})):
+            t_openpyxl = _mejor_tiempo(
+                lambda: pd.read_excel(io.BytesIO(datos), sheet_name=hoja, engine='openpyxl', **argumentos), repeticiones)
+            t_rapido = _mejor_tiempo(lambda: leer_excel(io.BytesIO(datos), sheet_name=hoja, **argumentos), repeticiones)
+            nombre = hoja if isinstance(hoja, str) else 'reporte'
+            print(f"{perfil:<20} {nombre:<16} {t_openpyxl:>9.2f}s {t_rapido:>9.2f}s {t_openpyxl / t_rapido:>6.1f}x")
+        t_openpyxl = _mejor_tiempo(
+            lambda: pd.read_excel(io.BytesIO(datos), sheet_name='BASE', usecols=['ZONA'], engine='openpyxl'), repeticiones)
+        t_rapido = _mejor_tiempo(lambda: leer_excel(io.BytesIO(datos), sheet_name='BASE', usecols=['ZONA']), repeticiones)
+        print(f"{perfil:<20} {'BASE[ZONA]':<16} {t_openpyxl:>9.2f}s {t_rapido:>9.2f}s {t_openpyxl / t_rapido:>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridad y tiempos del lector .xlsx por streaming.")
+    parser.add_argument('--paridad', nargs='*', metavar='XLSX',
+                        help="libros a comparar (por defecto: perfiles sintéticos y libros de casos raros)")
+    parser.add_argument('--benchmark', action='store_true', help="medir tiempos con los perfiles sintéticos")
+    parser.add_argument('--filas', type=int, default=200_000)
+    parser.add_argument('--agencias', type=int, default=300)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.filas, args.agencias, args.repeticiones)
+        return
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        rutas = args.paridad
+        if not rutas:
+            rutas = []
+            for perfil in PERFILES:
+                ruta = os.path.join(carpeta, f'{perfil}.xlsx')
+                generar(perfil, ruta, filas=2_000, agencias=20, descuadres=2)
+                rutas.append(ruta)
+            for nombre, crear in (('casos_raros.xlsx', libro_casos_raros),
+                                  ('casos_raros_1904.xlsx', lambda r: libro_casos_raros(r, epoca_1904=True)),
+                                  ('formulas.xlsx', libro_formulas)):
+                ruta = os.path.join(carpeta, nombre)
+                crear(ruta)
+                rutas.append(ruta)
+        diferencias = paridad(rutas)
+    print("Sin diferencias." if not diferencias else f"{diferencias} diferencias.")
+    if diferencias:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
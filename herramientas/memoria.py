@@ -0,0 +1,280 @@
+# herramientas/memoria.py
+"""
+Regresión de memoria: corre cada proceso sobre libros sintéticos grandes y
+falla si alguna etapa supera su presupuesto.
+
+Cada combinación (perfil, filas de BASE) corre en un subproceso limpio, que mide
+por etapa (ver segmentador/metricas.py):
+- tracemalloc_mb: pico de memoria asignada por Python dentro de la etapa.
+- rss_mb: pico de RSS del proceso dentro de la etapa, muestreado de /proc cada
+  pocos milisegundos y reiniciado al empezar cada etapa (un pico breve entre dos
+  muestras puede escaparse). Sin /proc (macOS) queda ru_maxrss, que es el pico
+  acumulado desde que arrancó el proceso: ahí solo vale como pico total.
+Los presupuestos viven en herramientas/presupuestos_memoria.json.
+
+Uso:
+    python -m herramientas.memoria                          # todo (200k y 500k filas)
+    python -m herramientas.memoria --perfil lima_corte_1 --filas 200000
+    python -m herramientas.memoria --actualizar             # reescribe presupuestos (+25%)
+    python -m herramientas.memoria --solo-rss               # sin tracemalloc (mucho más rápido)
+
+Devuelve código 1 si alguna etapa se pasa de su presupuesto.
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_PRESUPUESTOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'presupuestos_memoria.json')
+
+# perfil -> (módulo, función del proceso, argumentos extra después del archivo)
+PROCESOS = {
+    'lima_corte_1': ('segmentador.lima_corte_1', 'procesar_archivos_excel', ()),
+    'provincia_corte_1': ('segmentador.provincia_corte_1', 'procesar_reportes_provincia', ('NORTE',)),
+    'lima_corte_2': ('segmentador.lima_corte_2', 'procesar_reporte_corte_2', ()),
+    'provincia_corte_2': ('segmentador.provincia_corte_2', 'procesar_provincia_corte_2', ('NORTE',)),
+}
+FILAS_POR_DEFECTO = (200_000, 500_000)
+AGENCIAS_POR_DEFECTO = 300
+MARGEN_PRESUPUESTO = 1.25
+MARCA_RESULTADO = '@@MEMORIA@@'
+MB = 1024 * 1024
+INTERVALO_MUESTREO = 0.01
+
+
+def _rss_pico_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return pico / (MB if sys.platform == 'darwin' else 1024)
+
+
+def _rss_actual_mb():
+    """RSS de este proceso ahora mismo, o None si no hay /proc."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class PicoPorEtapa:
+    """Hilo que muestrea el RSS y guarda el pico desde el último `cerrar()`."""
+
+    def __init__(self, intervalo=INTERVALO_MUESTREO):
+        self.intervalo = intervalo
+        self.con_proc = _rss_actual_mb() is not None
+        self._pico = _rss_actual_mb() or 0.0
+        self._candado = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _anotar(self):
+        actual = _rss_actual_mb()
+        if actual is None:
+            return None
+        with self._candado:
+            self._pico = max(self._pico, actual)
+        return actual
+
+    def _muestrear(self):
+        while not self._parar.wait(self.intervalo):
+            self._anotar()
+
+    def cerrar(self):
+        """Pico de la etapa que termina; la siguiente parte del RSS actual."""
+        if not self.con_proc:
+            return _rss_pico_mb()
+        actual = self._anotar()
+        with self._candado:
+            pico, self._pico = self._pico, actual
+        return pico
+
+    def __enter__(self):
+        if self.con_proc:
+            self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        if self._hilo.is_alive():
+            self._hilo.join()
+
+
+def _cargar_proceso(perfil):
+    modulo, funcion, extra = PROCESOS[perfil]
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    return getattr(importlib.import_module(modulo), funcion), extra
+
+
+def medir(perfil, ruta_excel, con_tracemalloc=True):
+    """Corre el proceso en ESTE proceso y devuelve las mediciones por etapa."""
+    from segmentador.metricas import observar_etapas
+
+    procesar, extra = _cargar_proceso(perfil)
+    with open(ruta_excel, 'rb') as f:
+        datos = f.read()
+
+    etapas = []
+    estado = {'etapa': 'inicio', 'desde': time.perf_counter()}
+
+    def cerrar_etapa():
+        ahora = time.perf_counter()
+        medicion = {
+            'etapa': estado['etapa'],
+            'rss_mb': round(muestreo.cerrar(), 1),
+            'segundos': round(ahora - estado['desde'], 2),
+        }
+        if con_tracemalloc:
+            medicion['tracemalloc_mb'] = round(tracemalloc.get_traced_memory()[1] / MB, 1)
+            tracemalloc.reset_peak()
+        etapas.append(medicion)
+        estado['desde'] = ahora
+
+    def al_marcar(nombre):
+        cerrar_etapa()
+        estado['etapa'] = nombre
+
+    rss_inicial = _rss_actual_mb() or _rss_pico_mb()
+    if con_tracemalloc:
+        tracemalloc.start()
+    muestreo = PicoPorEtapa()
+    observar_etapas(al_marcar)
+    try:
+        with muestreo:
+            resultado, log = procesar(io.BytesIO(datos), *extra)
+            cerrar_etapa()
+    finally:
+        observar_etapas(None)
+        tracemalloc.stop()
+    return {
+        'perfil': perfil,
+        'ok': resultado is not None,
+        'rss_inicial_mb': round(rss_inicial, 1),
+        'rss_por_etapa': muestreo.con_proc,
+        'etapas': [e for e in etapas if e['etapa'] != 'inicio'],
+        'log_final': log.lineas_log()[-3:],
+    }
+
+
+def medir_en_subproceso(perfil, filas, agencias, con_tracemalloc=True):
+    """Genera (o reutiliza) el libro sintético y lo mide en un intérprete nuevo."""
+    from herramientas.sinteticos import ruta_en_cache
+
+    ruta = ruta_en_cache(perfil, filas, agencias)
+    comando = [sys.executable, '-m', 'herramientas.memoria', '--hijo', perfil, ruta]
+    if not con_tracemalloc:
+        comando.append('--solo-rss')
+    # Lectura en el mismo proceso: la memoria de los trabajadores de lectura
+    # (segmentador/lectura.py) no aparecería en el RSS medido.
+    entorno = dict(os.environ, SEGMENTADOR_LECTURA_PARALELA='0')
+    proceso = subprocess.run(
+        comando,
+        cwd=RAIZ, capture_output=True, text=True, env=entorno,
+    )
+    for linea in proceso.stdout.splitlines():
+        if linea.startswith(MARCA_RESULTADO):
+            return json.loads(linea[len(MARCA_RESULTADO):])
+    raise RuntimeError(f"El subproceso de {perfil} ({filas} filas) falló:\n{proceso.stderr[-2000:]}")
+
+
+def cargar_presupuestos():
+    if not os.path.exists(RUTA_PRESUPUESTOS):
+        return {}
+    with open(RUTA_PRESUPUESTOS, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def comparar(medicion, presupuesto):
+    """Lista de textos con cada etapa que se pasa de su presupuesto.
+
+    Sin RSS por etapa (sin /proc) el rss_mb de cada etapa es el pico acumulado:
+    entonces solo se compara el pico total con el mayor presupuesto de RSS.
+    """
+    excesos = []
+    por_etapa = medicion.get('rss_por_etapa', True)
+    for etapa in medicion['etapas']:
+        limites = presupuesto.get(etapa['etapa'])
+        if not limites:
+            continue
+        for metrica in ('rss_mb', 'tracemalloc_mb') if por_etapa else ('tracemalloc_mb',):
+            if metrica in limites and metrica in etapa and etapa[metrica] > limites[metrica]:
+                excesos.append(f"{etapa['etapa']}: {metrica} {etapa[metrica]} > {limites[metrica]}")
+    if not por_etapa:
+        limite = max((l['rss_mb'] for l in presupuesto.values() if 'rss_mb' in l), default=None)
+        pico = max((e['rss_mb'] for e in medicion['etapas']), default=0)
+        if limite is not None and pico > limite:
+            excesos.append(f"total: rss_mb {pico} > {limite}")
+    return excesos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regresión de memoria por etapa.")
+    parser.add_argument('--perfil', choices=sorted(PROCESOS), action='append')
+    parser.add_argument('--filas', type=int, action='append')
+    parser.add_argument('--agencias', type=int, default=AGENCIAS_POR_DEFECTO)
+    parser.add_argument('--actualizar', action='store_true', help="Reescribe los presupuestos con lo medido + 25%%")
+    parser.add_argument('--solo-rss', action='store_true', help="No usa tracemalloc: solo mide RSS (más rápido)")
+    parser.add_argument('--hijo', nargs=2, metavar=('PERFIL', 'RUTA'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(MARCA_RESULTADO + json.dumps(medir(*args.hijo, con_tracemalloc=not args.solo_rss)))
+        return 0
+
+    presupuestos = cargar_presupuestos()
+    fallos = 0
+    for perfil in args.perfil or sorted(PROCESOS):
+        for filas in args.filas or FILAS_POR_DEFECTO:
+            medicion = medir_en_subproceso(perfil, filas, args.agencias, not args.solo_rss)
+            clave = str(filas)
+            print(f"\n{perfil} | {filas} filas | {args.agencias} agencias")
+            for e in medicion['etapas']:
+                traza = f"tracemalloc {e['tracemalloc_mb']:>8.1f} MB | " if 'tracemalloc_mb' in e else ''
+                print(f"  {e['etapa']:<13} {traza}RSS {e['rss_mb']:>8.1f} MB | {e['segundos']:>7.2f} s")
+            if not medicion['ok']:
+                print("  ✗ el proceso no generó resultado:", *medicion['log_final'], sep='\n    ')
+                fallos += 1
+            if not medicion['rss_por_etapa']:
+                print("  ⚠ sin /proc: el RSS es el pico acumulado, solo se compara el total")
+            if args.actualizar:
+                anterior = presupuestos.setdefault(perfil, {}).get(clave, {})
+                nuevo = {}
+                for e in medicion['etapas']:
+                    # Con --solo-rss se conserva el presupuesto de tracemalloc que ya existía
+                    limites = dict(anterior.get(e['etapa'], {}))
+                    limites['rss_mb'] = round(e['rss_mb'] * MARGEN_PRESUPUESTO)
+                    if 'tracemalloc_mb' in e:
+                        limites['tracemalloc_mb'] = round(max(e['tracemalloc_mb'], 1) * MARGEN_PRESUPUESTO)
+                    nuevo[e['etapa']] = limites
+                presupuestos[perfil][clave] = nuevo
+                continue
+            presupuesto = presupuestos.get(perfil, {}).get(clave)
+            if presupuesto is None:
+                print("  ⚠ sin presupuesto registrado (usar --actualizar)")
+                continue
+            excesos = comparar(medicion, presupuesto)
+            for exceso in excesos:
+                print(f"  ✗ {exceso}")
+            fallos += bool(excesos)
+
+    if args.actualizar:
+        with open(RUTA_PRESUPUESTOS, 'w', encoding='utf-8') as f:
+            json.dump(presupuestos, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nPresupuestos actualizados en {RUTA_PRESUPUESTOS}")
+        return 0
+    print(f"\n{'✗' if fallos else '✓'} {fallos} combinación(es) fuera de presupuesto")
+    return 1 if fallos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
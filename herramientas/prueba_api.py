@@ -0,0 +1,194 @@
+# herramientas/prueba_api.py
+"""
+Prueba de punta a punta de la API HTTP local (segmentador.api), solo en localhost.
+
+Levanta el servidor en un puerto libre con un almacén temporal, envía a la vez
+los cuatro perfiles sintéticos (dos como subida y dos como ruta), un trabajo con
+carpeta destino, un archivo inválido y una petición incorrecta; espera a que
+terminen, baja los .zip y los compara con el mismo proceso corrido directamente
+(mismos archivos y mismo log). Al final reenvía un archivo para comprobar que la
+caché lo devuelve sin procesar. Sale con código 1 si algo no coincide.
+
+Uso:
+    python -m herramientas.prueba_api --filas 5000 --agencias 30 --trabajadores 2
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+
+from herramientas.sinteticos import PERFILES, ruta_en_cache
+from segmentador.api import TIPOS, ZONA_LIMA, crear_servidor
+from segmentador.base_salida import FORMATO_XLSX
+from segmentador.salida import SalidaZip
+
+ZONA_PROVINCIA = 'NORTE'
+
+
+class Cliente:
+    def __init__(self, base):
+        self.base = base
+
+    def pedir(self, metodo, ruta, cuerpo=None, tipo_contenido=None):
+        """(código HTTP, bytes de la respuesta)."""
+        peticion = urllib.request.Request(self.base + ruta, data=cuerpo, method=metodo)
+        if tipo_contenido:
+            peticion.add_header('Content-Type', tipo_contenido)
+        try:
+            with urllib.request.urlopen(peticion, timeout=600) as respuesta:
+                return respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def subir(self, ruta_xlsx, tipo, zona=None, **extra):
+        consulta = f"tipo={tipo}" + (f"&zona={zona}" if zona else "")
+        consulta += ''.join(f"&{k}={v}" for k, v in extra.items())
+        with open(ruta_xlsx, 'rb') as f:
+            return self.pedir('POST', f"/trabajos?{consulta}", f.read(), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    def por_ruta(self, ruta_xlsx, tipo, zona=None, **extra):
+        cuerpo = json.dumps({'ruta': ruta_xlsx, 'tipo': tipo, 'zona': zona, **extra}).encode('utf-8')
+        return self.pedir('POST', '/trabajos', cuerpo, 'application/json')
+
+    def esperar(self, id_trabajo, limite=1800):
+        inicio = time.time()
+        while time.time() - inicio < limite:
+            _, cuerpo = self.pedir('GET', f"/trabajos/{id_trabajo}")
+            estado = json.loads(cuerpo)
+            if estado['estado'] in ('terminado', 'error'):
+                return estado
+            time.sleep(0.2)
+        raise TimeoutError(id_trabajo)
+
+
+def _directo(tipo, ruta_xlsx, zona):
+    """Zip y log del mismo proceso corrido en este proceso, sin la API."""
+    _, funcion, pide_zona = TIPOS[tipo]
+    proceso = getattr(importlib.import_module(f"segmentador.{tipo}"), funcion)
+    with open(ruta_xlsx, 'rb') as f:
+        archivo = io.BytesIO(f.read())
+    argumentos = (archivo, zona) if pide_zona else (archivo,)
+    zip_memoria, log = proceso(*argumentos, SalidaZip(), FORMATO_XLSX)
+    return zipfile.ZipFile(zip_memoria), log.lineas_log()
+
+
+def _sin_reutilizada(texto):
+    """Log sin la línea de BASE reutilizada, que depende de qué leyó antes cada proceso (cache_base)."""
+    return [linea for linea in texto.split('\n') if "idéntica a una ya leída" not in linea]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de punta a punta de la API local.")
+    parser.add_argument('--filas', type=int, default=5_000)
+    parser.add_argument('--agencias', type=int, default=30)
+    parser.add_argument('--trabajadores', type=int, default=2)
+    args = parser.parse_args()
+
+    fallas = []
+
+    def verificar(condicion, mensaje):
+        print(("  ok    " if condicion else "  FALLA ") + mensaje)
+        if not condicion:
+            fallas.append(mensaje)
+
+    rutas = {perfil: ruta_en_cache(perfil, args.filas, args.agencias) for perfil in PERFILES}
+    with tempfile.TemporaryDirectory() as carpeta:
+        # Solo se puede escribir dentro de esta raíz (los trabajadores la heredan)
+        os.environ['SEGMENTADOR_DESTINO'] = os.path.join(carpeta, 'compartida')
+        # Y solo se leen por ruta los libros sintéticos
+        os.environ['SEGMENTADOR_ORIGEN'] = os.path.dirname(rutas['lima_corte_1'])
+        servidor = crear_servidor(puerto=0, trabajadores=args.trabajadores,
+                                  carpeta=os.path.join(carpeta, 'almacen'), registrar_peticiones=False)
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        host, puerto = servidor.server_address[:2]
+        cliente = Cliente(f"http://{host}:{puerto}")
+        try:
+            codigo, _ = cliente.pedir('GET', '/salud')
+            verificar(codigo == 200, "GET /salud")
+
+            # --- peticiones incorrectas ---
+            codigo, cuerpo = cliente.por_ruta(rutas['provincia_corte_1'], 'provincia_corte_1')
+            verificar(codigo == 400, f"Provincia sin zona -> 400 ({json.loads(cuerpo)['error']})")
+            codigo, _ = cliente.por_ruta(rutas['lima_corte_1'], 'otro_reporte')
+            verificar(codigo == 400, "tipo desconocido -> 400")
+            codigo, _ = cliente.pedir('GET', '/trabajos/no-existe')
+            verificar(codigo == 404, "trabajo inexistente -> 404")
+            codigo, _ = cliente.por_ruta(rutas['lima_corte_1'], 'lima_corte_1', destino=carpeta)
+            verificar(codigo == 400, "destino fuera de SEGMENTADOR_DESTINO -> 400")
+            codigo, _ = cliente.por_ruta(rutas['lima_corte_1'], 'lima_corte_1', destino='../almacen')
+            verificar(codigo == 400, "destino con '..' que sale de la raíz -> 400")
+            codigo, _ = cliente.por_ruta(os.path.abspath(__file__), 'lima_corte_1')
+            verificar(codigo == 400, "ruta fuera de SEGMENTADOR_ORIGEN -> 400")
+
+            # --- trabajos concurrentes ---
+            inicio = time.perf_counter()
+            enviados = {}
+            for i, perfil in enumerate(PERFILES):
+                zona = ZONA_PROVINCIA if TIPOS[perfil][2] else None
+                enviar = cliente.subir if i % 2 == 0 else cliente.por_ruta
+                codigo, cuerpo = enviar(rutas[perfil], perfil, zona)
+                verificar(codigo == 202, f"POST {perfil} ({'subida' if i % 2 == 0 else 'ruta'}) -> 202")
+                enviados[perfil] = json.loads(cuerpo)['id']
+            destino = os.path.join(carpeta, 'compartida')
+            codigo, cuerpo = cliente.por_ruta(rutas['lima_corte_2'], 'lima_corte_2', destino=destino, formato_base='csv')
+            id_destino = json.loads(cuerpo)['id']
+            codigo, cuerpo = cliente.pedir('POST', '/trabajos?tipo=lima_corte_1', b'esto no es un excel', 'application/octet-stream')
+            id_invalido = json.loads(cuerpo)['id']
+
+            estados = {perfil: cliente.esperar(id_trabajo) for perfil, id_trabajo in enviados.items()}
+            print(f"  {len(estados)} trabajos concurrentes en {time.perf_counter() - inicio:.1f}s")
+
+            for perfil, estado in estados.items():
+                verificar(estado['estado'] == 'terminado', f"{perfil}: terminado ({estado['resumen']})")
+                if estado['estado'] != 'terminado':
+                    continue
+                codigo, datos = cliente.pedir('GET', estado['archivo'])
+                zona = ZONA_PROVINCIA if TIPOS[perfil][2] else ZONA_LIMA
+                esperado, log_esperado = _directo(perfil, rutas[perfil], zona)
+                obtenido = zipfile.ZipFile(io.BytesIO(datos))
+                verificar(codigo == 200 and sorted(obtenido.namelist()) == sorted(esperado.namelist()),
+                          f"{perfil}: zip con los mismos {len(esperado.namelist())} archivos")
+                codigo, log = cliente.pedir('GET', f"/trabajos/{estado['id']}/log")
+                verificar(_sin_reutilizada(log.decode('utf-8')) == _sin_reutilizada('\n'.join(log_esperado)),
+                          f"{perfil}: mismo log")
+                codigo, registros = cliente.pedir('GET', f"/trabajos/{estado['id']}/registros")
+                verificar(len(json.loads(registros)) == estado['resumen']['agencias'], f"{perfil}: registros por agencia")
+
+            estado = cliente.esperar(id_destino)
+            manifiesto = estado.get('resultado') or ''
+            verificar(estado['estado'] == 'terminado' and os.path.isfile(manifiesto) and manifiesto.startswith(destino),
+                      "lima_corte_2 con destino: manifiesto en la carpeta compartida")
+            codigo, _ = cliente.pedir('GET', f"/trabajos/{id_destino}/archivo")
+            verificar(codigo == 409, "con destino no hay .zip para bajar -> 409")
+
+            estado = cliente.esperar(id_invalido)
+            verificar(estado['estado'] == 'error', f"archivo inválido -> error ({estado['error']})")
+            codigo, log = cliente.pedir('GET', f"/trabajos/{id_invalido}/log")
+            verificar(codigo == 200 and log, "archivo inválido: log disponible")
+
+            # --- caché compartida ---
+            codigo, cuerpo = cliente.subir(rutas['provincia_corte_2'], 'provincia_corte_2', ZONA_PROVINCIA)
+            estado = cliente.esperar(json.loads(cuerpo)['id'])
+            verificar(estado['reutilizado'] and estado['resultado'] == estados['provincia_corte_2']['resultado'],
+                      f"reenvío del mismo archivo: reutilizado en {estado['segundos']}s")
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+            servidor.cola.cerrar()
+
+    print("Todo coincide." if not fallas else f"{len(fallas)} fallas.")
+    if fallas:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# herramientas/sinteticos.py
+"""
+Genera libros consolidados sintéticos con la misma estructura que los reales.
+
+Uso:
+    python -m herramientas.sinteticos lima_corte_1 salida.xlsx --filas 200000 --agencias 300
+
+Perfiles: lima_corte_1, provincia_corte_1, lima_corte_2, provincia_corte_2.
+Las ALTAS de cada agencia coinciden con sus filas en BASE, salvo que se pida
+`--descuadres N` (las primeras N agencias quedan con una ALTA de más).
+"""
+import argparse
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+
+import xlsxwriter
+
+PERFILES = ('lima_corte_1', 'provincia_corte_1', 'lima_corte_2', 'provincia_corte_2')
+
+DEPARTAMENTOS = {
+    'PIURA': 'NORTE', 'LA LIBERTAD': 'NORTE', 'LAMBAYEQUE': 'NORTE', 'ANCASH': 'NORTE',
+    'AREQUIPA': 'SUR', 'CUSCO': 'SUR', 'JUNIN': 'SUR',
+}
+
+CABECERAS_CORTE_1 = [
+    'RUC', 'AGENCIA', 'META', 'GRUPO', 'ALTAS', 'ARPU SIN IGV', 'CORTE 1', 'CUMPLIMIENTO ALTAS %',
+    'MARCHA BLANCA', 'MULTIPLICADOR', 'BONO 1 ARPU', 'MULTIPLICADOR FINAL', 'TOTAL A PAGAR',
+]
+# (nivel 1, nivel 2) de 'Reporte CORTE 2'
+CABECERAS_CORTE_2 = [
+    ('', 'RUC'), ('', 'AGENCIA'), ('', 'META'), ('', 'GRUPO'), ('', 'ALTAS'), ('', 'CUMPLIMIENTO ALTAS %'),
+    ('PENALIDAD 1', 'CHURN 4.5%'), ('', 'UMBRAL'), ('', 'ALTAS PENALIZADAS'), ('', 'PENALIDAD 1'),
+    ('CLAWBACK 1', 'UMBRAL 1'), ('', 'CUMPLIMIENTO CORTE 2 %'), ('', 'MULTIPLICADOR CORTE 2'), ('', 'CLAWBACK 1'),
+    ('TOTAL A PAGAR CORTE 2', 'TOTAL A PAGAR CORTE 2'),
+]
+CABECERAS_BASE = [
+    'COD_PEDIDO', 'ASESOR', 'ZONA', 'DEPARTAMENTO', 'FECHA_ALTA', 'PLAN', 'CARGO_FIJO',
+    'DNI_CLIENTE', 'RECIBO1_PAGADO', 'OBSERVACION',
+]
+
+
+def _nombre_agencia(i):
+    sufijos = ['S.A.C.', 'E.I.R.L.', 'S.R.L.', 'SAC']
+    return f"AGENCIA {i:03d} {sufijos[i % len(sufijos)]}"
+
+
+def generar(perfil, ruta, filas=200_000, agencias=300, descuadres=0, semilla=7):
+    """Escribe en `ruta` un libro del perfil indicado y devuelve la ruta."""
+    if perfil not in PERFILES:
+        raise ValueError(f"Perfil desconocido: {perfil}")
+    rnd = random.Random(semilla)
+    provincia = perfil.startswith('provincia')
+    corte_2 = perfil.endswith('corte_2')
+    departamentos = list(DEPARTAMENTOS)
+
+    nombres = [_nombre_agencia(i) for i in range(agencias)]
+    depto_agencia = [departamentos[i % len(departamentos)] for i in range(agencias)]
+    asignacion = [rnd.randrange(agencias) for _ in range(filas)]
+    conteo = [0] * agencias
+    for a in asignacion:
+        conteo[a] += 1
+
+    wb = xlsxwriter.Workbook(ruta, {'constant_memory': True})
+    fmt_fecha = wb.add_format({'num_format': 'yyyy-mm-dd'})
+
+    # --- Hoja de reporte ---
+    if corte_2:
+        ws = wb.add_worksheet('Reporte CORTE 2')
+        ws.write_row(0, 0, [n1 for n1, _ in CABECERAS_CORTE_2])
+        ws.write_row(1, 0, [n2 for _, n2 in CABECERAS_CORTE_2])
+        fila_inicio = 2
+    else:
+        ws = wb.add_worksheet('Reporte CORTE 1')
+        ws.write_row(0, 0, CABECERAS_CORTE_1)
+        fila_inicio = 1
+    for i in range(agencias):
+        nombre = f"{nombres[i]} {depto_agencia[i]}" if provincia else nombres[i]
+        altas = conteo[i] + (1 if i < descuadres else 0)
+        if corte_2:
+            valores = [20100000000 + i, nombre, 100, 'A', altas, 0.85,
+                       0.045, 3, 1, -50.0, 0.9, 0.8, 1.0, -20.0, 900.0 + i]
+        else:
+            valores = [20100000000 + i, nombre, 100, 'A', altas, 50.5, 1000.0, 0.85,
+                       'NO', 1.2, 10.0, 1.1, 1234.5 + i]
+        ws.write_row(fila_inicio + i, 0, valores)
+
+    # --- Hoja BASE ---
+    ws = wb.add_worksheet('BASE')
+    ws.write_row(0, 0, CABECERAS_BASE)
+    inicio = date(2026, 1, 1)
+    planes = ['FIBRA 200', 'FIBRA 400', 'FIBRA 1000']
+    for r, a in enumerate(asignacion, start=1):
+        depto = depto_agencia[a]
+        ws.write_string(r, 0, f"P{r:08d}")
+        ws.write_string(r, 1, nombres[a])
+        ws.write_string(r, 2, DEPARTAMENTOS[depto])
+        ws.write_string(r, 3, depto)
+        ws.write_datetime(r, 4, inicio + timedelta(days=r % 28), fmt_fecha)
+        ws.write_string(r, 5, planes[r % 3])
+        ws.write_number(r, 6, 79.9 + (r % 5) * 10)
+        ws.write_string(r, 7, f"{40000000 + r}")
+        ws.write_string(r, 8, 'SI' if r % 4 else 'NO')
+        ws.write_string(r, 9, '' if r % 10 else 'REVISAR')
+    wb.close()
+    return ruta
+
+
+def ruta_en_cache(perfil, filas, agencias, descuadres=0, semilla=7):
+    """Genera (o reutiliza) el libro en el directorio temporal y devuelve su ruta."""
+    carpeta = os.path.join(tempfile.gettempdir(), 'segmentador_sinteticos')
+    os.makedirs(carpeta, exist_ok=True)
+    sufijo = '' if semilla == 7 else f"_s{semilla}"
+    ruta = os.path.join(carpeta, f"{perfil}_{filas}_{agencias}_{descuadres}{sufijo}.xlsx")
+    if not os.path.exists(ruta):
+        ruta_tmp = ruta + '.tmp.xlsx'
+        generar(perfil, ruta_tmp, filas, agencias, descuadres, semilla)
+        os.replace(ruta_tmp, ruta)
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un consolidado sintético.")
+    parser.add_argument('perfil', choices=PERFILES)
+    parser.add_argument('ruta')
+    parser.add_argument('--filas', type=int, default=200_000)
+    parser.add_argument('--agencias', type=int, default=300)
+    parser.add_argument('--descuadres', type=int, default=0)
+    args = parser.parse_args()
+    generar(args.perfil, args.ruta, args.filas, args.agencias, args.descuadres)
+    print(args.ruta)
+
+
+if __name__ == '__main__':
+    main()
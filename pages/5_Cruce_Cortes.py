@@ -0,0 +1,23 @@
+# pages/5_Cruce_Cortes.py
+# La lógica del cruce vive en segmentador/cruce_cortes.py y se carga al cruzar.
+import streamlit as st
+
+from segmentador.ui import cruce_de_cortes
+
+# --- Interfaz de Usuario para el cruce entre Corte 1 y Corte 2 ---
+st.title("Cruce de Resultados - Corte 1 y Corte 2")
+st.markdown("Sube los consolidados de **CORTE 1** y **CORTE 2** del mismo periodo para cruzarlos por RUC "
+            "(o por nombre de agencia cuando falta el RUC).")
+st.info("💡 Se comparan las hojas 'Reporte CORTE 1' y 'Reporte CORTE 2': agencias que faltan en un corte, "
+        "diferencias de ALTAS y PENALIDAD 1 / CLAWBACK 1 frente a lo pagado en Corte 1.")
+
+tipo = st.radio("Tipo de consolidado:", options=["lima", "provincia"], format_func=str.capitalize, horizontal=True)
+
+col1, col2 = st.columns(2)
+with col1:
+    archivo_corte_1 = st.file_uploader("Sube el consolidado de CORTE 1", type=["xlsx"], key="cruce_corte_1_uploader")
+with col2:
+    archivo_corte_2 = st.file_uploader("Sube el consolidado de CORTE 2", type=["xlsx"], key="cruce_corte_2_uploader")
+
+if archivo_corte_1 is not None and archivo_corte_2 is not None:
+    cruce_de_cortes(f"cruce_{tipo}", archivo_corte_1, archivo_corte_2, tipo)
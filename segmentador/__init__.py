@@ -0,0 +1,2 @@
+# segmentador/__init__.py
+"""Lógica compartida por las páginas del segmentador de reportes."""
@@ -0,0 +1,88 @@
+# segmentador/alias.py
+"""
+Mapas de alias: qué nombres de ASESOR en la BASE corresponden a una misma agencia.
+Los nombres están NORMALIZADOS con la función de cada tipo de reporte.
+
+A los mapas fijos de este archivo se suman los alias aceptados desde las
+sugerencias de la página (segmentador/sugerencias_alias.py), guardados en un
+JSON aparte ({"lima": {agencia: [asesores]}, "provincia": {...}}). Los procesos
+toman el mapa combinado con `mapeo_alias(tipo)`.
+
+El JSON es estado del servidor, no del código: va en SEGMENTADOR_ALIAS o, por
+defecto, en la carpeta 'segmentador_estado' junto al almacén de resultados
+(segmentador/almacen.py). Esa carpeta por defecto cae en el directorio temporal;
+en un servidor conviene fijar SEGMENTADOR_ALIAS en una ruta que se respalde.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from segmentador.almacen import CARPETA_POR_DEFECTO
+from segmentador.normalizacion import normalizar_nombre, normalizar_nombre_agencia
+
+# Lima (normalizar_nombre_agencia: mayúsculas y sin espacios extremos)
+MAPEO_AGENCIAS_ALIAS_LIMA = {
+    normalizar_nombre_agencia("EXPORTEL S.A.C."): [
+        normalizar_nombre_agencia("EXPORTEL S.A.C."),
+        normalizar_nombre_agencia("EXPORTEL PROVINCIA")
+    ]
+}
+
+# Provincia (normalizar_nombre: además sin puntos, comas ni guiones)
+MAPEO_ASESOR_ALIAS_PROVINCIA = {
+    normalizar_nombre('EXPORTEL SAC'): [normalizar_nombre('EXPORTEL SAC'), normalizar_nombre('EXPORTEL PROVINCIA')]
+    # Si tienes otros casos, los puedes añadir aquí. Ejemplo:
+    # 'OTRA AGENCIA': ['OTRA AGENCIA', 'OTRA AGENCIA SOPORTE']
+}
+
+# --- Alias aceptados desde las sugerencias ---
+ALIAS_LIMA = 'lima'
+ALIAS_PROVINCIA = 'provincia'
+_MAPEOS_FIJOS = {ALIAS_LIMA: MAPEO_AGENCIAS_ALIAS_LIMA, ALIAS_PROVINCIA: MAPEO_ASESOR_ALIAS_PROVINCIA}
+
+RUTA_ALIAS_ACEPTADOS = os.environ.get(
+    'SEGMENTADOR_ALIAS',
+    os.path.join(os.path.dirname(os.path.abspath(CARPETA_POR_DEFECTO)), 'segmentador_estado', 'alias_aceptados.json')
+)
+_candado = threading.Lock()
+
+
+def alias_aceptados(ruta=None):
+    """Contenido del JSON de alias aceptados ({} si todavía no existe)."""
+    try:
+        with open(ruta or RUTA_ALIAS_ACEPTADOS, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def version_alias(ruta=None):
+    """Hash de los alias aceptados: cambia la clave de la caché de resultados cuando se agrega uno."""
+    return hashlib.sha256(json.dumps(alias_aceptados(ruta), sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def mapeo_alias(tipo, ruta=None):
+    """Mapa fijo del tipo ('lima' o 'provincia') más los alias aceptados, sin repetir nombres."""
+    mapeo = {agencia: list(asesores) for agencia, asesores in _MAPEOS_FIJOS[tipo].items()}
+    for agencia, asesores in alias_aceptados(ruta).get(tipo, {}).items():
+        nombres = mapeo.setdefault(agencia, [agencia])
+        nombres.extend(a for a in asesores if a not in nombres)
+    return mapeo
+
+
+def aceptar_alias(tipo, agencia, asesores, ruta=None):
+    """Agrega asesores (normalizados) como alias de `agencia` y guarda el JSON de forma atómica."""
+    ruta = ruta or RUTA_ALIAS_ACEPTADOS
+    with _candado:
+        aceptados = alias_aceptados(ruta)
+        nombres = aceptados.setdefault(tipo, {}).setdefault(agencia, [])
+        nombres.extend(a for a in asesores if a not in nombres)
+        carpeta = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(carpeta, exist_ok=True)
+        fd, ruta_tmp = tempfile.mkstemp(dir=carpeta, prefix='.alias.', suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(aceptados, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(ruta_tmp, ruta)
+    return aceptados
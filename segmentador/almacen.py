@@ -0,0 +1,206 @@
+# segmentador/almacen.py
+"""
+Almacén en disco de los archivos .zip terminados.
+
+En lugar de guardar el zip en la memoria de la sesión de Streamlit, cada proceso
+lo escribe en una carpeta administrada y la página solo conserva su id. El
+archivo se lee del disco recién cuando el usuario hace clic en descargar.
+
+Limpieza:
+- por tiempo: se borra lo que no se usó en `ttl_segundos` (sesiones abandonadas);
+- por tamaño: si el total supera `max_bytes` se borra lo menos usado primero.
+Un hilo de fondo (`iniciar_limpieza_periodica`) aplica ambas reglas cada pocos minutos.
+"""
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+
+from segmentador.salida import SalidaZip
+
+CARPETA_POR_DEFECTO = os.environ.get(
+    'SEGMENTADOR_RESULTADOS', os.path.join(tempfile.gettempdir(), 'segmentador_resultados')
+)
+TTL_POR_DEFECTO = int(os.environ.get('SEGMENTADOR_RESULTADOS_TTL', 6 * 3600))
+MAX_BYTES_POR_DEFECTO = int(os.environ.get('SEGMENTADOR_RESULTADOS_MAX_MB', 2048)) * 1024 * 1024
+INTERVALO_LIMPIEZA = 300
+
+_EXT_DATOS = '.zip'
+_EXT_META = '.json'
+
+
+class AlmacenResultados:
+    """Carpeta de resultados con expiración por tiempo y por tamaño."""
+
+    def __init__(self, carpeta=CARPETA_POR_DEFECTO, ttl_segundos=TTL_POR_DEFECTO, max_bytes=MAX_BYTES_POR_DEFECTO):
+        self.carpeta = carpeta
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(carpeta, exist_ok=True)
+
+    # --- rutas ---
+    def _ruta_datos(self, id_resultado):
+        return os.path.join(self.carpeta, id_resultado + _EXT_DATOS)
+
+    def _ruta_meta(self, id_resultado):
+        return os.path.join(self.carpeta, id_resultado + _EXT_META)
+
+    @staticmethod
+    def nuevo_id():
+        return secrets.token_hex(16)
+
+    def ruta_temporal(self, id_resultado):
+        """
+        Ruta única donde escribir el zip antes de publicarlo con `publicar`.
+        Lleva un sufijo aleatorio: dos sesiones pueden generar el mismo id a la vez.
+        """
+        return os.path.join(self.carpeta, f".{id_resultado}.{secrets.token_hex(4)}.tmp")
+
+    # --- escritura / lectura ---
+    def publicar(self, id_resultado, ruta_temporal, metadatos=None):
+        """Mueve el zip terminado al almacén y guarda sus metadatos (json)."""
+        meta = dict(metadatos or {})
+        meta['creado'] = time.time()
+        meta['bytes'] = os.path.getsize(ruta_temporal)
+        ruta_meta_tmp = ruta_temporal + _EXT_META
+        with open(ruta_meta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(ruta_temporal, self._ruta_datos(id_resultado))
+        os.replace(ruta_meta_tmp, self._ruta_meta(id_resultado))
+        self.tocar(id_resultado)
+        self.purgar()
+        return id_resultado
+
+    def actualizar_metadatos(self, id_resultado, cambios):
+        """Agrega campos a los metadatos de un resultado ya publicado."""
+        meta = self.metadatos(id_resultado)
+        if meta is None:
+            return False
+        meta.update(cambios)
+        ruta_tmp = self.ruta_temporal(id_resultado) + _EXT_META
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(ruta_tmp, self._ruta_meta(id_resultado))
+        return True
+
+    def existe(self, id_resultado):
+        return bool(id_resultado) and os.path.exists(self._ruta_datos(id_resultado))
+
+    def tocar(self, id_resultado):
+        """Marca el resultado como usado ahora (la expiración cuenta desde el último uso)."""
+        try:
+            ahora = time.time()
+            os.utime(self._ruta_datos(id_resultado), (ahora, ahora))
+            return True
+        except OSError:
+            return False
+
+    def metadatos(self, id_resultado):
+        try:
+            with open(self._ruta_meta(id_resultado), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def leer(self, id_resultado):
+        """Bytes del zip (para el botón de descarga). Lanza FileNotFoundError si ya expiró."""
+        with open(self._ruta_datos(id_resultado), 'rb') as f:
+            datos = f.read()
+        self.tocar(id_resultado)
+        return datos
+
+    def abrir(self, id_resultado):
+        """Zip abierto en modo binario, para enviarlo por partes. Lanza FileNotFoundError si ya expiró."""
+        archivo = open(self._ruta_datos(id_resultado), 'rb')
+        self.tocar(id_resultado)
+        return archivo
+
+    def eliminar(self, id_resultado):
+        for ruta in (self._ruta_datos(id_resultado), self._ruta_meta(id_resultado)):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+    # --- limpieza ---
+    def _entradas(self):
+        """(último uso, bytes, id) de cada resultado publicado."""
+        entradas = []
+        for nombre in os.listdir(self.carpeta):
+            if not nombre.endswith(_EXT_DATOS) or nombre.startswith('.'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.carpeta, nombre))
+            except OSError:
+                continue
+            entradas.append((stat.st_mtime, stat.st_size, nombre[:-len(_EXT_DATOS)]))
+        return entradas
+
+    def total_bytes(self):
+        return sum(tamano for _, tamano, _ in self._entradas())
+
+    def purgar(self, ahora=None):
+        """Aplica expiración por tiempo y por tamaño. Devuelve cuántos resultados borró."""
+        ahora = time.time() if ahora is None else ahora
+        borrados = 0
+        with self._lock:
+            entradas = sorted(self._entradas())
+            vigentes = []
+            for ultimo_uso, tamano, id_resultado in entradas:
+                if ahora - ultimo_uso > self.ttl_segundos:
+                    self.eliminar(id_resultado)
+                    borrados += 1
+                else:
+                    vigentes.append((ultimo_uso, tamano, id_resultado))
+            total = sum(tamano for _, tamano, _ in vigentes)
+            for _, tamano, id_resultado in vigentes:
+                if total <= self.max_bytes:
+                    break
+                self.eliminar(id_resultado)
+                total -= tamano
+                borrados += 1
+            # Temporales de procesos que murieron a medio escribir
+            for nombre in os.listdir(self.carpeta):
+                ruta = os.path.join(self.carpeta, nombre)
+                if nombre.startswith('.') and '.tmp' in nombre:
+                    try:
+                        if ahora - os.path.getmtime(ruta) > self.ttl_segundos:
+                            os.remove(ruta)
+                    except OSError:
+                        pass
+        return borrados
+
+
+class SalidaAlmacen(SalidaZip):
+    """
+    Zip escrito directamente en el almacén (nunca completo en memoria).
+    Al cerrar se publica y `resultado` pasa a ser el id del resultado.
+    """
+
+    def __init__(self, almacen, metadatos=None, id_resultado=None):
+        self.almacen = almacen
+        self.metadatos = metadatos
+        self.id_resultado = id_resultado or almacen.nuevo_id()
+        super().__init__(almacen.ruta_temporal(self.id_resultado))
+
+    def cerrar(self):
+        ruta = super().cerrar()
+        return self.almacen.publicar(self.id_resultado, ruta, self.metadatos)
+
+
+def iniciar_limpieza_periodica(almacen, intervalo=INTERVALO_LIMPIEZA):
+    """Hilo daemon que purga el almacén cada `intervalo` segundos."""
+    def _bucle():
+        while True:
+            time.sleep(intervalo)
+            try:
+                almacen.purgar()
+            except Exception:
+                pass
+
+    hilo = threading.Thread(target=_bucle, name='limpieza-resultados', daemon=True)
+    hilo.start()
+    return hilo
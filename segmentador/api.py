@@ -0,0 +1,545 @@
+# segmentador/api.py
+"""
+API HTTP local para segmentar sin pasar por las páginas de Streamlit.
+
+El proceso que arma el consolidado puede enviar el Excel (o la ruta donde lo
+dejó) junto con el tipo de reporte y la zona, recibir un id de trabajo y, cuando
+termine, bajar el .zip o encontrar los archivos en la carpeta compartida. Los
+trabajos corren en un pool de procesos, así que varios consolidados se segmentan
+a la vez.
+
+Se usan los mismos procesos, el mismo almacén de resultados y la misma caché que
+las páginas: un archivo ya procesado con los mismos parámetros (desde la API o
+desde Streamlit) se devuelve sin volver a procesarlo.
+
+Uso:
+    python -m segmentador.api --puerto 8765 --trabajadores 2
+
+Rutas:
+    POST /trabajos?tipo=provincia_corte_1&zona=NORTE[&formato_base=csv][&libro_resumen=1][&destino=/ruta]
+         cuerpo: el .xlsx tal cual (curl --data-binary @consolidado.xlsx ...)
+    POST /trabajos
+         cuerpo JSON: {"ruta": "/datos/consolidado.xlsx", "tipo": "...", "zona": "...",
+                       "formato_base": "xlsx", "libro_resumen": true, "destino": "/carpeta/compartida"}
+    GET  /trabajos                  todos los trabajos
+    GET  /trabajos/<id>             estado: en_cola, procesando, terminado o error
+    GET  /trabajos/<id>/log         log del proceso (texto)
+    GET  /trabajos/<id>/registros   registros por agencia (JSON; ?formato=csv para CSV)
+    GET  /trabajos/<id>/archivo     el .zip (solo si no se pidió `destino`)
+    GET  /salud
+
+`tipo` es lima_corte_1, lima_corte_2, provincia_corte_1 o provincia_corte_2.
+La zona solo se pide para Provincia (Lima siempre es LIMA). Con `libro_resumen` se
+agrega "Resumen del proceso.xlsx" (registros e integridad), como la casilla de
+las páginas; por defecto no se incluye. Con `destino` los
+reportes se escriben en esa carpeta (tipo de reporte / zona / agencia, con su
+manifiesto), igual que la opción "Escribir en carpeta compartida" de las páginas;
+la carpeta tiene que quedar dentro de SEGMENTADOR_DESTINO (sin esa variable se
+rechaza cualquier `destino`). Del mismo modo, `ruta` tiene que quedar dentro de
+SEGMENTADOR_ORIGEN (relativa a esa carpeta si no es absoluta); sin esa variable
+solo se aceptan archivos subidos en el cuerpo.
+La zona se pasa a mayúsculas, igual que el selector de las páginas, para que
+ambos caminos compartan la caché.
+Por defecto escucha solo en 127.0.0.1.
+"""
+import argparse
+import hashlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from segmentador.almacen import AlmacenResultados, SalidaAlmacen, iniciar_limpieza_periodica
+from segmentador.base_salida import FORMATO_XLSX, formatos_disponibles
+from segmentador.cache_resultados import buscar, clave_resultado
+from segmentador.registros import Bitacora
+from segmentador.salida import DestinoNoPermitido, SalidaDirectorio, resolver_destino
+
+# tipo -> (nombre del reporte, función del proceso, ¿pide zona?)
+TIPOS = {
+    'lima_corte_1': ("Lima Corte 1", 'procesar_archivos_excel', False),
+    'provincia_corte_1': ("Provincia Corte 1", 'procesar_reportes_provincia', True),
+    'lima_corte_2': ("Lima Corte 2", 'procesar_reporte_corte_2', False),
+    'provincia_corte_2': ("Provincia Corte 2", 'procesar_provincia_corte_2', True),
+}
+ZONA_LIMA = "LIMA"
+
+# Estados de un trabajo
+EN_COLA = "en_cola"
+PROCESANDO = "procesando"
+TERMINADO = "terminado"
+ERROR = "error"
+
+MAX_SUBIDA_BYTES = int(os.environ.get('SEGMENTADOR_API_MAX_MB', 512)) * 1024 * 1024
+_BLOQUE = 1024 * 1024
+
+
+class SolicitudInvalida(Exception):
+    """Parámetros del trabajo incompletos o incorrectos (responde 400)."""
+
+
+class OrigenNoPermitido(ValueError):
+    """La `ruta` pedida queda fuera de SEGMENTADOR_ORIGEN, o no hay raíz configurada."""
+
+
+def raiz_origen():
+    """Raíz desde la que se pueden leer archivos por ruta (SEGMENTADOR_ORIGEN, ya resuelta), o None."""
+    raiz = os.environ.get('SEGMENTADOR_ORIGEN', '').strip()
+    return os.path.realpath(raiz) if raiz else None
+
+
+def resolver_origen(ruta):
+    """
+    Ruta real de `ruta` (relativa a la raíz si no es absoluta), con enlaces
+    simbólicos y '..' resueltos. Lanza OrigenNoPermitido si queda fuera de la raíz.
+    """
+    raiz = raiz_origen()
+    if raiz is None:
+        raise OrigenNoPermitido("La lectura por ruta está desactivada: falta configurar SEGMENTADOR_ORIGEN")
+    ruta_real = os.path.realpath(os.path.join(raiz, str(ruta).strip()))
+    if os.path.commonpath([raiz, ruta_real]) != raiz:
+        raise OrigenNoPermitido(f"El archivo {ruta!r} queda fuera de {raiz}")
+    return ruta_real
+
+
+def es_verdadero(valor):
+    """Opción booleana de la query (1, true, si) o del JSON (true)."""
+    return str(valor).strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+
+# --- Ejecución (en el proceso de trabajo) ---
+def _iniciar_trabajador():
+    # Los trabajos ya corren en paralelo entre sí: cada uno lee sus hojas en su propio proceso
+    os.environ['SEGMENTADOR_LECTURA_PARALELA'] = '0'
+
+
+def ejecutar_trabajo(tipo, zona, formato_base, ruta_entrada, carpeta_almacen, id_resultado, destino=None,
+                     resumen=False):
+    """
+    Corre el proceso de `tipo` sobre el Excel en `ruta_entrada`. El zip se publica en
+    el almacén con el id `id_resultado` (o los archivos van a `destino`).
+    Devuelve {'resultado': id o ruta del manifiesto (None si no pasó la validación), 'log': ...}.
+    """
+    nombre_reporte, funcion, pide_zona = TIPOS[tipo]
+    proceso = getattr(importlib.import_module(f"segmentador.{tipo}"), funcion)
+    with open(ruta_entrada, 'rb') as f:
+        archivo = io.BytesIO(f.read())
+
+    almacen = None
+    if destino:
+        salida = SalidaDirectorio(destino, nombre_reporte, zona)
+    else:
+        almacen = AlmacenResultados(carpeta_almacen)
+        salida = SalidaAlmacen(almacen, {'tipo_reporte': nombre_reporte, 'zona': zona}, id_resultado)
+    argumentos = (archivo, zona) if pide_zona else (archivo,)
+    resultado, log = proceso(*argumentos, salida, formato_base, resumen=resumen)
+    if resultado and almacen is not None:
+        almacen.actualizar_metadatos(resultado, {'log': log.a_dict()})
+    return {'resultado': resultado, 'log': log.a_dict()}
+
+
+# --- Registro de trabajos (en el servidor) ---
+@dataclass
+class Trabajo:
+    id: str
+    tipo: str
+    zona: str
+    formato_base: str
+    libro_resumen: bool = False
+    destino: str = None
+    estado: str = EN_COLA
+    creado: float = field(default_factory=time.time)
+    terminado: float = None
+    resultado: str = None
+    reutilizado: bool = False
+    error: str = None
+    log: dict = None
+    ruta_entrada: str = None
+    entrada_temporal: bool = False
+
+    def resumen(self):
+        return Bitacora.desde_dict(self.log).resumen() if self.log else None
+
+    def a_dict(self):
+        datos = {k: v for k, v in asdict(self).items() if k not in ('log', 'ruta_entrada', 'entrada_temporal')}
+        datos['resumen'] = self.resumen()
+        datos['segundos'] = round((self.terminado or time.time()) - self.creado, 3)
+        if self.estado == TERMINADO and self.resultado and not self.destino:
+            datos['archivo'] = f"/trabajos/{self.id}/archivo"
+        return datos
+
+
+class ColaTrabajos:
+    """Recibe trabajos, los reparte en el pool de procesos y guarda su estado."""
+
+    def __init__(self, almacen, trabajadores=2, carpeta_entradas=None):
+        self.almacen = almacen
+        self.trabajadores = trabajadores
+        self.carpeta_entradas = carpeta_entradas or os.path.join(almacen.carpeta, 'entradas')
+        os.makedirs(self.carpeta_entradas, exist_ok=True)
+        self._trabajos = {}
+        self._futuros = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _pool_trabajos(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.trabajadores,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_iniciar_trabajador,
+                )
+            return self._pool
+
+    def _descartar_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def cerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    # --- entradas ---
+    def guardar_subida(self, flujo, longitud):
+        """Copia el cuerpo de la petición a un archivo de entrada. Devuelve (ruta, sha256)."""
+        if longitud > MAX_SUBIDA_BYTES:
+            raise SolicitudInvalida(f"El archivo supera el máximo de {MAX_SUBIDA_BYTES // (1024 * 1024)} MB")
+        h = hashlib.sha256()
+        fd, ruta = tempfile.mkstemp(dir=self.carpeta_entradas, suffix='.xlsx')
+        with os.fdopen(fd, 'wb') as destino:
+            restante = longitud
+            while restante > 0:
+                bloque = flujo.read(min(_BLOQUE, restante))
+                if not bloque:
+                    break
+                h.update(bloque)
+                destino.write(bloque)
+                restante -= len(bloque)
+        if restante > 0:
+            os.remove(ruta)
+            raise SolicitudInvalida("El cuerpo de la petición llegó incompleto")
+        return ruta, h.hexdigest()
+
+    @staticmethod
+    def hash_ruta(ruta):
+        h = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(_BLOQUE), b''):
+                h.update(bloque)
+        return h.hexdigest()
+
+    # --- trabajos ---
+    @staticmethod
+    def validar_parametros(tipo, zona, formato_base):
+        """(zona, formato_base) normalizados; lanza SolicitudInvalida si algo no cuadra."""
+        if tipo not in TIPOS:
+            raise SolicitudInvalida(f"Tipo de reporte desconocido: {tipo!r}. Opciones: {', '.join(TIPOS)}")
+        if TIPOS[tipo][2]:
+            zona = (zona or '').strip().upper()
+            if not zona:
+                raise SolicitudInvalida("Los reportes de Provincia necesitan una zona (p. ej. zona=NORTE)")
+        else:
+            zona = ZONA_LIMA
+        formato_base = formato_base or FORMATO_XLSX
+        if formato_base not in formatos_disponibles():
+            raise SolicitudInvalida(f"Formato de BASE no disponible: {formato_base!r}")
+        return zona, formato_base
+
+    def enviar(self, tipo, zona, formato_base, ruta_entrada, hash_archivo, destino=None, entrada_temporal=False,
+               libro_resumen=False):
+        """Registra el trabajo y lo manda al pool (o lo resuelve con la caché). Devuelve el Trabajo."""
+        nombre_reporte = TIPOS[tipo][0]
+        trabajo = Trabajo(
+            id=AlmacenResultados.nuevo_id(), tipo=tipo, zona=zona, formato_base=formato_base, libro_resumen=libro_resumen,
+            destino=destino, ruta_entrada=ruta_entrada, entrada_temporal=entrada_temporal,
+        )
+        clave = clave_resultado(hash_archivo, nombre_reporte, zona, {'formato_base': formato_base, 'resumen': libro_resumen})
+        meta = None if destino else buscar(self.almacen, clave)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+        if meta is not None:
+            self._terminar(trabajo, {'resultado': clave, 'log': meta['log']}, reutilizado=True)
+            return trabajo
+
+        try:
+            futuro = self._pool_trabajos().submit(
+                ejecutar_trabajo, tipo, zona, formato_base, ruta_entrada, self.almacen.carpeta, clave, destino,
+                libro_resumen)
+        except (BrokenProcessPool, RuntimeError):
+            self._descartar_pool()
+            futuro = self._pool_trabajos().submit(
+                ejecutar_trabajo, tipo, zona, formato_base, ruta_entrada, self.almacen.carpeta, clave, destino,
+                libro_resumen)
+        with self._lock:
+            self._futuros[trabajo.id] = futuro
+        futuro.add_done_callback(lambda f, t=trabajo: self._al_terminar(t, f))
+        return trabajo
+
+    def _al_terminar(self, trabajo, futuro):
+        try:
+            salida = futuro.result()
+        except BrokenProcessPool:
+            # El proceso de trabajo murió (p. ej. sin memoria): el pool se recrea para los siguientes
+            self._descartar_pool()
+            self._fallar(trabajo, "El proceso de trabajo terminó inesperadamente")
+        except Exception as e:
+            self._fallar(trabajo, f"{type(e).__name__}: {e}")
+        else:
+            self._terminar(trabajo, salida)
+
+    def _terminar(self, trabajo, salida, reutilizado=False):
+        with self._lock:
+            trabajo.log = salida['log']
+            trabajo.resultado = salida['resultado']
+            trabajo.reutilizado = reutilizado
+            if trabajo.resultado:
+                trabajo.estado = TERMINADO
+            else:
+                trabajo.estado = ERROR
+                trabajo.error = "El archivo no pasó la validación (ver log)"
+            trabajo.terminado = time.time()
+            self._futuros.pop(trabajo.id, None)
+        self._borrar_entrada(trabajo)
+
+    def _fallar(self, trabajo, mensaje):
+        with self._lock:
+            trabajo.estado = ERROR
+            trabajo.error = mensaje
+            trabajo.terminado = time.time()
+            self._futuros.pop(trabajo.id, None)
+        self._borrar_entrada(trabajo)
+
+    @staticmethod
+    def _borrar_entrada(trabajo):
+        if trabajo.entrada_temporal and trabajo.ruta_entrada:
+            try:
+                os.remove(trabajo.ruta_entrada)
+            except OSError:
+                pass
+
+    def obtener(self, id_trabajo):
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            futuro = self._futuros.get(id_trabajo)
+            if trabajo is not None and trabajo.estado == EN_COLA and futuro is not None and futuro.running():
+                trabajo.estado = PROCESANDO
+            return trabajo
+
+    def listar(self):
+        with self._lock:
+            ids = list(self._trabajos)
+        return [self.obtener(i) for i in ids]
+
+    def purgar(self, ttl_segundos=None):
+        """Olvida los trabajos terminados hace más de `ttl_segundos` (por defecto, el TTL del almacén)."""
+        ttl_segundos = self.almacen.ttl_segundos if ttl_segundos is None else ttl_segundos
+        limite = time.time() - ttl_segundos
+        with self._lock:
+            viejos = [i for i, t in self._trabajos.items() if t.terminado is not None and t.terminado < limite]
+            for i in viejos:
+                del self._trabajos[i]
+        return len(viejos)
+
+
+# --- HTTP ---
+class ManejadorApi(BaseHTTPRequestHandler):
+    server_version = "SegmentadorAPI/1.0"
+
+    @property
+    def cola(self):
+        return self.server.cola
+
+    def log_message(self, formato, *args):
+        if self.server.registrar_peticiones:
+            super().log_message(formato, *args)
+
+    # --- respuestas ---
+    def _responder(self, estado, cuerpo, tipo_contenido, cabeceras=None):
+        self.send_response(estado)
+        self.send_header('Content-Type', tipo_contenido)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _json(self, estado, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+        self._responder(estado, cuerpo, 'application/json; charset=utf-8')
+
+    def _error(self, estado, mensaje):
+        self._json(estado, {'error': mensaje})
+
+    def _partes(self):
+        url = urlsplit(self.path)
+        partes = [p for p in url.path.split('/') if p]
+        parametros = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        return partes, parametros
+
+    # --- rutas ---
+    def do_GET(self):
+        partes, parametros = self._partes()
+        if partes == ['salud']:
+            return self._json(HTTPStatus.OK, {'estado': 'ok', 'trabajadores': self.cola.trabajadores})
+        if partes == ['trabajos']:
+            return self._json(HTTPStatus.OK, [t.a_dict() for t in self.cola.listar()])
+        if len(partes) < 2 or partes[0] != 'trabajos' or len(partes) > 3:
+            return self._error(HTTPStatus.NOT_FOUND, "Ruta no encontrada")
+
+        trabajo = self.cola.obtener(partes[1])
+        if trabajo is None:
+            return self._error(HTTPStatus.NOT_FOUND, "Trabajo no encontrado")
+        recurso = partes[2] if len(partes) == 3 else None
+        if recurso is None:
+            return self._json(HTTPStatus.OK, trabajo.a_dict())
+        if recurso in ('log', 'registros'):
+            if trabajo.log is None:
+                return self._error(HTTPStatus.CONFLICT, f"El trabajo está {trabajo.estado}")
+            bitacora = Bitacora.desde_dict(trabajo.log)
+            if recurso == 'log':
+                return self._responder(HTTPStatus.OK, bitacora.texto().encode('utf-8'), 'text/plain; charset=utf-8')
+            if parametros.get('formato') == 'csv':
+                return self._responder(HTTPStatus.OK, bitacora.a_csv(), 'text/csv; charset=utf-8')
+            return self._responder(HTTPStatus.OK, bitacora.a_json(), 'application/json; charset=utf-8')
+        if recurso == 'archivo':
+            return self._enviar_archivo(trabajo)
+        return self._error(HTTPStatus.NOT_FOUND, "Ruta no encontrada")
+
+    def _enviar_archivo(self, trabajo):
+        if trabajo.estado != TERMINADO:
+            return self._error(HTTPStatus.CONFLICT, f"El trabajo está {trabajo.estado}")
+        if trabajo.destino:
+            return self._error(HTTPStatus.CONFLICT, f"Los reportes se escribieron en {trabajo.destino}")
+        try:
+            archivo = self.cola.almacen.abrir(trabajo.resultado)
+        except FileNotFoundError:
+            return self._error(HTTPStatus.GONE, "El archivo generado ya expiró del servidor")
+        nombre_reporte = TIPOS[trabajo.tipo][0].replace(' ', '_')
+        zona = '' if trabajo.zona == ZONA_LIMA else f"_{trabajo.zona}"
+        nombre = f"Reportes_{nombre_reporte}{zona}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        with archivo:
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', 'application/zip')
+            self.send_header('Content-Length', str(os.fstat(archivo.fileno()).st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="{nombre}"')
+            self.end_headers()
+            shutil.copyfileobj(archivo, self.wfile, _BLOQUE)
+
+    def do_POST(self):
+        partes, parametros = self._partes()
+        if partes != ['trabajos']:
+            return self._error(HTTPStatus.NOT_FOUND, "Ruta no encontrada")
+        try:
+            longitud = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            return self._error(HTTPStatus.BAD_REQUEST, "Content-Length inválido")
+        tipo_contenido = self.headers.get('Content-Type', '')
+
+        ruta_subida = None
+        try:
+            if tipo_contenido.startswith('application/json'):
+                try:
+                    cuerpo = json.loads(self.rfile.read(longitud) or b'{}')
+                except ValueError:
+                    raise SolicitudInvalida("El cuerpo no es un JSON válido")
+                parametros = {**parametros, **cuerpo}
+                ruta = parametros.get('ruta')
+                if not ruta:
+                    raise SolicitudInvalida("Falta 'ruta' (o enviar el .xlsx como cuerpo de la petición)")
+                try:
+                    ruta = resolver_origen(ruta)
+                except OrigenNoPermitido as e:
+                    raise SolicitudInvalida(str(e))
+                if not os.path.isfile(ruta):
+                    raise SolicitudInvalida(f"No existe el archivo {parametros['ruta']}")
+                zona, formato_base = self.cola.validar_parametros(
+                    parametros.get('tipo'), parametros.get('zona'), parametros.get('formato_base'))
+                ruta_entrada, hash_archivo = ruta, self.cola.hash_ruta(ruta)
+            else:
+                if longitud <= 0:
+                    raise SolicitudInvalida("Cuerpo vacío: enviar el .xlsx o un JSON con 'ruta'")
+                zona, formato_base = self.cola.validar_parametros(
+                    parametros.get('tipo'), parametros.get('zona'), parametros.get('formato_base'))
+                ruta_subida, hash_archivo = self.cola.guardar_subida(self.rfile, longitud)
+                ruta_entrada = ruta_subida
+            destino = parametros.get('destino') or None
+            if destino:
+                try:
+                    destino = resolver_destino(destino)
+                except DestinoNoPermitido as e:
+                    raise SolicitudInvalida(str(e))
+            trabajo = self.cola.enviar(
+                parametros['tipo'], zona, formato_base, ruta_entrada, hash_archivo,
+                destino=destino, entrada_temporal=ruta_subida is not None,
+                libro_resumen=es_verdadero(parametros.get('libro_resumen')),
+            )
+        except SolicitudInvalida as e:
+            if ruta_subida:
+                os.remove(ruta_subida)
+            return self._error(HTTPStatus.BAD_REQUEST, str(e))
+        self.cola.purgar()
+        self._json(HTTPStatus.ACCEPTED, trabajo.a_dict())
+
+
+class ServidorApi(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion, cola, registrar_peticiones=True):
+        self.cola = cola
+        self.registrar_peticiones = registrar_peticiones
+        super().__init__(direccion, ManejadorApi)
+
+
+def crear_servidor(host='127.0.0.1', puerto=8765, trabajadores=2, carpeta=None, registrar_peticiones=True):
+    """
+    Servidor listo para `serve_forever()` (puerto 0 = uno libre, útil en pruebas;
+    el real queda en `servidor.server_address`). Cerrar con `shutdown()` y `cola.cerrar()`.
+    """
+    almacen = AlmacenResultados(carpeta) if carpeta else AlmacenResultados()
+    return ServidorApi((host, puerto), ColaTrabajos(almacen, trabajadores), registrar_peticiones)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP local del segmentador de reportes.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--trabajadores', type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)),
+                        help="trabajos que se procesan a la vez")
+    parser.add_argument('--carpeta', help="carpeta del almacén de resultados (por defecto la de las páginas)")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.host, args.puerto, args.trabajadores, args.carpeta)
+    iniciar_limpieza_periodica(servidor.cola.almacen)
+    host, puerto = servidor.server_address[:2]
+    print(f"Segmentador API en http://{host}:{puerto} ({args.trabajadores} trabajadores)")
+    # SIGTERM cierra igual que Ctrl+C, para no dejar procesos de trabajo huérfanos
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=servidor.shutdown).start())
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servidor.cola.cerrar()
+
+
+if __name__ == '__main__':
+    main()
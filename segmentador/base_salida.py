@@ -0,0 +1,85 @@
+# segmentador/base_salida.py
+"""
+Escritura de la parte BASE de cada reporte por agencia.
+
+La hoja 'Reporte' siempre se genera en Excel con sus formatos. La BASE puede ir:
+- 'xlsx': dentro del mismo libro; si supera el límite de filas de Excel se
+  reparte en hojas BASE, BASE_2, BASE_3... Con un libro de empalme
+  (segmentador/empalme_base.py) las filas se copian del XML original.
+- 'csv': archivo aparte (UTF-8 con BOM para que Excel respete las tildes).
+- 'parquet': archivo aparte en formato columnar (requiere pyarrow).
+"""
+import io
+
+# Límite de filas por hoja de Excel, incluyendo la fila de cabecera
+MAX_FILAS_EXCEL = 1_048_576
+
+FORMATO_XLSX = 'xlsx'
+FORMATO_CSV = 'csv'
+FORMATO_PARQUET = 'parquet'
+
+
+def formatos_disponibles():
+    """Formatos de BASE que se pueden ofrecer en este servidor."""
+    formatos = [FORMATO_XLSX, FORMATO_CSV]
+    try:
+        import pyarrow  # noqa: F401
+        formatos.append(FORMATO_PARQUET)
+    except ImportError:
+        pass
+    return formatos
+
+
+def nombres_hojas_base(total_filas, nombre_hoja='BASE', max_filas=MAX_FILAS_EXCEL):
+    """Nombres de las hojas necesarias para `total_filas` filas de datos: BASE, BASE_2..."""
+    filas_por_hoja = max_filas - 1
+    cantidad = max(1, -(-total_filas // filas_por_hoja))
+    return [nombre_hoja] + [f"{nombre_hoja}_{i}" for i in range(2, cantidad + 1)]
+
+
+def escribir_base_excel(writer, df_base, nombre_hoja='BASE', max_filas=MAX_FILAS_EXCEL):
+    """Escribe la BASE en una o más hojas del libro abierto en `writer`."""
+    filas_por_hoja = max_filas - 1
+    hojas = nombres_hojas_base(len(df_base), nombre_hoja, max_filas)
+    if len(hojas) == 1:
+        df_base.to_excel(writer, sheet_name=nombre_hoja, index=False)
+        return hojas
+    for i, hoja in enumerate(hojas):
+        inicio = i * filas_por_hoja
+        df_base.iloc[inicio:inicio + filas_por_hoja].to_excel(writer, sheet_name=hoja, index=False)
+    return hojas
+
+
+def serializar_base(df_base, formato):
+    """Devuelve los bytes de la BASE en CSV o Parquet."""
+    if formato == FORMATO_CSV:
+        return df_base.to_csv(index=False).encode('utf-8-sig')
+    if formato == FORMATO_PARQUET:
+        import pyarrow as pa
+        buffer = io.BytesIO()
+        try:
+            df_base.to_parquet(buffer, index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Columnas de texto con valores mezclados (números y textos): se guardan como texto
+            columnas_texto = {c: 'string' for c in df_base.columns if df_base[c].dtype == object}
+            buffer = io.BytesIO()
+            df_base.astype(columnas_texto).to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Formato de BASE no soportado: {formato}")
+
+
+def escribir_base(writer, df_base, formato, destino, agencia, nombre_archivo, empalme=None):
+    """
+    Escribe la BASE de una agencia según el formato elegido.
+    En 'xlsx' va dentro del libro de `writer`; en otro formato se entrega a
+    `destino` como archivo aparte `<nombre_archivo>.<formato>`.
+    Con `empalme` (empalme_base.LibroBase) la hoja xlsx queda con la cabecera y sus
+    filas se insertan al completar el libro; si no se puede, se escribe con pandas.
+    Devuelve la lista de hojas o archivos generados.
+    """
+    if formato == FORMATO_XLSX:
+        hojas = empalme.escribir(writer, df_base) if empalme is not None else None
+        return hojas or escribir_base_excel(writer, df_base)
+    archivo = f"{nombre_archivo}.{formato}"
+    destino.agregar(agencia, archivo, serializar_base(df_base, formato))
+    return [archivo]
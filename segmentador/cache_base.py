@@ -0,0 +1,109 @@
+# segmentador/cache_base.py
+"""
+Caché en memoria de la hoja BASE ya leída, compartida entre procesos de reporte.
+
+Los consolidados de Corte 1 y Corte 2 de un mismo mes (y cada zona de Provincia
+sobre el mismo archivo) traen la misma hoja BASE, la más grande del libro. Cada
+lectura se guarda con la huella de la hoja (xlsx_rapido.huella_hoja: XML crudo con
+las cadenas compartidas resueltas) y los argumentos de lectura; si otro archivo trae
+la misma huella y se lee igual, se reutiliza el DataFrame en vez de leerlo de nuevo.
+
+Se entrega una copia superficial: con Copy-on-Write (siempre activo desde pandas 3)
+cada proceso puede renombrar columnas o agregar ASESOR_NORMALIZADO sin tocar la
+copia guardada, y sin duplicar los datos. Con pandas 2 sin Copy-on-Write las
+copias superficiales comparten los datos, así que ahí se guarda y se entrega una
+copia completa (más memoria, pero ningún proceso ve los cambios de otro). La normalización de asesores, el filtro de zona y la partición
+(segmentador/particion.py) siguen siendo de cada proceso: dependen del tipo de
+reporte y cuestan menos de un segundo frente a la lectura.
+
+Aparte se guardan las hojas de reporte (pocas filas) con el hash del archivo
+completo: el cruce entre cortes (segmentador/cruce_cortes.py) vuelve a pedir
+'Reporte CORTE 1' y 'Reporte CORTE 2' de consolidados que las páginas ya leyeron.
+No compiten con las BASE por lugar: tienen su propio límite (REPORTES_POR_DEFECTO).
+
+SEGMENTADOR_CACHE_BASE fija cuántas hojas BASE se guardan (por defecto 2, las más
+recientes por uso); 0 desactiva toda la caché, reportes incluidos.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+ENTRADAS_POR_DEFECTO = 2
+REPORTES_POR_DEFECTO = 8
+
+_entradas = OrderedDict()
+_reportes = OrderedDict()
+_candado = threading.Lock()
+
+
+def capacidad():
+    """Cantidad máxima de hojas guardadas (SEGMENTADOR_CACHE_BASE; 0 desactiva la caché)."""
+    try:
+        return max(0, int(os.environ.get("SEGMENTADOR_CACHE_BASE", ENTRADAS_POR_DEFECTO)))
+    except ValueError:
+        return ENTRADAS_POR_DEFECTO
+
+
+def clave_lectura(huella, argumentos, lector):
+    """Clave de la caché: huella de la hoja, argumentos de lectura (sin el motor) y lector usado."""
+    argumentos = {k: v for k, v in argumentos.items() if k != 'engine'}
+    return huella, lector, json.dumps(argumentos, sort_keys=True, default=str)
+
+
+def _copy_on_write():
+    """True si las copias superficiales de pandas son independientes (Copy-on-Write)."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.get_option('mode.copy_on_write') is True
+
+
+def _copia(df):
+    return df.copy(deep=not _copy_on_write())
+
+
+def _buscar(entradas, clave):
+    with _candado:
+        df = entradas.get(clave)
+        if df is None:
+            return None
+        entradas.move_to_end(clave)
+    return _copia(df)
+
+
+def _guardar(entradas, clave, df, maximo):
+    if not maximo:
+        return
+    with _candado:
+        entradas[clave] = _copia(df)
+        entradas.move_to_end(clave)
+        while len(entradas) > maximo:
+            entradas.popitem(last=False)
+
+
+def buscar(clave):
+    """Copia del DataFrame guardado (superficial con Copy-on-Write), o None."""
+    return _buscar(_entradas, clave)
+
+
+def guardar(clave, df):
+    """Guarda una copia del DataFrame (superficial con Copy-on-Write) y desaloja las menos usadas."""
+    _guardar(_entradas, clave, df, capacidad())
+
+
+def buscar_reporte(clave):
+    """Como `buscar`, para hojas de reporte."""
+    return _buscar(_reportes, clave)
+
+
+def guardar_reporte(clave, df):
+    """Como `guardar`, para hojas de reporte (hasta REPORTES_POR_DEFECTO)."""
+    _guardar(_reportes, clave, df, REPORTES_POR_DEFECTO if capacidad() else 0)
+
+
+def vaciar():
+    with _candado:
+        _entradas.clear()
+        _reportes.clear()
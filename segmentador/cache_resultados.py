@@ -0,0 +1,61 @@
+# segmentador/cache_resultados.py
+"""
+Caché de resultados entre sesiones.
+
+Si el mismo archivo (mismo contenido) se procesa otra vez con el mismo tipo de
+reporte, zona y opciones, se devuelve el zip y el log ya generados en lugar de
+correr todo el proceso. La clave incluye la versión del código de `segmentador`
+y la de los alias aceptados (segmentador/alias.py), así que cualquier cambio en
+la lógica o un alias nuevo invalida la caché automáticamente.
+Los resultados viven en el AlmacenResultados, que los desaloja por último uso
+(LRU) cuando se supera su tamaño máximo.
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+from segmentador.alias import version_alias
+
+_CARPETA_CODIGO = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=1)
+def version_codigo():
+    """Hash del código fuente de segmentador/*.py (se calcula una vez por proceso)."""
+    h = hashlib.sha256()
+    for nombre in sorted(os.listdir(_CARPETA_CODIGO)):
+        if nombre.endswith('.py'):
+            h.update(nombre.encode('utf-8'))
+            with open(os.path.join(_CARPETA_CODIGO, nombre), 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def hash_contenido(datos):
+    """SHA-256 del archivo subido."""
+    return hashlib.sha256(datos).hexdigest()
+
+
+def clave_resultado(hash_archivo, tipo_reporte, zona, opciones=None):
+    """Id determinista del resultado para (archivo, tipo de reporte, zona, opciones, versión del código y de los alias)."""
+    partes = {
+        'archivo': hash_archivo,
+        'tipo_reporte': tipo_reporte,
+        'zona': zona,
+        'opciones': opciones or {},
+        'version': version_codigo(),
+        'alias': version_alias(),
+    }
+    return hashlib.sha256(json.dumps(partes, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:32]
+
+
+def buscar(almacen, clave):
+    """Metadatos (incluido el log) del resultado en caché, o None si no está completo."""
+    if not almacen.existe(clave):
+        return None
+    meta = almacen.metadatos(clave)
+    if not meta or 'log' not in meta:
+        return None
+    almacen.tocar(clave)
+    return meta
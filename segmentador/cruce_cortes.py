@@ -0,0 +1,299 @@
+# segmentador/cruce_cortes.py
+"""
+Cruce de los resultados de Corte 1 y Corte 2 de un mismo periodo, agencia por agencia.
+
+Corte 2 aplica PENALIDAD 1 y CLAWBACK 1 a las mismas agencias que se pagaron en
+Corte 1. `cruzar_cortes` une 'Reporte CORTE 1' y 'Reporte CORTE 2' de los dos
+consolidados con merges de pandas (hash join): primero por RUC y, con las filas que
+no cruzaron o no traen RUC, por el nombre de agencia normalizado. Señala:
+- agencias que están en un solo corte;
+- diferencias de ALTAS entre cortes;
+- ajustes de Corte 2 (PENALIDAD 1 + CLAWBACK 1) sobre agencias que no cobraron en
+  Corte 1, o mayores que lo cobrado;
+- RUC distinto para la misma agencia, RUC repetido y montos que no son números.
+Las comparaciones se hacen sobre columnas completas (numpy), sin recorrer filas.
+
+Cada hoja se lee con `lectura.leer_reporte` y los mismos argumentos que usa el
+proceso de su página: si ese consolidado ya se procesó, el DataFrame sale de la
+caché (segmentador/cache_base.py) sin abrir el libro, así que el cruce puede
+correr con cada archivo que se sube.
+"""
+import io
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from segmentador.lectura import bytes_de, leer_hoja, leer_reporte, reporte_en_cache
+from segmentador.normalizacion import normalizar_nombre, normalizar_nombre_agencia
+
+HOJA_CORTE_1 = 'Reporte CORTE 1'
+HOJA_CORTE_2 = 'Reporte CORTE 2'
+
+# Diferencia máxima (en soles o altas) que se considera igual
+TOLERANCIA = 0.01
+
+# Columnas de monto de cada corte; la de Corte 1 se renombra para no confundirla
+MONTOS_CORTE_1 = {'TOTAL A PAGAR': 'TOTAL A PAGAR CORTE 1'}
+MONTOS_CORTE_2 = {'PENALIDAD 1': 'PENALIDAD 1', 'CLAWBACK 1': 'CLAWBACK 1',
+                  'TOTAL A PAGAR CORTE 2': 'TOTAL A PAGAR CORTE 2'}
+
+# Presencia de cada agencia
+AMBOS = 'AMBOS'
+SOLO_CORTE_1 = 'SOLO CORTE 1'
+SOLO_CORTE_2 = 'SOLO CORTE 2'
+
+_NORMALIZAR = {'lima': normalizar_nombre_agencia, 'provincia': normalizar_nombre}
+
+COLUMNAS_DETALLE = [
+    'RUC', 'AGENCIA', 'PRESENCIA', 'CRUCE POR', 'ALTAS CORTE 1', 'ALTAS CORTE 2', 'DIFERENCIA ALTAS',
+    'TOTAL A PAGAR CORTE 1', 'PENALIDAD 1', 'CLAWBACK 1', 'AJUSTE CORTE 2', 'TOTAL A PAGAR CORTE 2',
+    'OBSERVACIONES',
+]
+
+
+@dataclass
+class ResultadoCruce:
+    detalle: pd.DataFrame
+    resumen: dict = field(default_factory=dict)
+    reutilizadas: int = 0  # hojas que salieron de la caché (0 a 2)
+    segundos: float = 0.0
+
+    def observadas(self):
+        return self.detalle[self.detalle['OBSERVACIONES'] != '']
+
+    def a_excel(self):
+        """Libro con el detalle del cruce y el resumen."""
+        salida = io.BytesIO()
+        with pd.ExcelWriter(salida, engine='xlsxwriter') as writer:
+            self.detalle.to_excel(writer, sheet_name='CRUCE', index=False)
+            pd.DataFrame(list(self.resumen.items()), columns=['CONCEPTO', 'CANTIDAD']).to_excel(
+                writer, sheet_name='RESUMEN', index=False)
+        return salida.getvalue()
+
+
+# --- Lectura ---
+
+def _fila_cabecera_corte_1(datos):
+    """Fila (0 o 1) con las cabeceras de 'Reporte CORTE 1' en Lima, igual que lima_corte_1."""
+    primeras = leer_hoja(datos, sheet_name=HOJA_CORTE_1, header=None, nrows=2)
+    for fila in range(len(primeras)):
+        valores = {str(v).strip().upper() for v in primeras.iloc[fila].values}
+        if {'RUC', 'AGENCIA', 'META'} <= valores:
+            return fila
+    return 0
+
+
+def _leer_corte_1(datos, tipo):
+    """'Reporte CORTE 1' con los argumentos del proceso de la página. Devuelve (df, reutilizada)."""
+    if tipo == 'provincia':
+        return leer_reporte(datos, dict(sheet_name=HOJA_CORTE_1, dtype=str))
+    # Lima detecta la fila de cabecera antes de leer: se prueban las dos en la caché primero
+    for fila in (0, 1):
+        df = reporte_en_cache(datos, dict(sheet_name=HOJA_CORTE_1, header=fila, engine='openpyxl'))
+        if df is not None:
+            return df, True
+    fila = _fila_cabecera_corte_1(datos)
+    return leer_reporte(datos, dict(sheet_name=HOJA_CORTE_1, header=fila, engine='openpyxl'))
+
+
+def _leer_corte_2(datos):
+    return leer_reporte(datos, dict(sheet_name=HOJA_CORTE_2, header=[0, 1]))
+
+
+# --- Preparación de cada corte ---
+
+def _nombre_columna(col):
+    """Cabecera en mayúsculas; en Corte 2 (dos niveles) vale la de abajo."""
+    if isinstance(col, tuple):
+        col = col[-1]
+    return ' '.join(str(col).upper().split())
+
+
+def _ruc(serie):
+    """RUC como texto de dígitos ('20100000000', sin '.0' de Excel); vacío queda como NA."""
+    texto = serie.astype('string').str.strip().str.replace(r'\.0+$', '', regex=True).str.replace(r'\D', '', regex=True)
+    return texto.mask(texto == '')
+
+
+def _numeros(serie):
+    """(valores numéricos, máscara de celdas con texto que no es número)."""
+    numeros = pd.to_numeric(serie, errors='coerce')
+    texto = serie.astype('string').str.strip()
+    return numeros, (texto.notna() & (texto != '') & numeros.isna()).to_numpy(bool)
+
+
+def _tabla_corte(df, montos, normalizar, hoja):
+    """RUC, AGENCIA, clave de nombre, ALTAS y montos de un corte, con nombres fijos."""
+    df = df.copy(deep=False)
+    df.columns = [_nombre_columna(c) for c in df.columns]
+    df = df.loc[:, ~df.columns.duplicated()]
+    if 'AGENCIA' not in df.columns:
+        raise ValueError(f"La hoja '{hoja}' no tiene la columna AGENCIA")
+
+    vacia = pd.Series(pd.NA, index=df.index, dtype='string')
+    tabla = pd.DataFrame({
+        'RUC': _ruc(df['RUC']) if 'RUC' in df.columns else vacia,
+        'AGENCIA': df['AGENCIA'].astype('string').str.strip(),
+    })
+    nombres = tabla['AGENCIA'].dropna().unique()
+    tabla['CLAVE'] = tabla['AGENCIA'].map(dict(zip(nombres, map(normalizar, nombres))))
+    tabla['CLAVE'] = tabla['CLAVE'].mask(tabla['CLAVE'] == '')
+
+    no_numerico = np.zeros(len(df), dtype=bool)
+    for origen, destino in {'ALTAS': 'ALTAS', **montos}.items():
+        if origen in df.columns:
+            tabla[destino], invalidos = _numeros(df[origen])
+            no_numerico |= invalidos
+        else:
+            tabla[destino] = np.nan
+    tabla['NO NUMERICO'] = no_numerico
+
+    tabla = tabla[tabla['RUC'].notna() | tabla['CLAVE'].notna()].reset_index(drop=True)
+    tabla['REPETIDO'] = tabla['RUC'].notna() & tabla['RUC'].duplicated(keep=False)
+    tabla['FILA'] = np.arange(len(tabla))
+    return tabla
+
+
+# --- Cruce ---
+
+def _con_ocurrencia(tabla, columnas, sufijo):
+    """Agrega 'N' + sufijo: número de aparición de la fila entre las que repiten `columnas`."""
+    tabla['N' + sufijo] = tabla.groupby([c + sufijo for c in columnas], dropna=False).cumcount()
+    return tabla
+
+
+def _unir(corte_1, corte_2):
+    """
+    Hash join en tres pasadas, cada una uno a uno:
+    - por RUC, entre las filas cuyo RUC no se repite en ninguno de los dos cortes;
+    - por RUC y nombre normalizado, con las filas de RUC repetido (una empresa con
+      varios locales) o que no cruzaron;
+    - outer join por nombre normalizado con lo que sobra.
+    Si un nombre se repite dentro de un corte, su n-ésima aparición cruza con la
+    n-ésima del otro, así ninguna fila sale duplicada. Las columnas llevan el sufijo del corte.
+    """
+    a = corte_1.add_suffix(' CORTE 1')
+    b = corte_2.add_suffix(' CORTE 2')
+    # Sin nombre no se cruza por nombre: clave propia de cada fila, que no coincide con nada
+    for tabla, sufijo in ((a, ' CORTE 1'), (b, ' CORTE 2')):
+        tabla['CLAVE' + sufijo] = tabla['CLAVE' + sufijo].fillna('\0' + sufijo + tabla['FILA' + sufijo].astype(str))
+
+    con_ruc_1 = a['RUC CORTE 1'].notna()
+    con_ruc_2 = b['RUC CORTE 2'].notna()
+    repetidos = set(a.loc[a['REPETIDO CORTE 1'], 'RUC CORTE 1']) | set(b.loc[b['REPETIDO CORTE 2'], 'RUC CORTE 2'])
+    unico_1 = con_ruc_1 & ~a['RUC CORTE 1'].isin(repetidos)
+    unico_2 = con_ruc_2 & ~b['RUC CORTE 2'].isin(repetidos)
+    por_ruc = a[unico_1].merge(b[unico_2], left_on='RUC CORTE 1', right_on='RUC CORTE 2', how='inner')
+    por_ruc['CRUCE POR'] = 'RUC'
+
+    resto_1 = a[con_ruc_1 & ~a['FILA CORTE 1'].isin(por_ruc['FILA CORTE 1'])].copy()
+    resto_2 = b[con_ruc_2 & ~b['FILA CORTE 2'].isin(por_ruc['FILA CORTE 2'])].copy()
+    columnas = ['RUC', 'CLAVE', 'N']
+    por_ruc_y_nombre = _con_ocurrencia(resto_1, columnas[:2], ' CORTE 1').merge(
+        _con_ocurrencia(resto_2, columnas[:2], ' CORTE 2'),
+        left_on=[c + ' CORTE 1' for c in columnas], right_on=[c + ' CORTE 2' for c in columnas], how='inner')
+    por_ruc_y_nombre['CRUCE POR'] = 'RUC Y AGENCIA'
+
+    cruzadas_1 = pd.concat([por_ruc['FILA CORTE 1'], por_ruc_y_nombre['FILA CORTE 1']])
+    cruzadas_2 = pd.concat([por_ruc['FILA CORTE 2'], por_ruc_y_nombre['FILA CORTE 2']])
+    resto_1 = _con_ocurrencia(a[~a['FILA CORTE 1'].isin(cruzadas_1)].copy(), ['CLAVE'], ' CORTE 1')
+    resto_2 = _con_ocurrencia(b[~b['FILA CORTE 2'].isin(cruzadas_2)].copy(), ['CLAVE'], ' CORTE 2')
+    por_nombre = resto_1.merge(resto_2, left_on=['CLAVE CORTE 1', 'N CORTE 1'],
+                               right_on=['CLAVE CORTE 2', 'N CORTE 2'], how='outer')
+    por_nombre['CRUCE POR'] = np.where(
+        por_nombre['FILA CORTE 1'].notna() & por_nombre['FILA CORTE 2'].notna(), 'AGENCIA', '')
+
+    return pd.concat([por_ruc, por_ruc_y_nombre, por_nombre], ignore_index=True)
+
+
+def _columna(cruce, nombre):
+    return cruce[nombre].to_numpy(dtype=float, na_value=np.nan)
+
+
+def _observaciones(marcas, n):
+    """Une en un texto las marcas (texto -> máscara booleana) de cada fila."""
+    observaciones = np.full(n, '', dtype=object)
+    for texto, mascara in marcas.items():
+        observaciones[mascara] = observaciones[mascara] + '; ' + texto
+    return pd.Series(observaciones, dtype=object).str.removeprefix('; ')
+
+
+def cruzar_cortes(archivo_corte_1, archivo_corte_2, tipo='lima'):
+    """
+    Cruza los consolidados de Corte 1 y Corte 2 (bytes o archivos subidos).
+    `tipo` ('lima' o 'provincia') fija cómo se leen las hojas y se normalizan los nombres.
+    Devuelve un ResultadoCruce; los errores de lectura se propagan como ValueError.
+    """
+    inicio = time.perf_counter()
+    normalizar = _NORMALIZAR[tipo]
+    df_1, reutilizada_1 = _leer_corte_1(bytes_de(archivo_corte_1), tipo)
+    df_2, reutilizada_2 = _leer_corte_2(bytes_de(archivo_corte_2))
+    cruce = _unir(_tabla_corte(df_1, MONTOS_CORTE_1, normalizar, HOJA_CORTE_1),
+                  _tabla_corte(df_2, MONTOS_CORTE_2, normalizar, HOJA_CORTE_2))
+
+    en_1 = cruce['FILA CORTE 1'].notna().to_numpy()
+    en_2 = cruce['FILA CORTE 2'].notna().to_numpy()
+    ambos = en_1 & en_2
+
+    altas_1, altas_2 = _columna(cruce, 'ALTAS CORTE 1'), _columna(cruce, 'ALTAS CORTE 2')
+    diferencia_altas = altas_2 - altas_1
+    altas_distintas = ambos & ~(np.abs(diferencia_altas) <= TOLERANCIA) & ~(np.isnan(altas_1) & np.isnan(altas_2))
+
+    pagado = _columna(cruce, 'TOTAL A PAGAR CORTE 1 CORTE 1')
+    ajuste = (np.nan_to_num(_columna(cruce, 'PENALIDAD 1 CORTE 2'))
+              + np.nan_to_num(_columna(cruce, 'CLAWBACK 1 CORTE 2')))
+    sin_pago = np.isnan(pagado) | (np.abs(pagado) <= TOLERANCIA)
+    hay_ajuste = np.abs(ajuste) > TOLERANCIA
+
+    ruc_1 = cruce['RUC CORTE 1'].astype('string')
+    ruc_2 = cruce['RUC CORTE 2'].astype('string')
+    ruc_distinto = (ambos & ruc_1.notna().to_numpy() & ruc_2.notna().to_numpy()
+                    & (ruc_1 != ruc_2).fillna(False).to_numpy(bool))
+
+    marcas = {
+        'NO ESTÁ EN CORTE 2': en_1 & ~en_2,
+        'NO ESTÁ EN CORTE 1': en_2 & ~en_1,
+        'RUC DISTINTO': ruc_distinto,
+        'RUC REPETIDO EN CORTE 1': cruce['REPETIDO CORTE 1'].fillna(False).to_numpy(bool),
+        'RUC REPETIDO EN CORTE 2': cruce['REPETIDO CORTE 2'].fillna(False).to_numpy(bool),
+        'ALTAS DISTINTAS': altas_distintas,
+        'AJUSTE SIN PAGO EN CORTE 1': ambos & hay_ajuste & sin_pago,
+        'AJUSTE MAYOR A LO PAGADO EN CORTE 1': ambos & ~sin_pago & (np.abs(ajuste) > np.abs(pagado) + TOLERANCIA),
+        'MONTO NO NUMÉRICO EN CORTE 1': cruce['NO NUMERICO CORTE 1'].fillna(False).to_numpy(bool),
+        'MONTO NO NUMÉRICO EN CORTE 2': cruce['NO NUMERICO CORTE 2'].fillna(False).to_numpy(bool),
+    }
+
+    detalle = pd.DataFrame({
+        'RUC': cruce['RUC CORTE 1'].fillna(cruce['RUC CORTE 2']),
+        'AGENCIA': cruce['AGENCIA CORTE 1'].fillna(cruce['AGENCIA CORTE 2']),
+        'PRESENCIA': np.select([ambos, en_1], [AMBOS, SOLO_CORTE_1], SOLO_CORTE_2),
+        'CRUCE POR': cruce['CRUCE POR'],
+        'ALTAS CORTE 1': altas_1,
+        'ALTAS CORTE 2': altas_2,
+        'DIFERENCIA ALTAS': diferencia_altas,
+        'TOTAL A PAGAR CORTE 1': pagado,
+        'PENALIDAD 1': _columna(cruce, 'PENALIDAD 1 CORTE 2'),
+        'CLAWBACK 1': _columna(cruce, 'CLAWBACK 1 CORTE 2'),
+        'AJUSTE CORTE 2': np.where(en_2, ajuste, np.nan),
+        'TOTAL A PAGAR CORTE 2': _columna(cruce, 'TOTAL A PAGAR CORTE 2 CORTE 2'),
+        'OBSERVACIONES': _observaciones(marcas, len(cruce)),
+    }, columns=COLUMNAS_DETALLE)
+    # Primero las observadas; dentro de cada grupo, por nombre
+    orden = np.lexsort((detalle['AGENCIA'].fillna('').to_numpy(str), detalle['OBSERVACIONES'].to_numpy() == ''))
+    detalle = detalle.iloc[orden].reset_index(drop=True)
+
+    # Agencias = filas distintas de cada hoja, no filas del cruce
+    filas_1 = cruce['FILA CORTE 1']
+    filas_2 = cruce['FILA CORTE 2']
+    resumen = {
+        'Agencias en Corte 1': int(filas_1.nunique()),
+        'Agencias en Corte 2': int(filas_2.nunique()),
+        'En ambos cortes': int(filas_1[ambos].nunique()),
+        'Solo en Corte 1': int(filas_1[en_1 & ~en_2].nunique()),
+        'Solo en Corte 2': int(filas_2[en_2 & ~en_1].nunique()),
+        'ALTAS distintas': int(altas_distintas.sum()),
+        'Con observaciones': int((detalle['OBSERVACIONES'] != '').sum()),
+    }
+    return ResultadoCruce(detalle, resumen, int(reutilizada_1) + int(reutilizada_2), time.perf_counter() - inicio)
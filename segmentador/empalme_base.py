@@ -0,0 +1,399 @@
+# segmentador/empalme_base.py
+"""
+Hoja BASE de cada agencia armada con las filas del XML del libro original.
+
+Escribir la BASE con pandas + xlsxwriter convierte cada celda leída del XML de
+vuelta a XML, una por una: es casi todo el tiempo de generación en agencias
+grandes, y de paso se pierden los formatos numéricos del archivo original.
+Aquí las filas se copian del XML de la hoja BASE del archivo subido:
+
+- en cada corrida se indexan las filas de datos de esa hoja (dónde empieza y
+  termina cada <row> en el XML crudo) y se verifica, contra el ASESOR de la BASE
+  leída, que la fila i del XML es la fila i del DataFrame (su índice);
+- pandas sigue escribiendo la hoja 'Reporte' y la cabecera de la hoja BASE;
+- al cerrar el libro se insertan las filas de la agencia, renumeradas y solo con
+  las columnas del reporte (fórmulas como valor), y se agregan al libro las
+  cadenas compartidas y los formatos numéricos que usan.
+
+Lo usan los procesos que leen la BASE con los valores tal cual (sin dtype=str) y
+solo cuando todo cuadra: columnas encontradas en la cabecera original, filas
+verificadas, una sola hoja, XML con la sintaxis habitual. Si algo no cuadra, esa
+agencia (o todo el archivo) se escribe con pandas como siempre.
+SEGMENTADOR_EMPALME=0 lo desactiva.
+"""
+import html
+import io
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+from openpyxl.utils.cell import get_column_letter
+
+from segmentador.base_salida import MAX_FILAS_EXCEL
+from segmentador.lectura import bytes_de
+from segmentador.xlsx_rapido import FormatoNoSoportado, LibroXlsx
+
+COLUMNA_ASESOR = 'ASESOR'
+
+_APERTURA_FILA = re.compile(rb'<row\b([^>]*?)(/?)>')
+_CIERRE_FILA = re.compile(rb'</row>')
+_NUMERO_FILA = re.compile(rb'\br="(\d+)"')
+# Celda con la referencia como primer atributo: (letras, otros atributos, contenido)
+_CELDA = re.compile(rb'<c r="([A-Z]{1,3})\d+"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_ATRIBUTO = re.compile(rb'(\w+)="([^"]*)"')
+_FORMULA = re.compile(rb'<f\b[^>]*/>|<f\b[^>]*>.*?</f>', re.S)
+_TEXTO = re.compile(rb'<t\b[^>]*>(.*?)</t>', re.S)
+_VALOR = re.compile(rb'<v>(.*?)</v>', re.S)
+_CON_DATO = re.compile(rb'<v>[^<]|<t\b[^>]*>[^<]')
+_SI = re.compile(rb'<si\b[^>]*?(?:/>|>.*?</si>)', re.S)
+
+_atributos_vistos = {}
+
+
+class NoEmpalmable(Exception):
+    """La hoja o la agencia no se puede armar copiando filas: se escribe con pandas."""
+
+
+def empalme_activo():
+    """False si SEGMENTADOR_EMPALME=0 (para comparar o descartar el armado por empalme)."""
+    return os.environ.get("SEGMENTADOR_EMPALME", "").strip().lower() not in ("0", "no", "false")
+
+
+def _atributos(crudo):
+    """(s, t) de los atributos de una celda; son pocas combinaciones, se guardan."""
+    resultado = _atributos_vistos.get(crudo)
+    if resultado is None:
+        valores = dict(_ATRIBUTO.findall(crudo))
+        resultado = _atributos_vistos[crudo] = (valores.get(b's'), valores.get(b't'))
+    return resultado
+
+
+class FuenteBase:
+    """Índice de las filas de datos de la hoja BASE del archivo original."""
+
+    def __init__(self, archivo, df_base, nombre_hoja='BASE'):
+        libro = LibroXlsx(io.BytesIO(archivo))
+        try:
+            ruta = libro.hojas.get(nombre_hoja)
+            if ruta is None:
+                raise NoEmpalmable(f"No hay hoja {nombre_hoja}")
+            self.crudo = libro.leer_parte(ruta)
+            # Todas las celdas con la referencia como primer atributo (lo que escriben Excel y xlsxwriter)
+            celdas = self.crudo.count(b'<c ') + self.crudo.count(b'<c>') + self.crudo.count(b'<c/>')
+            if not celdas or self.crudo.count(b'<c r="') != celdas:
+                raise NoEmpalmable("XML de hoja con otra sintaxis")
+            self.formatos_xf = libro.formatos_xf
+            self.fragmentos_textos = []
+            if libro.ruta_textos:
+                self.fragmentos_textos = _SI.findall(libro.zip.read(libro.ruta_textos))
+                if len(self.fragmentos_textos) != len(libro.textos):
+                    raise NoEmpalmable("Tabla de cadenas compartidas con otra sintaxis")
+            self._indexar(libro.textos, df_base)
+        finally:
+            libro.close()
+        self._columnas = {}
+
+    def _indexar(self, textos, df_base):
+        crudo = self.crudo
+        inicios, finales, asesores = [], [], []
+        cabecera = None
+        ultima_con_datos = -1
+        siguiente = 1  # número de fila que se espera a continuación
+        cierres = (m.start() for m in _CIERRE_FILA.finditer(crudo))
+        for fila in _APERTURA_FILA.finditer(crudo):
+            numero = _NUMERO_FILA.search(fila.group(1))
+            numero = int(numero.group(1)) if numero is not None else siguiente
+            if numero < siguiente:
+                raise NoEmpalmable("Filas repetidas o desordenadas")
+            siguiente = numero + 1
+            if fila.group(2):
+                inicio = fin = fila.end()  # <row .../> sin celdas
+            else:
+                inicio, fin = fila.end(), next(cierres, None)
+                if fin is None:
+                    raise NoEmpalmable("Fila sin cierre")
+            if cabecera is None:
+                if numero != 1:
+                    raise NoEmpalmable("La cabecera no está en la fila 1")
+                cabecera = {}
+                for letras, atributos, contenido in _CELDA.findall(crudo, inicio, fin):
+                    nombre = _texto_celda(_atributos(atributos), contenido, textos).strip().upper()
+                    cabecera[nombre] = None if nombre in cabecera else letras  # repetida: ambigua
+                columna_asesor = cabecera.get(COLUMNA_ASESOR)
+                if columna_asesor is None:
+                    raise NoEmpalmable("Sin columna ASESOR en la cabecera")
+                patron_asesor = re.compile(rb'<c r="' + columna_asesor + rb'\d+"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+                continue
+            # Filas ausentes del XML, vacías o solo con celdas sin valor: pandas las
+            # cuenta como filas de NaN si hay datos después (y recorta las del final)
+            while len(inicios) < numero - 2:
+                inicios.append(0)
+                finales.append(0)
+                asesores.append('')
+            inicios.append(inicio)
+            finales.append(fin)
+            if not _CON_DATO.search(crudo, inicio, fin):
+                asesores.append('')
+                continue
+            ultima_con_datos = len(inicios) - 1
+            celda = patron_asesor.search(crudo, inicio, fin)
+            asesores.append(_texto_celda(_atributos(celda.group(1)), celda.group(2) or b'', textos) if celda else '')
+        if cabecera is None:
+            raise NoEmpalmable("Hoja sin filas")
+        del inicios[ultima_con_datos + 1:], finales[ultima_con_datos + 1:], asesores[ultima_con_datos + 1:]
+        self.cabecera = cabecera
+        self.inicios = np.array(inicios, dtype=np.int64)
+        self.finales = np.array(finales, dtype=np.int64)
+
+        # Verificación: la fila i del XML es la fila con índice i de la BASE leída
+        etiquetas = df_base.index.to_numpy()
+        if COLUMNA_ASESOR not in df_base.columns or etiquetas.dtype.kind not in 'iu':
+            raise NoEmpalmable("BASE sin índice de posiciones")
+        if len(etiquetas) and (etiquetas.min() < 0 or etiquetas.max() >= len(asesores)):
+            raise NoEmpalmable("Más filas en la BASE que en el XML")
+        esperados = df_base[COLUMNA_ASESOR].astype(object).where(df_base[COLUMNA_ASESOR].notna(), '').map(str).to_numpy()
+        encontrados = np.array(asesores, dtype=object)[etiquetas]
+        if not np.array_equal(esperados, encontrados):
+            raise NoEmpalmable("Las filas del XML no coinciden con la BASE leída")
+
+    def destinos(self, columnas):
+        """{letras de la columna original: letras en el libro nuevo} para esas columnas, en ese orden."""
+        clave = tuple(columnas)
+        if clave not in self._columnas:
+            letras = [self.cabecera.get(str(c).strip().upper()) for c in columnas]
+            if None in letras or len(set(letras)) != len(letras):
+                self._columnas[clave] = None
+            else:
+                self._columnas[clave] = {
+                    origen: get_column_letter(i + 1).encode('ascii') for i, origen in enumerate(letras)
+                }
+        return self._columnas[clave]
+
+    def libro(self):
+        """Empalmes pendientes de un libro de salida (uno por archivo de agencia)."""
+        return LibroBase(self)
+
+    def filas_xml(self, posiciones, destinos, primera_fila, textos, estilos):
+        """Lista con el XML de cada fila de `posiciones`, numeradas desde `primera_fila`, con textos y estilos remapeados."""
+        crudo = self.crudo
+        filas = []
+        tramos = zip(self.inicios[posiciones].tolist(), self.finales[posiciones].tolist())
+        for numero, (inicio, fin) in enumerate(tramos, start=primera_fila):
+            # Una lista por fila: con millones de fragmentos sueltos la memoria se dispara en agencias grandes
+            partes = []
+            agregar = partes.append
+            sufijo = b'%d"' % numero
+            agregar(b'<row r="%d">' % numero)
+            for letras, atributos, contenido in _CELDA.findall(crudo, inicio, fin):
+                destino = destinos.get(letras)
+                if destino is None or not contenido:
+                    continue
+                if b'<f' in contenido:
+                    contenido = _FORMULA.sub(b'', contenido)
+                    if not contenido:
+                        continue
+                estilo, tipo = _atributos(atributos)
+                agregar(b'<c r="')
+                agregar(destino)
+                agregar(sufijo)
+                if estilo is not None and estilo != b'0':
+                    nuevo = estilos[int(estilo)]
+                    if nuevo:
+                        agregar(b' s="%d"' % nuevo)
+                if tipo == b's':
+                    valor = _VALOR.search(contenido)
+                    agregar(textos.celda(int(valor.group(1))) if valor else b'></c>')
+                    continue
+                if tipo is not None:
+                    agregar(b' t="' + tipo + b'"')
+                agregar(b'>')
+                agregar(contenido)
+                agregar(b'</c>')
+            agregar(b'</row>')
+            filas.append(b''.join(partes))
+        return filas
+
+
+def _texto_celda(s_t, contenido, textos):
+    """Valor de texto de una celda para comparar con lo leído por pandas."""
+    tipo = s_t[1]
+    if tipo == b'inlineStr':
+        return html.unescape(b''.join(_TEXTO.findall(contenido)).decode('utf-8'))
+    valor = _VALOR.search(contenido)
+    if valor is None:
+        return ''
+    if tipo == b's':
+        return textos[int(valor.group(1))]
+    return html.unescape(valor.group(1).decode('utf-8'))
+
+
+class _TextosSalida:
+    """Cadenas compartidas del libro nuevo: las del libro de xlsxwriter más las que se van usando."""
+
+    def __init__(self, fragmentos, existentes, en_linea):
+        self.fragmentos = fragmentos
+        self.existentes = existentes
+        self.en_linea = en_linea  # el libro nuevo no tiene tabla de cadenas: se escriben en la celda
+        self.nuevos = {}
+        self.orden = []
+        self.referencias = 0
+
+    def celda(self, indice):
+        """Final de la celda (desde el tipo) para la cadena `indice` del libro original."""
+        fragmento = self.fragmentos[indice]
+        if self.en_linea:
+            interior = fragmento[fragmento.index(b'>') + 1:-len(b'</si>')] if not fragmento.endswith(b'/>') else b''
+            return b' t="inlineStr"><is>' + interior + b'</is></c>'
+        nuevo = self.nuevos.get(indice)
+        if nuevo is None:
+            nuevo = self.nuevos[indice] = self.existentes + len(self.orden)
+            self.orden.append(fragmento)
+        self.referencias += 1
+        return b' t="s"><v>%d</v></c>' % nuevo
+
+
+class _EstilosSalida(dict):
+    """Estilo original -> estilo nuevo con el mismo formato numérico (0 si es General)."""
+
+    def __init__(self, formatos_xf, existentes):
+        super().__init__()
+        self.formatos_xf = formatos_xf
+        self.existentes = existentes
+        self.orden = []
+
+    def __missing__(self, indice):
+        id_formato, codigo = self.formatos_xf[indice] if indice < len(self.formatos_xf) else (0, None)
+        if not id_formato:
+            self[indice] = 0
+        else:
+            self[indice] = self.existentes + len(self.orden)
+            self.orden.append((id_formato, codigo))
+        return self[indice]
+
+
+class LibroBase:
+    """BASE pendientes de un libro: se escriben con cabecera y se completan al cerrar."""
+
+    def __init__(self, fuente):
+        self.fuente = fuente
+        self.pendientes = []
+
+    def escribir(self, writer, df_base, nombre_hoja='BASE', max_filas=MAX_FILAS_EXCEL):
+        """Cabecera de la hoja con pandas y filas pendientes de empalme; None si no se puede empalmar."""
+        destinos = self.fuente.destinos(df_base.columns)
+        posiciones = df_base.index.to_numpy()
+        if destinos is None or len(posiciones) > max_filas - 1 or posiciones.dtype.kind not in 'iu':
+            return None
+        if len(posiciones) and (posiciones.min() < 0 or posiciones.max() >= len(self.fuente.inicios)):
+            return None
+        df_base.iloc[0:0].to_excel(writer, sheet_name=nombre_hoja, index=False)
+        self.pendientes.append((nombre_hoja, posiciones, destinos, len(df_base.columns)))
+        return [nombre_hoja]
+
+    def completar(self, contenido):
+        """Bytes del libro con las filas pendientes insertadas en sus hojas."""
+        if not self.pendientes:
+            return contenido
+        libro = LibroXlsx(io.BytesIO(contenido))
+        try:
+            rutas = {nombre: libro.hojas[nombre] for nombre, *_ in self.pendientes}
+            ruta_textos = libro.ruta_textos if libro.ruta_textos in libro.zip.namelist() else None
+            ruta_estilos = next(r for r in libro.zip.namelist() if r.endswith('styles.xml'))
+            partes = {ruta: libro.zip.read(ruta) for ruta in [*rutas.values(), ruta_estilos] + ([ruta_textos] if ruta_textos else [])}
+            existentes = len(libro.textos)
+            xfs = len(libro.formatos_xf)
+        finally:
+            libro.close()
+
+        textos = _TextosSalida(self.fuente.fragmentos_textos, existentes, en_linea=ruta_textos is None)
+        estilos = _EstilosSalida(self.fuente.formatos_xf, xfs)
+        for nombre, posiciones, destinos, ancho in self.pendientes:
+            filas = self.fuente.filas_xml(posiciones, destinos, 2, textos, estilos)
+            partes[rutas[nombre]] = _insertar_filas(partes[rutas[nombre]], filas, len(posiciones) + 1, ancho)
+        if textos.orden:
+            partes[ruta_textos] = _agregar_textos(partes[ruta_textos], textos)
+        if estilos.orden:
+            partes[ruta_estilos] = _agregar_estilos(partes[ruta_estilos], estilos.orden)
+        self.pendientes = []
+        return _reescribir_zip(contenido, partes)
+
+
+def _insertar_filas(hoja, filas, ultima_fila, ancho):
+    """Partes de la hoja (cabecera, filas y cierre) sin unirlas: se escriben tal cual en el zip."""
+    if b'</sheetData>' not in hoja:
+        raise NoEmpalmable("Hoja de salida sin datos")
+    referencia = b'A1:%s%d' % (get_column_letter(max(ancho, 1)).encode('ascii'), ultima_fila)
+    hoja = re.sub(rb'<dimension ref="[^"]*"/>', b'<dimension ref="' + referencia + b'"/>', hoja, count=1)
+    antes, despues = hoja.split(b'</sheetData>', 1)
+    return [antes, *filas, b'</sheetData>' + despues]
+
+
+def _agregar_textos(sst, textos):
+    sst = sst.replace(b'</sst>', b''.join(textos.orden) + b'</sst>', 1)
+
+    def contar(m):
+        total = int(m.group(2)) + (textos.referencias if m.group(1) == b'count' else len(textos.orden))
+        return m.group(1) + b'="%d"' % total
+    inicio = sst.index(b'<sst')
+    fin = sst.index(b'>', inicio)
+    return sst[:inicio] + re.sub(rb'\b(count|uniqueCount)="(\d+)"', contar, sst[inicio:fin]) + sst[fin:]
+
+
+def _agregar_estilos(estilos_xml, nuevos):
+    """Agrega un xf por estilo nuevo (mismo formato numérico, fuente y bordes por defecto)."""
+    ids_existentes = [int(i) for i in re.findall(rb'<numFmt numFmtId="(\d+)"', estilos_xml)]
+    codigos = {}
+    siguiente = max(ids_existentes + [163]) + 1
+    nuevos_formatos = []
+    xfs = []
+    for id_formato, codigo in nuevos:
+        if id_formato >= 164:
+            if codigo not in codigos:
+                codigos[codigo] = siguiente
+                nuevos_formatos.append(b'<numFmt numFmtId="%d" formatCode="%s"/>' % (
+                    siguiente, escape(codigo, {'"': '&quot;'}).encode('utf-8')))
+                siguiente += 1
+            id_formato = codigos[codigo]
+        xfs.append(b'<xf numFmtId="%d" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>' % id_formato)
+
+    if nuevos_formatos:
+        if b'<numFmts' in estilos_xml:
+            estilos_xml = estilos_xml.replace(b'</numFmts>', b''.join(nuevos_formatos) + b'</numFmts>', 1)
+            estilos_xml = re.sub(rb'<numFmts count="(\d+)"',
+                                 lambda m: b'<numFmts count="%d"' % (int(m.group(1)) + len(nuevos_formatos)), estilos_xml, count=1)
+        else:
+            estilos_xml = estilos_xml.replace(
+                b'<fonts', b'<numFmts count="%d">' % len(nuevos_formatos) + b''.join(nuevos_formatos) + b'</numFmts><fonts', 1)
+    estilos_xml = estilos_xml.replace(b'</cellXfs>', b''.join(xfs) + b'</cellXfs>', 1)
+    return re.sub(rb'<cellXfs count="(\d+)"', lambda m: b'<cellXfs count="%d"' % (int(m.group(1)) + len(xfs)),
+                  estilos_xml, count=1)
+
+
+def _reescribir_zip(contenido, partes):
+    salida = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(contenido)) as origen, zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as destino:
+        for info in origen.infolist():
+            parte = partes.get(info.filename) or origen.read(info.filename)
+            if isinstance(parte, bytes):
+                destino.writestr(info, parte)
+                continue
+            with destino.open(info, 'w') as flujo:
+                for trozo in parte:
+                    flujo.write(trozo)
+    return salida.getvalue()
+
+
+def fuente_base(archivo, df_base, nombre_hoja='BASE'):
+    """
+    FuenteBase del archivo para una corrida, o None si no se puede empalmar.
+    No se guarda en `datos`: el XML crudo de la hoja pesa tanto como el archivo
+    descomprimido y `datos` queda en la sesión (validación, vista por agencia).
+    """
+    if not empalme_activo():
+        return None
+    try:
+        return FuenteBase(bytes_de(archivo), df_base, nombre_hoja)
+    except (NoEmpalmable, FormatoNoSoportado, zipfile.BadZipFile, KeyError, ValueError, IndexError):
+        return None
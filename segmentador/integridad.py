@@ -0,0 +1,217 @@
+# segmentador/integridad.py
+"""
+Integridad de la BASE: COD_PEDIDO duplicados, pedidos en más de una agencia y
+filas de BASE que no caen en ninguna agencia.
+
+Son las causas habituales de un DESCUADRE: una fila cuyo ASESOR no coincide con
+ninguna agencia del reporte se queda fuera de todos los archivos sin aviso, y un
+COD_PEDIDO repetido (o asignado a dos agencias) infla el conteo de la BASE.
+
+Todo sale de dos índices hash armados en una pasada sobre la BASE:
+- asesor normalizado -> agencia(s) que lo reclaman (incluidos los alias);
+- COD_PEDIDO -> filas (`duplicated` de pandas, también por hash).
+El costo es lineal en la cantidad de filas; los agrupamientos posteriores solo
+recorren las filas duplicadas o huérfanas.
+
+El resultado va al log (una línea) y, si se pide (`resumen=True` en los procesos),
+a la hoja 'Integridad' del libro de resumen que se agrega al zip, junto con la hoja
+'Agencias' (registros por agencia).
+"""
+import io
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+COLUMNA_PEDIDO = 'COD_PEDIDO'
+NOMBRE_RESUMEN = "Resumen del proceso.xlsx"
+MUESTRAS = 50
+
+
+def _clave_pedido(valor):
+    """COD_PEDIDO comparable: 123, 123.0 y ' 123 ' son el mismo pedido; vacío -> None."""
+    if valor is None or (isinstance(valor, float) and valor != valor):
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    texto = str(valor).strip()
+    return texto or None
+
+
+def _claves_pedido(serie):
+    """`_clave_pedido` sobre toda la columna; vectorizado cuando el tipo es uniforme."""
+    if pd.api.types.is_integer_dtype(serie):
+        return serie.astype(str)
+    if isinstance(serie.dtype, pd.StringDtype):
+        texto = serie.str.strip()
+        return texto.where(texto != "")
+    return serie.map(_clave_pedido)
+
+
+def _unir(valores):
+    return ", ".join(sorted({str(v) for v in valores.dropna()}))
+
+
+def indice_asesores(agencias, mapeo_alias=None):
+    """{asesor normalizado: [agencias que lo toman]}, con la misma regla de alias que los procesos."""
+    mapeo_alias = mapeo_alias or {}
+    indice = {}
+    for agencia in agencias:
+        for asesor in mapeo_alias.get(agencia, [agencia]):
+            agencias_asesor = indice.setdefault(asesor, [])
+            if agencia not in agencias_asesor:
+                agencias_asesor.append(agencia)
+    return indice
+
+
+@dataclass
+class ResultadoIntegridad:
+    filas_base: int = 0
+    con_codigo: bool = True
+    filas_sin_codigo: int = 0
+    codigos_unicos: int = 0
+    codigos_duplicados: int = 0
+    filas_duplicadas: int = 0
+    colisiones: int = 0
+    filas_huerfanas: int = 0
+    asesores_huerfanos: int = 0
+    muestras: dict = field(default_factory=dict)
+
+    def sin_problemas(self):
+        return not (self.codigos_duplicados or self.colisiones or self.filas_huerfanas)
+
+    def texto(self):
+        """Resumen de una línea para el log."""
+        partes = []
+        if self.con_codigo:
+            partes.append(f"COD_PEDIDO duplicados: {self.codigos_duplicados} ({self.filas_duplicadas} filas)")
+            partes.append(f"en más de una agencia: {self.colisiones}")
+        else:
+            partes.append(f"sin columna {COLUMNA_PEDIDO}")
+        partes.append(f"filas BASE sin agencia: {self.filas_huerfanas} ({self.asesores_huerfanos} asesores)")
+        return " | ".join(partes)
+
+    def indicadores(self):
+        filas = [
+            ("Filas en BASE", self.filas_base),
+            ("Filas sin COD_PEDIDO", self.filas_sin_codigo if self.con_codigo else "sin columna"),
+            ("COD_PEDIDO distintos", self.codigos_unicos),
+            ("COD_PEDIDO duplicados", self.codigos_duplicados),
+            ("Filas con COD_PEDIDO duplicado", self.filas_duplicadas),
+            ("COD_PEDIDO en más de una agencia", self.colisiones),
+            ("Filas de BASE sin agencia", self.filas_huerfanas),
+            ("Asesores sin agencia", self.asesores_huerfanos),
+        ]
+        return pd.DataFrame(filas, columns=["Indicador", "Valor"])
+
+    def escribir_hoja(self, writer, nombre_hoja='Integridad'):
+        """Indicadores y, debajo, una muestra de cada problema encontrado."""
+        indicadores = self.indicadores()
+        indicadores.to_excel(writer, sheet_name=nombre_hoja, index=False)
+        hoja = writer.sheets[nombre_hoja]
+        hoja.set_column(0, 0, 36)
+        hoja.set_column(1, 6, 22)
+        fila = len(indicadores) + 2
+        titulos = {
+            'duplicados': "COD_PEDIDO duplicados",
+            'colisiones': "COD_PEDIDO en más de una agencia",
+            'asesores_huerfanos': "Asesores de BASE sin agencia",
+            'huerfanas': "Filas de BASE sin agencia",
+        }
+        for clave, titulo in titulos.items():
+            muestra = self.muestras.get(clave)
+            if muestra is None or muestra.empty:
+                continue
+            hoja.write(fila, 0, f"{titulo} (muestra de {len(muestra)})")
+            muestra.to_excel(writer, sheet_name=nombre_hoja, index=False, startrow=fila + 1)
+            fila += len(muestra) + 3
+
+
+def verificar_integridad(df_base, columna_asesor, agencias, mapeo_alias=None, muestras=MUESTRAS):
+    """
+    Revisa la BASE (ya filtrada por zona si corresponde) contra las agencias que se van
+    a generar. `columna_asesor` es la columna de asesor normalizado que usa el proceso.
+    """
+    resultado = ResultadoIntegridad(filas_base=len(df_base))
+    indice = indice_asesores(agencias, mapeo_alias)
+
+    # --- Índice asesor -> agencia: una búsqueda hash por fila ---
+    asesores = df_base[columna_asesor] if columna_asesor in df_base.columns else pd.Series("", index=df_base.index)
+    agencia_fila = asesores.map({asesor: ags[0] for asesor, ags in indice.items()})
+    huerfanas = agencia_fila.isna()
+    asesor_original = df_base['ASESOR'] if 'ASESOR' in df_base.columns else asesores
+
+    resultado.filas_huerfanas = int(huerfanas.sum())
+    if resultado.filas_huerfanas:
+        por_asesor = asesor_original[huerfanas].fillna("(vacío)").value_counts()
+        resultado.asesores_huerfanos = len(por_asesor)
+        resultado.muestras['asesores_huerfanos'] = por_asesor.head(muestras).rename_axis('ASESOR').reset_index(name='FILAS')
+        columnas_muestra = [c for c in (COLUMNA_PEDIDO, 'ASESOR', 'ZONA', 'DEPARTAMENTO') if c in df_base.columns]
+        resultado.muestras['huerfanas'] = df_base.loc[huerfanas, columnas_muestra].head(muestras)
+
+    # --- Índice COD_PEDIDO -> filas ---
+    if COLUMNA_PEDIDO not in df_base.columns:
+        resultado.con_codigo = False
+        return resultado
+    codigos = _claves_pedido(df_base[COLUMNA_PEDIDO])
+    con_codigo = codigos.notna()
+    resultado.filas_sin_codigo = int((~con_codigo).sum())
+    resultado.codigos_unicos = int(codigos[con_codigo].nunique())
+    duplicadas = con_codigo & codigos.duplicated(keep=False)
+    resultado.filas_duplicadas = int(duplicadas.sum())
+
+    # Un asesor reclamado por dos agencias pone cada una de sus filas en dos archivos
+    ambiguos = {asesor: ags for asesor, ags in indice.items() if len(ags) > 1}
+    filas_ambiguas = asesores.isin(list(ambiguos)) & con_codigo if ambiguos else pd.Series(False, index=df_base.index)
+    revisar = duplicadas | filas_ambiguas
+    if not revisar.any():
+        return resultado
+
+    pares = pd.DataFrame({
+        COLUMNA_PEDIDO: codigos[revisar],
+        'ASESOR': asesor_original[revisar],
+        'AGENCIA': agencia_fila[revisar],
+        'EN_BASE': 1,
+    })
+    if ambiguos:
+        extra = pares[asesores[revisar].isin(list(ambiguos))].copy()
+        extra['AGENCIA'] = asesores[revisar][extra.index].map(lambda a: ambiguos[a][1:])
+        extra['EN_BASE'] = 0  # copia por la segunda agencia: no es otra fila de la BASE
+        pares = pd.concat([pares, extra.explode('AGENCIA')], ignore_index=True)
+
+    # Conteos vectorizados; el texto de asesores y agencias solo para las muestras
+    grupos = pares.groupby(COLUMNA_PEDIDO, sort=False).agg(
+        FILAS=('EN_BASE', 'sum'), N_AGENCIAS=('AGENCIA', 'nunique'),
+    )
+    duplicados = grupos[grupos['FILAS'] > 1]
+    resultado.codigos_duplicados = len(duplicados)
+    colisiones = grupos[grupos['N_AGENCIAS'] > 1]
+    resultado.colisiones = len(colisiones)
+    for clave, tabla in (('duplicados', duplicados), ('colisiones', colisiones)):
+        if len(tabla):
+            resultado.muestras[clave] = _detalle(pares, tabla.head(muestras))
+    return resultado
+
+
+def _detalle(pares, grupos):
+    """Muestra de códigos con la lista de asesores y agencias de cada uno."""
+    filas = pares[pares[COLUMNA_PEDIDO].isin(grupos.index)]
+    textos = filas.groupby(COLUMNA_PEDIDO, sort=False).agg(ASESORES=('ASESOR', _unir), AGENCIAS=('AGENCIA', _unir))
+    return grupos[['FILAS']].join(textos).reset_index()
+
+
+def integridad_de(datos, columna_asesor, agencias, mapeo_alias=None):
+    """`verificar_integridad` sobre datos['base'], guardado en `datos` para no repetirlo al regenerar."""
+    if 'integridad' not in datos:
+        datos['integridad'] = verificar_integridad(datos['base'], columna_asesor, agencias, mapeo_alias)
+    return datos['integridad']
+
+
+def libro_resumen(bitacora, integridad):
+    """Bytes del libro de resumen: hoja 'Agencias' (registros) y hoja 'Integridad'."""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        agencias = pd.DataFrame(bitacora.registros_dict())
+        agencias.to_excel(writer, sheet_name='Agencias', index=False)
+        writer.sheets['Agencias'].set_column(0, max(len(agencias.columns) - 1, 0), 18)
+        integridad.escribir_hoja(writer)
+    return buffer.getvalue()
@@ -0,0 +1,187 @@
+# segmentador/lectura.py
+"""
+Lectura concurrente de las hojas del Excel subido.
+
+openpyxl lee en Python puro, así que un solo proceso no aprovecha más de un CPU.
+Las hojas de reporte y BASE son independientes: la primera se lee en el proceso
+de la página y las demás en procesos de trabajo, al mismo tiempo.
+
+Para que la comunicación cueste poco frente a la lectura:
+- al trabajador solo se le envían los bytes del archivo y los argumentos de
+  `pd.read_excel` (nada de objetos de Streamlit);
+- el pool se crea una vez y se reutiliza: pandas y openpyxl ya están importados;
+- el DataFrame vuelve como un único bloque pickle protocolo 5 (copias contiguas
+  de los arreglos de cada columna, sin recorrer celda por celda).
+
+Con un solo CPU, o con SEGMENTADOR_LECTURA_PARALELA=0, todo se lee en el mismo
+proceso, igual que antes.
+
+Cada hoja se lee con el lector por streaming de `xlsx_rapido` (mismo DataFrame
+que `pd.read_excel`, dos a tres veces más rápido); si el archivo o los argumentos no
+le corresponden, o con SEGMENTADOR_LECTOR=openpyxl, se usa `pd.read_excel`.
+
+`leer_reporte_y_base` consulta antes la caché de BASE (segmentador/cache_base.py):
+si la misma hoja BASE ya se leyó para otro reporte del periodo, solo se lee el reporte.
+La hoja de reporte también queda guardada (por hash del archivo) para `leer_reporte`.
+"""
+import io
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from segmentador import cache_base
+from segmentador.cache_resultados import hash_contenido
+from segmentador.xlsx_rapido import FormatoNoSoportado, huella_hoja, leer_excel
+
+_pool = None
+_candado_pool = threading.Lock()
+
+
+def lectura_paralela_activa():
+    """True si conviene leer hojas en otros procesos (más de un CPU o forzado por variable de entorno)."""
+    valor = os.environ.get("SEGMENTADOR_LECTURA_PARALELA")
+    if valor is not None:
+        return valor.strip().lower() not in ("", "0", "no", "false")
+    return (os.cpu_count() or 1) > 1
+
+
+def lector_rapido_activo():
+    """False si SEGMENTADOR_LECTOR=openpyxl (para comparar o descartar el lector por streaming)."""
+    return os.environ.get("SEGMENTADOR_LECTOR", "").strip().lower() != "openpyxl"
+
+
+def _pool_lectura():
+    """Pool de procesos compartido; 'spawn' para no heredar hilos del servidor de Streamlit."""
+    global _pool
+    with _candado_pool:
+        if _pool is None:
+            trabajadores = max(1, min(3, (os.cpu_count() or 2) - 1))
+            _pool = ProcessPoolExecutor(max_workers=trabajadores, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _descartar_pool():
+    global _pool
+    with _candado_pool:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def bytes_de(archivo):
+    """Bytes del archivo (bytes, UploadedFile/BytesIO o cualquier objeto con read)."""
+    if isinstance(archivo, (bytes, bytearray)):
+        return bytes(archivo)
+    if hasattr(archivo, "getvalue"):
+        return archivo.getvalue()
+    archivo.seek(0)
+    return archivo.read()
+
+
+def _leer_hoja(datos, argumentos):
+    import pandas as pd
+
+    if lector_rapido_activo():
+        try:
+            return leer_excel(io.BytesIO(datos), **argumentos)
+        except FormatoNoSoportado:
+            pass
+    return pd.read_excel(io.BytesIO(datos), **argumentos)
+
+
+def leer_hoja(archivo, **argumentos):
+    """Una sola hoja, en este proceso (mismos argumentos y resultado que `pd.read_excel`)."""
+    return _leer_hoja(bytes_de(archivo), argumentos)
+
+
+def _leer_hoja_serializada(datos, argumentos):
+    """Se ejecuta en el trabajador: lee la hoja y la devuelve ya serializada."""
+    return pickle.dumps(_leer_hoja(datos, argumentos), protocol=5)
+
+
+def leer_hojas(archivo, *lecturas):
+    """
+    Lee varias hojas de un mismo Excel. Cada lectura es un dict con los argumentos
+    de `pd.read_excel` (sheet_name, header, dtype, engine...). Devuelve los
+    DataFrames en el mismo orden. Los errores de lectura se propagan igual que
+    con `pd.read_excel`.
+    """
+    datos = bytes_de(archivo)
+    if len(lecturas) < 2 or not lectura_paralela_activa():
+        return [_leer_hoja(datos, argumentos) for argumentos in lecturas]
+
+    try:
+        pool = _pool_lectura()
+        futuros = [pool.submit(_leer_hoja_serializada, datos, argumentos) for argumentos in lecturas[1:]]
+    except (BrokenProcessPool, RuntimeError):
+        _descartar_pool()
+        return [_leer_hoja(datos, argumentos) for argumentos in lecturas]
+
+    resultados = [_leer_hoja(datos, lecturas[0])]
+    for futuro, argumentos in zip(futuros, lecturas[1:]):
+        try:
+            resultados.append(pickle.loads(futuro.result()))
+        except BrokenProcessPool:
+            # Un trabajador murió (p. ej. por memoria): se reintenta aquí mismo
+            _descartar_pool()
+            resultados.append(_leer_hoja(datos, argumentos))
+    return resultados
+
+
+def _clave_reporte(datos, argumentos):
+    """Clave de una hoja de reporte en la caché (hash del archivo completo), o None si está desactivada."""
+    if not cache_base.capacidad():
+        return None
+    return cache_base.clave_lectura(hash_contenido(datos), argumentos, lector_rapido_activo())
+
+
+def reporte_en_cache(archivo, argumentos):
+    """La hoja de reporte ya leída de este archivo con estos argumentos, o None."""
+    clave = _clave_reporte(bytes_de(archivo), argumentos)
+    return None if clave is None else cache_base.buscar_reporte(clave)
+
+
+def leer_reporte(archivo, argumentos):
+    """
+    Una hoja de reporte, reutilizando la lectura que ya hizo un proceso sobre el mismo
+    archivo con los mismos argumentos. Devuelve (df, reutilizada).
+    """
+    datos = bytes_de(archivo)
+    clave = _clave_reporte(datos, argumentos)
+    if clave is not None:
+        df = cache_base.buscar_reporte(clave)
+        if df is not None:
+            return df, True
+    df = _leer_hoja(datos, argumentos)
+    if clave is not None:
+        cache_base.guardar_reporte(clave, df)
+    return df, False
+
+
+def leer_reporte_y_base(archivo, lectura_reporte, lectura_base):
+    """
+    Como `leer_hojas(archivo, lectura_reporte, lectura_base)`, pero la BASE sale de la
+    caché si ya se leyó una hoja idéntica con los mismos argumentos.
+    Devuelve (df_reporte, df_base, reutilizada).
+    """
+    datos = bytes_de(archivo)
+    clave = None
+    if cache_base.capacidad():
+        try:
+            huella = huella_hoja(datos, lectura_base.get('sheet_name', 0))
+        except (FormatoNoSoportado, KeyError, ValueError, OSError):
+            huella = None
+        if huella is not None:
+            clave = cache_base.clave_lectura(huella, lectura_base, lector_rapido_activo())
+            df_base = cache_base.buscar(clave)
+            if df_base is not None:
+                return leer_reporte(datos, lectura_reporte)[0], df_base, True
+
+    df_reporte, df_base = leer_hojas(datos, lectura_reporte, lectura_base)
+    if clave is not None:
+        cache_base.guardar(clave, df_base)
+        cache_base.guardar_reporte(_clave_reporte(datos, lectura_reporte), df_reporte)
+    return df_reporte, df_base, False
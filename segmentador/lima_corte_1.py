@@ -0,0 +1,297 @@
+# segmentador/lima_corte_1.py
+"""Segmentación del consolidado de Lima (hojas 'Reporte CORTE 1' y 'BASE')."""
+import io
+import time
+
+import pandas as pd
+
+from segmentador.alias import ALIAS_LIMA, mapeo_alias
+from segmentador.base_salida import FORMATO_XLSX, escribir_base
+from segmentador.empalme_base import fuente_base
+from segmentador.integridad import NOMBRE_RESUMEN, integridad_de, libro_resumen
+from segmentador.lectura import leer_hoja, leer_reporte_y_base
+from segmentador.metricas import marcar_etapa
+from segmentador.normalizacion import normalizar_nombre_agencia
+from segmentador.particion import filas_de_asesores, particion_base
+from segmentador.registros import DESCUADRE, ERROR, OK, Bitacora, RegistroAgencia
+from segmentador.salida import SalidaValidacion, SalidaZip, limpiar_nombre_archivo
+
+
+# ================= Utilidad para manejar el archivo =================
+def _to_bio(archivo_data):
+    """Devuelve un BytesIO fresco (evita puntero agotado)."""
+    if isinstance(archivo_data, (bytes, bytearray)):
+        return io.BytesIO(archivo_data)
+    if hasattr(archivo_data, 'getvalue'):
+        # UploadedFile de Streamlit
+        try:
+            return io.BytesIO(archivo_data.getvalue())
+        except Exception:
+            pass
+    # Último recurso: leer todo y crear BytesIO
+    try:
+        data = archivo_data.read()
+        return io.BytesIO(data)
+    except Exception:
+        return io.BytesIO()
+
+def detectar_fila_cabecera(archivo_data, nombre_hoja):
+    """
+    Detecta si las cabeceras están en la fila 0 o fila 1.
+    Retorna el número de fila (0 o 1) donde están las cabeceras.
+    """
+    cabeceras_esperadas = ['RUC', 'AGENCIA', 'META', 'GRUPO', 'ALTAS', 'ARPU SIN IGV', 'CORTE 1']
+    
+    # Intentar fila 0
+    try:
+        df_test = leer_hoja(_to_bio(archivo_data), sheet_name=nombre_hoja, header=0, nrows=0)
+        cols_fila_0 = [str(col).strip().upper() for col in df_test.columns]
+        if all(cab in cols_fila_0 for cab in cabeceras_esperadas[:3]):  # Verificar al menos las primeras 3
+            return 0
+    except Exception:
+        pass
+    
+    # Intentar fila 1
+    try:
+        df_test = leer_hoja(_to_bio(archivo_data), sheet_name=nombre_hoja, header=1, nrows=0)
+        cols_fila_1 = [str(col).strip().upper() for col in df_test.columns]
+        if all(cab in cols_fila_1 for cab in cabeceras_esperadas[:3]):
+            return 1
+    except Exception:
+        pass
+    
+    # Por defecto, asumir fila 0
+    return 0
+
+# ================= Lectura y validación =================
+def cargar_datos(archivo_excel_cargado):
+    """
+    Lee y prepara las hojas 'Reporte CORTE 1' y 'BASE'.
+    Devuelve (datos, log); datos es None si el archivo no se pudo leer.
+    """
+    log_output = []
+    log_output.append("--- INICIO DEL PROCESO DE REPORTES LIMA ---")
+    marcar_etapa("validacion")
+
+    # Capturar bytes una sola vez
+    try:
+        excel_bytes = archivo_excel_cargado.getvalue() if hasattr(archivo_excel_cargado, 'getvalue') else archivo_excel_cargado.read()
+    except Exception:
+        excel_bytes = None
+
+    # Detectar en qué fila están las cabeceras
+    fila_cabecera = detectar_fila_cabecera(excel_bytes if excel_bytes is not None else archivo_excel_cargado, 'Reporte CORTE 1')
+    log_output.append(f"✓ Cabeceras detectadas en la fila {fila_cabecera + 1} de la hoja 'Reporte CORTE 1'")
+
+    # Leer hojas con el header correcto
+    marcar_etapa("lectura")
+    try:
+        # Reporte y BASE a la vez: la BASE se lee en otro proceso o sale de la caché (ver segmentador/lectura.py)
+        df_reporte_total, df_base_total, base_reutilizada = leer_reporte_y_base(
+            _to_bio(excel_bytes if excel_bytes is not None else archivo_excel_cargado),
+            dict(sheet_name='Reporte CORTE 1', header=fila_cabecera, engine='openpyxl'),
+            dict(sheet_name='BASE', engine='openpyxl'),
+        )
+        if base_reutilizada:
+            log_output.append("✓ Hoja 'BASE' idéntica a una ya leída: se reutiliza sin volver a leerla")
+
+        # Estandarizar nombres de columnas
+        marcar_etapa("preparacion")
+        df_reporte_total.columns = df_reporte_total.columns.str.strip().str.upper()
+        df_base_total.columns = df_base_total.columns.str.strip().str.upper()
+        log_output.append("✓ Columnas estandarizadas a mayúsculas")
+        
+        # Normalizar nombres de agencias para evitar problemas de mayúsculas/minúsculas
+        if 'AGENCIA' in df_reporte_total.columns:
+            df_reporte_total['AGENCIA_NORMALIZADA'] = df_reporte_total['AGENCIA'].apply(normalizar_nombre_agencia)
+            df_reporte_total['AGENCIA_ORIGINAL'] = df_reporte_total['AGENCIA']  # Guardar original para el nombre del archivo
+        
+        if 'ASESOR' in df_base_total.columns:
+            df_base_total['ASESOR_NORMALIZADO'] = df_base_total['ASESOR'].apply(normalizar_nombre_agencia)
+        
+        # Validar que las cabeceras esperadas existan
+        cabeceras_reporte_esperadas = ['RUC', 'AGENCIA', 'META', 'GRUPO', 'ALTAS', 'ARPU SIN IGV', 
+                                       'CORTE 1', 'CUMPLIMIENTO ALTAS %', 'MARCHA BLANCA', 
+                                       'MULTIPLICADOR', 'BONO 1 ARPU', 'MULTIPLICADOR FINAL', 'TOTAL A PAGAR']
+        cabeceras_faltantes = [cab for cab in cabeceras_reporte_esperadas if cab not in df_reporte_total.columns]
+        if cabeceras_faltantes:
+            log_output.append(f"⚠ ADVERTENCIA: Faltan cabeceras: {', '.join(cabeceras_faltantes)}")
+            log_output.append(f"  Cabeceras encontradas: {', '.join(df_reporte_total.columns.tolist())}")
+        else:
+            log_output.append(f"✓ Todas las cabeceras esperadas fueron encontradas")
+    except Exception as e:
+        log_output.append(f"✗ ERROR al leer hojas 'Reporte CORTE 1' y/o 'BASE': {e}")
+        return None, log_output
+
+    # Obtener agencias desde la hoja de reporte
+    if 'AGENCIA_NORMALIZADA' not in df_reporte_total.columns:
+        log_output.append("✗ ERROR: No se pudo normalizar la columna 'AGENCIA'")
+        return None, log_output
+
+    datos = {'reporte': df_reporte_total, 'base': df_base_total, 'log_carga': list(log_output)}
+    return datos, log_output
+
+def _linea_log(registro):
+    """Línea del log para una agencia (mismo formato de siempre)."""
+    nombre = registro.agencia
+    if registro.estado == ERROR:
+        return f"✗ {nombre:<45} │ ERROR: {registro.detalle}"
+    if registro.estado == OK:
+        return f"✓ {nombre:<45} │ ALTAS: {registro.altas:>5} │ BASE: {registro.filas_base:>5} │ ✓ OK"
+    return f"⚠ {nombre:<45} │ ALTAS: {registro.altas:>5} │ BASE: {registro.filas_base:>5} │ ⚠ DESCUADRE"
+
+# ================= Proceso principal =================
+def procesar_archivos_excel(archivo_excel_cargado, salida=None, formato_base=FORMATO_XLSX, solo_validar=False, datos=None,
+                            agencias=None, resumen=False):
+    """
+    Segmenta el consolidado de Lima en un Excel por agencia.
+    Con `solo_validar=True` solo lee, valida y concilia ALTAS contra BASE sin generar
+    archivos, y devuelve los datos leídos en lugar del resultado; pasándolos luego
+    en `datos` se generan los reportes sin volver a leer el Excel.
+    Con `resumen=True` se agrega además NOMBRE_RESUMEN (registros por agencia e
+    integridad de la BASE, segmentador/integridad.py); por defecto no se incluye.
+    Con `agencias` (claves normalizadas) solo se generan esas agencias, sin el libro
+    de resumen: es lo que usa la vista por agencia de la página.
+    El log se devuelve como Bitacora (segmentador/registros.py), con un registro por agencia.
+    """
+    if datos is None:
+        datos, log_carga = cargar_datos(archivo_excel_cargado)
+        if datos is None:
+            return None, Bitacora(_linea_log, log_carga)
+    else:
+        log_carga = datos['log_carga']
+    log_output = Bitacora(_linea_log, log_carga)
+    df_reporte_total = datos['reporte']
+    df_base_total = datos['base']
+
+    # Archivos por agencia (zip en memoria o carpeta compartida)
+    marcar_etapa("segmentacion")
+    if solo_validar:
+        salida = SalidaValidacion()
+    elif salida is None:
+        salida = SalidaZip()
+    with salida as destino:
+        todas_las_agencias = df_reporte_total['AGENCIA_NORMALIZADA'].dropna().unique().tolist()
+        agencias_normalizadas = todas_las_agencias if agencias is None else [a for a in todas_las_agencias if a in agencias]
+        log_output.append(f"\n{'='*80}")
+        log_output.append(f"📊 PROCESANDO {len(agencias_normalizadas)} AGENCIAS")
+        log_output.append(f"{'='*80}\n")
+
+        # Alias opcional (normalizados también)
+        mapeo_agencias_alias = mapeo_alias(ALIAS_LIMA)
+
+        # Mantener todas las columnas de BASE (excluyendo la normalizada)
+        columnas_base = [col for col in df_base_total.columns if col != 'ASESOR_NORMALIZADO']
+        
+        if 'ASESOR_NORMALIZADO' not in df_base_total.columns:
+            log_output.append("⚠ ADVERTENCIA: No se pudo normalizar la columna 'ASESOR' en BASE")
+
+        # COD_PEDIDO duplicados o en varias agencias y filas de BASE sin agencia
+        integridad = integridad_de(datos, 'ASESOR_NORMALIZADO', todas_las_agencias, mapeo_agencias_alias)
+        # Filas de BASE por asesor, agrupadas una sola vez (queda en `datos`)
+        particion = particion_base(datos)
+        # Filas de la hoja BASE copiadas del XML original (segmentador/empalme_base.py)
+        fuente = fuente_base(archivo_excel_cargado, df_base_total) if formato_base == FORMATO_XLSX and not solo_validar else None
+
+        for agencia_norm in agencias_normalizadas:
+            # Obtener datos del reporte para esta agencia
+            reporte_agencia = df_reporte_total[df_reporte_total['AGENCIA_NORMALIZADA'] == agencia_norm].copy()
+            if reporte_agencia.empty:
+                continue
+
+            # Obtener el nombre original para el archivo
+            nombre_original = reporte_agencia['AGENCIA_ORIGINAL'].iloc[0]
+
+            # Filtrar BASE por ASESOR normalizado
+            if 'ASESOR_NORMALIZADO' in df_base_total.columns:
+                nombres = mapeo_agencias_alias.get(agencia_norm, [agencia_norm])
+                base_agencia = filas_de_asesores(df_base_total, particion, nombres)
+            else:
+                base_agencia = df_base_total
+
+            base_agencia_final = base_agencia[columnas_base].copy()
+
+            # Registro de la agencia con validación ALTAS vs BASE
+            registro = RegistroAgencia(agencia=nombre_original, clave=agencia_norm, zona="LIMA",
+                                       filas_base=len(base_agencia_final))
+            try:
+                registro.altas = int(pd.to_numeric(reporte_agencia.iloc[0].get('ALTAS', 0), errors='coerce') or 0)
+                registro.estado = OK if registro.altas == registro.filas_base else DESCUADRE
+            except Exception as e:
+                registro.estado = ERROR
+                registro.detalle = str(e)
+            log_output.registrar(registro)
+
+            if solo_validar:
+                continue
+
+            # Remover columnas auxiliares antes de guardar
+            reporte_para_guardar = reporte_agencia.drop(columns=['AGENCIA_NORMALIZADA', 'AGENCIA_ORIGINAL'], errors='ignore')
+            
+            # Nombre limpio de archivo usando el nombre original
+            nombre_archivo = limpiar_nombre_archivo(nombre_original)
+
+            # Crear Excel por agencia con formatos simplificados
+            inicio_render = time.perf_counter()
+            output_buffer = io.BytesIO()
+            libro_base = fuente.libro() if fuente is not None else None
+            with pd.ExcelWriter(output_buffer, engine='xlsxwriter') as writer:  # type: ignore
+                reporte_para_guardar.to_excel(writer, sheet_name='Reporte Agencia', index=False)  # type: ignore
+                partes_base = escribir_base(writer, base_agencia_final, formato_base, destino, nombre_archivo, f"BASE {nombre_archivo}",
+                                            empalme=libro_base)
+                if len(partes_base) > 1:
+                    log_output.append(f"  ↳ BASE dividida en {len(partes_base)} hojas: {', '.join(partes_base)}")
+
+                # Aplicar solo formatos básicos para evitar errores de Excel
+                try:
+                    workbook = writer.book
+                    ws = writer.sheets['Reporte Agencia']
+                    
+                    # Formato de porcentaje simple
+                    percent_fmt = workbook.add_format({'num_format': '0.00%'})
+                    # Formato de número con 2 decimales
+                    number_fmt = workbook.add_format({'num_format': '#,##0.00'})
+                    
+                    headers = list(reporte_para_guardar.columns)
+                    
+                    # Aplicar formato solo a las columnas clave
+                    if 'CUMPLIMIENTO ALTAS %' in headers:
+                        idx = headers.index('CUMPLIMIENTO ALTAS %')
+                        ws.set_column(idx, idx, 20, percent_fmt)
+                    
+                    if 'TOTAL A PAGAR' in headers:
+                        idx = headers.index('TOTAL A PAGAR')
+                        ws.set_column(idx, idx, 18, number_fmt)
+                except Exception:
+                    pass
+
+            contenido = output_buffer.getvalue()
+            if libro_base is not None:
+                contenido = libro_base.completar(contenido)
+            registro.archivo = f"Reporte {nombre_archivo}.xlsx"
+            destino.agregar(nombre_archivo, registro.archivo, contenido)
+            registro.segundos_render = round(time.perf_counter() - inicio_render, 4)
+            registro.bytes_salida = len(contenido)
+
+        if resumen and not solo_validar and agencias is None:
+            destino.agregar(None, NOMBRE_RESUMEN, libro_resumen(log_output, integridad))
+
+    # Resumen final del log (a partir de los registros)
+    agencias_exitosas = log_output.contar(OK)
+    agencias_con_descuadre = log_output.contar(DESCUADRE, ERROR)
+    log_output.append(f"\n{'='*80}")
+    log_output.append(f"📋 RESUMEN DEL PROCESO")
+    log_output.append(f"{'='*80}")
+    log_output.append(f"✓ Agencias procesadas exitosamente: {agencias_exitosas}")
+    if agencias_con_descuadre > 0:
+        log_output.append(f"⚠ Agencias con descuadre: {agencias_con_descuadre}")
+    log_output.append(f"{'✓' if integridad.sin_problemas() else '⚠'} Integridad BASE: {integridad.texto()}")
+    if solo_validar:
+        log_output.append(f"🔎 Validación sin generar archivos: {len(agencias_normalizadas)} reportes por generar")
+    else:
+        log_output.append(f"📁 Total de archivos generados: {len(agencias_normalizadas)}")
+    log_output.append(f"{'='*80}\n")
+    log_output.append("--- FIN DEL PROCESO ---")
+    if solo_validar:
+        return datos, log_output
+    return salida.resultado, log_output
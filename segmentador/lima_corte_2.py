@@ -0,0 +1,252 @@
+# segmentador/lima_corte_2.py
+"""Segmentación del consolidado de Lima Corte 2 (cabeceras de dos niveles)."""
+import io
+import time
+
+import pandas as pd
+
+from segmentador.alias import ALIAS_LIMA, mapeo_alias
+from segmentador.base_salida import FORMATO_XLSX, escribir_base
+from segmentador.empalme_base import fuente_base
+from segmentador.integridad import NOMBRE_RESUMEN, integridad_de, libro_resumen
+from segmentador.lectura import leer_hoja, leer_reporte_y_base
+from segmentador.metricas import marcar_etapa
+from segmentador.normalizacion import normalizar_nombre_agencia
+from segmentador.particion import filas_de_asesores, particion_base
+from segmentador.plan_corte2 import compilar_plan_lima_corte_2, escribir_reporte_con_plan
+from segmentador.registros import DESCUADRE, ERROR, OK, SIN_VALIDAR, Bitacora, RegistroAgencia
+from segmentador.salida import SalidaValidacion, SalidaZip, limpiar_nombre_archivo
+
+
+def cargar_datos(archivo_excel_cargado):
+    """
+    Valida cabeceras, lee las hojas de "Corte 2" y normaliza los nombres.
+    Devuelve (datos, log); datos es None si algo falló.
+    """
+    log_output = []
+    log_output.append("--- INICIO DEL PROCESO LIMA CORTE 2 ---")
+
+    # --- 1. Validación de Cabeceras ---
+    marcar_etapa("validacion")
+    try:
+        # Validación para 'Reporte CORTE 2' con cabeceras en dos filas
+        df_headers_reporte = leer_hoja(archivo_excel_cargado, sheet_name='Reporte CORTE 2', header=None, nrows=2)
+        fila1_headers = [str(h).strip().upper() for h in df_headers_reporte.iloc[0].values]
+        fila2_headers = [str(h).strip().upper() for h in df_headers_reporte.iloc[1].values]
+        
+        cabeceras_fila1_esperadas = ['PENALIDAD 1', 'CLAWBACK 1']
+        # Validar algunas cabeceras clave del nivel 2
+        cabeceras_fila2_esperadas = ['RUC', 'AGENCIA', 'META', 'GRUPO', 'ALTAS']
+
+        if not all(h in fila1_headers for h in cabeceras_fila1_esperadas):
+            log_output.append("⚠ ALERTA: No se encontraron las cabeceras de nivel 1 esperadas ('PENALIDAD 1', 'CLAWBACK 1')")
+            return None, log_output
+            
+        if not all(h in fila2_headers for h in cabeceras_fila2_esperadas):
+            log_output.append("⚠ ALERTA: No se encontraron las cabeceras clave del nivel 2 (RUC, AGENCIA, META, GRUPO, ALTAS)")
+            log_output.append(f"  Cabeceras encontradas: {', '.join(fila2_headers[:10])}...")
+            return None, log_output
+
+        # Validación para 'BASE' (cabecera simple)
+        df_headers_base = leer_hoja(archivo_excel_cargado, sheet_name='BASE', header=None, nrows=1)
+        base_headers = [str(h).strip().upper() for h in df_headers_base.iloc[0].values]
+        if 'ASESOR' not in base_headers or 'COD_PEDIDO' not in base_headers:
+            log_output.append("⚠ ALERTA: Las cabeceras 'ASESOR' y 'COD_PEDIDO' no se encontraron en la hoja 'BASE'")
+            return None, log_output
+        
+        log_output.append("✓ Validación de cabeceras exitosa")
+
+    except Exception as e:
+        log_output.append(f"✗ ERROR al validar cabeceras: {e}")
+        return None, log_output
+
+    # --- 2. Lectura de Datos Completos ---
+    marcar_etapa("lectura")
+    try:
+        log_output.append("✓ Leyendo datos completos del archivo...")
+        # Reporte (dos filas de cabecera) y BASE a la vez: la BASE se lee en otro proceso o sale de la caché
+        # (ver segmentador/lectura.py)
+        df_reporte_total, df_base_total, base_reutilizada = leer_reporte_y_base(
+            archivo_excel_cargado,
+            dict(sheet_name='Reporte CORTE 2', header=[0, 1]),
+            dict(sheet_name='BASE'),
+        )
+        if base_reutilizada:
+            log_output.append("✓ Hoja 'BASE' idéntica a una ya leída: se reutiliza sin volver a leerla")
+
+        # Estandarizar cabeceras de la hoja BASE
+        df_base_total.columns = df_base_total.columns.str.strip().str.upper()
+        log_output.append("✓ Datos cargados y cabeceras de la BASE estandarizadas")
+
+    except Exception as e:
+        log_output.append(f"✗ ERROR: No se pudo leer el archivo Excel. Error: {e}")
+        return None, log_output
+
+    # --- 3. Normalizar nombres de agencias ---
+    marcar_etapa("preparacion")
+    # La columna 'AGENCIA' está en el segundo nivel de la cabecera (tupla MultiIndex)
+    columna_agencia = next((col for col in df_reporte_total.columns if 'AGENCIA' in str(col).upper()), None)
+    if not columna_agencia:
+        log_output.append("✗ ERROR: No se pudo encontrar la columna 'AGENCIA' en la hoja 'Reporte CORTE 2'")
+        return None, log_output
+    
+    # Crear columnas normalizadas
+    df_reporte_total[('AGENCIA_NORMALIZADA', '')] = df_reporte_total[columna_agencia].apply(normalizar_nombre_agencia)
+    df_reporte_total[('AGENCIA_ORIGINAL', '')] = df_reporte_total[columna_agencia]
+    
+    if 'ASESOR' in df_base_total.columns:
+        df_base_total['ASESOR_NORMALIZADO'] = df_base_total['ASESOR'].apply(normalizar_nombre_agencia)
+
+    datos = {'reporte': df_reporte_total, 'base': df_base_total, 'log_carga': list(log_output)}
+    return datos, log_output
+
+
+def _linea_log(registro):
+    """Línea del log para una agencia (mismo formato de siempre)."""
+    nombre = registro.agencia
+    if registro.estado == ERROR:
+        return f"✗ {nombre:<45} │ ERROR: {registro.detalle}"
+    if registro.estado == SIN_VALIDAR:
+        return f"ℹ {nombre:<45} │ No se pudo validar conteo de ALTAS"
+    if registro.estado == OK:
+        return f"✓ {nombre:<45} │ ALTAS: {registro.altas:>5} │ BASE: {registro.filas_base:>5} │ ✓ OK"
+    return f"⚠ {nombre:<45} │ ALTAS: {registro.altas:>5} │ BASE: {registro.filas_base:>5} │ ⚠ DESCUADRE"
+
+
+def procesar_reporte_corte_2(archivo_excel_cargado, salida=None, formato_base=FORMATO_XLSX, solo_validar=False, datos=None,
+                             agencias=None, resumen=False):
+    """
+    Procesa un archivo Excel con la estructura de "Corte 2", que contiene
+    cabeceras de múltiples niveles, y lo segmenta por agencia.
+    Con `solo_validar=True` solo valida y concilia ALTAS contra BASE, sin generar
+    archivos, y devuelve los datos leídos; pasándolos luego en `datos` se generan
+    los reportes sin volver a leer el Excel.
+    Con `resumen=True` se agrega además NOMBRE_RESUMEN (registros por agencia e
+    integridad de la BASE, segmentador/integridad.py); por defecto no se incluye.
+    Con `agencias` (claves normalizadas) solo se generan esas agencias, sin el libro
+    de resumen: es lo que usa la vista por agencia de la página.
+    El log se devuelve como Bitacora (segmentador/registros.py), con un registro por agencia.
+    """
+    if datos is None:
+        datos, log_carga = cargar_datos(archivo_excel_cargado)
+        if datos is None:
+            return None, Bitacora(_linea_log, log_carga)
+    else:
+        log_carga = datos['log_carga']
+    log_output = Bitacora(_linea_log, log_carga)
+    df_reporte_total = datos['reporte']
+    df_base_total = datos['base']
+
+    # --- 4. Proceso de Segmentación ---
+    marcar_etapa("segmentacion")
+    if solo_validar:
+        salida = SalidaValidacion()
+    elif salida is None:
+        salida = SalidaZip()
+    with salida as destino:
+        col_agencia_norm = ('AGENCIA_NORMALIZADA', '')
+        col_agencia_orig = ('AGENCIA_ORIGINAL', '')
+        
+        todas_las_agencias = df_reporte_total[col_agencia_norm].dropna().unique().tolist()
+        agencias_normalizadas = todas_las_agencias if agencias is None else [a for a in todas_las_agencias if a in agencias]
+        
+        log_output.append(f"\n{'='*80}")
+        log_output.append(f"📊 PROCESANDO {len(agencias_normalizadas)} AGENCIAS - CORTE 2")
+        log_output.append(f"{'='*80}\n")
+
+        columna_altas = next((col for col in df_reporte_total.columns if 'ALTAS' in str(col).upper()), None)
+
+        # Layout de salida (cabeceras aplanadas, colores, formatos): igual para todas las agencias
+        plan_salida = compilar_plan_lima_corte_2(df_reporte_total.columns)
+        # Todas las columnas de BASE salvo la auxiliar normalizada
+        columnas_base = [col for col in df_base_total.columns if col != 'ASESOR_NORMALIZADO']
+        
+        # Alias opcional (normalizados)
+        mapeo_agencias_alias = mapeo_alias(ALIAS_LIMA)
+
+        # COD_PEDIDO duplicados o en varias agencias y filas de BASE sin agencia
+        integridad = integridad_de(datos, 'ASESOR_NORMALIZADO', todas_las_agencias, mapeo_agencias_alias)
+        # Filas de BASE por asesor, agrupadas una sola vez (queda en `datos`)
+        particion = particion_base(datos)
+        # Filas de la hoja BASE copiadas del XML original (segmentador/empalme_base.py)
+        fuente = fuente_base(archivo_excel_cargado, df_base_total) if formato_base == FORMATO_XLSX and not solo_validar else None
+
+        for agencia_norm in agencias_normalizadas:
+            reporte_agencia = df_reporte_total[df_reporte_total[col_agencia_norm] == agencia_norm].copy()
+            if reporte_agencia.empty:
+                continue
+
+            # Obtener el nombre original para el archivo
+            nombre_original = reporte_agencia[col_agencia_orig].iloc[0]
+
+            # Filtrar BASE por ASESOR normalizado
+            if 'ASESOR_NORMALIZADO' in df_base_total.columns:
+                nombres = mapeo_agencias_alias.get(agencia_norm, [agencia_norm])
+                base_agencia = filas_de_asesores(df_base_total, particion, nombres)
+            else:
+                base_agencia = df_base_total
+
+            # Validación de consistencia (queda en el registro de la agencia)
+            registro = RegistroAgencia(agencia=nombre_original, clave=agencia_norm, zona="LIMA",
+                                       filas_base=len(base_agencia))
+            try:
+                if columna_altas:
+                    registro.altas = int(pd.to_numeric(reporte_agencia.iloc[0][columna_altas], errors='coerce') or 0)
+                    registro.estado = OK if registro.altas == registro.filas_base else DESCUADRE
+                else:
+                    registro.estado = SIN_VALIDAR
+            except Exception as e:
+                registro.estado = ERROR
+                registro.detalle = str(e)
+            log_output.registrar(registro)
+
+            if solo_validar:
+                continue
+
+            # Remover columna auxiliar de BASE
+            base_agencia_final = base_agencia[columnas_base].copy()
+
+            nombre_archivo_limpio = limpiar_nombre_archivo(nombre_original)
+
+            # Crear el archivo Excel para la agencia con formatos y colores
+            inicio_render = time.perf_counter()
+            output_buffer = io.BytesIO()
+            libro_base = fuente.libro() if fuente is not None else None
+            with pd.ExcelWriter(output_buffer, engine='xlsxwriter') as writer: # type: ignore
+                # Cabeceras aplanadas, colores y formatos salen del plan compilado una sola vez
+                escribir_reporte_con_plan(writer, 'Reporte CORTE 2', reporte_agencia, plan_salida)
+                partes_base = escribir_base(writer, base_agencia_final, formato_base, destino, nombre_archivo_limpio, f"BASE Corte 2 {nombre_archivo_limpio}",
+                                            empalme=libro_base)
+                if len(partes_base) > 1:
+                    log_output.append(f"  ↳ BASE dividida en {len(partes_base)} hojas: {', '.join(partes_base)}")
+            
+            contenido = output_buffer.getvalue()
+            if libro_base is not None:
+                contenido = libro_base.completar(contenido)
+            registro.archivo = f"Reporte Corte 2 {nombre_archivo_limpio}.xlsx"
+            destino.agregar(nombre_archivo_limpio, registro.archivo, contenido)
+            registro.segundos_render = round(time.perf_counter() - inicio_render, 4)
+            registro.bytes_salida = len(contenido)
+
+        if resumen and not solo_validar and agencias is None:
+            destino.agregar(None, NOMBRE_RESUMEN, libro_resumen(log_output, integridad))
+
+    # Resumen final del log (a partir de los registros)
+    agencias_exitosas = log_output.contar(OK)
+    agencias_con_descuadre = log_output.contar(DESCUADRE, ERROR)
+    log_output.append(f"\n{'='*80}")
+    log_output.append(f"📋 RESUMEN DEL PROCESO - CORTE 2")
+    log_output.append(f"{'='*80}")
+    log_output.append(f"✓ Agencias procesadas exitosamente: {agencias_exitosas}")
+    if agencias_con_descuadre > 0:
+        log_output.append(f"⚠ Agencias con descuadre: {agencias_con_descuadre}")
+    log_output.append(f"{'✓' if integridad.sin_problemas() else '⚠'} Integridad BASE: {integridad.texto()}")
+    if solo_validar:
+        log_output.append(f"🔎 Validación sin generar archivos: {len(agencias_normalizadas)} reportes por generar")
+    else:
+        log_output.append(f"📁 Total de archivos generados: {len(agencias_normalizadas)}")
+    log_output.append(f"{'='*80}\n")
+    log_output.append("--- FIN DEL PROCESO ---")
+    if solo_validar:
+        return datos, log_output
+    return salida.resultado, log_output
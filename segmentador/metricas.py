@@ -0,0 +1,22 @@
+# segmentador/metricas.py
+"""
+Marcas de etapa dentro de los procesos de segmentación.
+
+Los procesos llaman `marcar_etapa("lectura")`, `marcar_etapa("segmentacion")`...
+al empezar cada etapa. Sin observador registrado no hacen nada; las herramientas
+de medición (herramientas/memoria.py) registran uno para tomar la memoria al
+cerrar cada etapa.
+"""
+_observador = None
+
+
+def observar_etapas(funcion):
+    """Registra `funcion(nombre_etapa)` como observador (None para quitarlo)."""
+    global _observador
+    _observador = funcion
+
+
+def marcar_etapa(nombre):
+    """Indica que empieza la etapa `nombre` (y termina la anterior)."""
+    if _observador is not None:
+        _observador(nombre)
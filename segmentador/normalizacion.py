@@ -0,0 +1,28 @@
+# segmentador/normalizacion.py
+"""
+Normalización de nombres de agencias y asesores.
+
+Sin dependencias pesadas: las tablas de traducción y expresiones regulares se
+construyen una sola vez al importar el módulo y se reutilizan en cada fila.
+"""
+import re
+
+_ESPACIOS = re.compile(r'\s+')
+_SIN_PUNTUACION = str.maketrans('', '', '.,-')
+
+
+def normalizar_nombre_agencia(nombre):
+    """
+    Normaliza el nombre de una agencia para comparaciones consistentes (Lima).
+    Convierte a mayúsculas y elimina espacios extras.
+    """
+    if not isinstance(nombre, str):
+        return ""
+    return nombre.strip().upper()
+
+
+def normalizar_nombre(nombre):
+    """Convierte un nombre a formato estándar (Provincia): mayúsculas, sin puntos/comas/guiones y con espacios simples."""
+    if not isinstance(nombre, str):
+        return ""
+    return _ESPACIOS.sub(' ', nombre.upper().translate(_SIN_PUNTUACION)).strip()
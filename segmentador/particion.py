@@ -0,0 +1,33 @@
+# segmentador/particion.py
+"""
+Partición de la BASE por asesor normalizado.
+
+Se arma una sola vez por lectura (un groupby) y queda guardada en los `datos` del
+proceso junto a la BASE. Tomar las filas de una agencia cuesta lo que miden sus
+filas, no un recorrido de toda la BASE por cada agencia. La usan la corrida
+completa y la generación de una sola agencia bajo demanda (`agencias=` en los
+procesos), que sobre datos ya leídos responde en milisegundos.
+"""
+import numpy as np
+
+COLUMNA_ASESOR = 'ASESOR_NORMALIZADO'
+
+
+def particion_base(datos, columna=COLUMNA_ASESOR):
+    """{asesor normalizado: posiciones en datos['base']}; se calcula una vez y queda en `datos`."""
+    particion = datos.get('particion')
+    if particion is None:
+        df_base = datos['base']
+        particion = df_base.groupby(columna, sort=False).indices if columna in df_base.columns else {}
+        datos['particion'] = particion
+    return particion
+
+
+def filas_de_asesores(df_base, particion, asesores):
+    """Filas de la BASE de esos asesores, en el orden original (lo mismo que filtrar con isin)."""
+    posiciones = [particion[asesor] for asesor in dict.fromkeys(asesores) if asesor in particion]
+    if not posiciones:
+        return df_base.iloc[0:0]
+    if len(posiciones) == 1:
+        return df_base.iloc[posiciones[0]]
+    return df_base.iloc[np.sort(np.concatenate(posiciones))]
@@ -0,0 +1,162 @@
+# segmentador/plan_corte2.py
+"""
+Plan de salida de la hoja 'Reporte CORTE 2'.
+
+Las cabeceras de Corte 2 vienen en dos niveles (PENALIDAD 1 / CLAWBACK 1 arriba,
+el detalle abajo). Aplanarlas, decidir el color de cada cabecera y los formatos
+numéricos depende solo de las columnas de la hoja, así que se calcula una vez por
+corrida (`compilar_plan_*`) y luego cada agencia solo aplica el plan
+(`escribir_reporte_con_plan`). Así todos los archivos salen con el mismo layout.
+"""
+from dataclasses import dataclass, field
+
+# --- Lima Corte 2 ---
+COLUMNAS_PENALIDAD_LIMA = ['CHURN 4.5%', 'UMBRAL', 'ALTAS PENALIZADAS', 'PENALIDAD 1']
+COLUMNAS_CLAWBACK_LIMA = ['UMBRAL 1', 'CUMPLIMIENTO CORTE 2 %', 'MULTIPLICADOR CORTE 2', 'CLAWBACK 1']
+
+# Columnas que pertenecen a cada grupo (con y sin prefijo)
+COLUMNAS_PENALIDAD_GRUPO_LIMA = frozenset([
+    'PENALIDAD 1 - CHURN 4.5%', 'PENALIDAD 1 - UMBRAL',
+    'PENALIDAD 1 - ALTAS PENALIZADAS', 'PENALIDAD 1 - PENALIDAD 1',
+    'CHURN 4.5%', 'UMBRAL', 'ALTAS PENALIZADAS', 'ALTAS  PENALIZADAS', 'PENALIDAD 1'
+])
+COLUMNAS_CLAWBACK_GRUPO_LIMA = frozenset([
+    'CLAWBACK 1 - UMBRAL 1', 'CLAWBACK 1 - CUMPLIMIENTO CORTE 2 %',
+    'CLAWBACK 1 - MULTIPLICADOR CORTE 2', 'CLAWBACK 1 - CLAWBACK 1',
+    'UMBRAL 1', 'CUMPLIMIENTO CORTE 2 %', 'MULTIPLICADOR CORTE 2',
+    'MULTIPLICADOR  CORTE 2', 'CLAWBACK 1'
+])
+
+ESTILOS_LIMA = {
+    'penalidad': {'bold': True, 'font_color': 'white', 'bg_color': '#0070C0', 'align': 'center', 'valign': 'vcenter', 'border': 1},
+    'clawback': {'bold': True, 'font_color': 'white', 'bg_color': '#002060', 'align': 'center', 'valign': 'vcenter', 'border': 1},
+    'cabecera': {'bold': True, 'bg_color': '#FFC000', 'align': 'center', 'valign': 'vcenter', 'border': 1},
+    'porcentaje': {'num_format': '0.00%'},
+    'numero': {'num_format': '#,##0.00'},
+}
+# (nombre de columna, ancho, estilo); en el orden en que se aplicaban
+FORMATOS_COLUMNA_LIMA = [
+    ('CUMPLIMIENTO ALTAS %', 20, 'porcentaje'),
+    ('CLAWBACK 1 - CUMPLIMIENTO CORTE 2 %', 20, 'porcentaje'),
+    ('TOTAL A PAGAR CORTE 2', 18, 'numero'),
+    ('PENALIDAD 1 - PENALIDAD 1', 18, 'numero'),
+    ('CLAWBACK 1 - CLAWBACK 1', 18, 'numero'),
+]
+AUXILIARES_LIMA = [('AGENCIA_NORMALIZADA', ''), ('AGENCIA_ORIGINAL', '')]
+
+# --- Provincia Corte 2 ---
+ESTILOS_PROVINCIA = {
+    'penalidad': {'bold': True, 'font_color': 'white', 'fg_color': '#0070C0', 'border': 1},
+    'clawback': {'bold': True, 'font_color': 'white', 'fg_color': '#002060', 'border': 1},
+    'cabecera': {'bold': True, 'fg_color': '#FFC000', 'border': 1},
+    'porcentaje': {'num_format': '0.00%'},
+}
+FORMATOS_COLUMNA_PROVINCIA = [
+    ('Cumplimiento Altas %', 18, 'porcentaje'),
+    ('CLAWBACK 1 - Cumplimiento Corte 2 %', 18, 'porcentaje'),
+]
+AUXILIARES_PROVINCIA = [('AGENCIA_BASE', ''), ('AGENCIA_BASE_NORMALIZADA', '')]
+
+
+@dataclass
+class PlanSalida:
+    """Layout final de la hoja de reporte, idéntico para todas las agencias."""
+    posiciones: list            # posición de cada columna a escribir en el DataFrame original
+    nombres: list               # cabecera aplanada de cada columna
+    estilos_cabecera: list      # clave de estilo de la cabecera de cada columna
+    formatos_columna: list      # (índice, ancho, clave de estilo) a aplicar con set_column
+    estilos: dict = field(default_factory=dict)  # clave -> propiedades de xlsxwriter
+
+
+def _formatos_por_nombre(nombres, formatos):
+    resultado = []
+    for nombre, ancho, estilo in formatos:
+        if nombre in nombres:
+            resultado.append((nombres.index(nombre), ancho, estilo))
+    return resultado
+
+
+def _aplanar_lima(col):
+    level1 = str(col[0]).strip().upper()
+    level2 = str(col[1]).strip().upper().replace('\n', ' ')
+    # Si la cabecera superior es 'Unnamed' o vacía, usar solo la inferior
+    if 'UNNAMED' in level1 or level1 == '' or level1 == level2:
+        return level2
+    # Si pertenece a PENALIDAD 1 o CLAWBACK 1
+    if level2 in COLUMNAS_PENALIDAD_LIMA:
+        return f"PENALIDAD 1 - {level2}"
+    if level2 in COLUMNAS_CLAWBACK_LIMA:
+        return f"CLAWBACK 1 - {level2}"
+    return level2
+
+
+def _estilo_lima(nombre):
+    if nombre.startswith('PENALIDAD 1 -') or nombre in COLUMNAS_PENALIDAD_GRUPO_LIMA:
+        return 'penalidad'
+    if nombre.startswith('CLAWBACK 1 -') or nombre in COLUMNAS_CLAWBACK_GRUPO_LIMA:
+        return 'clawback'
+    return 'cabecera'
+
+
+def _aplanar_provincia(col):
+    level1 = str(col[0]).strip()
+    level2 = str(col[1]).strip().replace('\n', ' ')
+    if 'unnamed' in level1.lower() or level1 == level2:
+        return level2
+    return f"{level1} - {level2}"
+
+
+def _estilo_provincia(nombre):
+    if nombre.startswith('PENALIDAD 1 -'):
+        return 'penalidad'
+    if nombre.startswith('CLAWBACK 1 -'):
+        return 'clawback'
+    return 'cabecera'
+
+
+def _compilar(columnas, auxiliares, aplanar, estilo, formatos, estilos):
+    auxiliares = set(auxiliares)
+    posiciones = [i for i, col in enumerate(columnas) if col not in auxiliares]
+    nombres = [aplanar(columnas[i]) for i in posiciones]
+    return PlanSalida(
+        posiciones=posiciones,
+        nombres=nombres,
+        estilos_cabecera=[estilo(n) for n in nombres],
+        formatos_columna=_formatos_por_nombre(nombres, formatos),
+        estilos=estilos,
+    )
+
+
+def compilar_plan_lima_corte_2(columnas):
+    """Plan para 'Reporte CORTE 2' de Lima a partir de las columnas MultiIndex leídas."""
+    return _compilar(list(columnas), AUXILIARES_LIMA, _aplanar_lima, _estilo_lima, FORMATOS_COLUMNA_LIMA, ESTILOS_LIMA)
+
+
+def compilar_plan_provincia_corte_2(columnas):
+    """Plan para 'Reporte CORTE 2' de Provincia a partir de las columnas MultiIndex leídas."""
+    return _compilar(list(columnas), AUXILIARES_PROVINCIA, _aplanar_provincia, _estilo_provincia, FORMATOS_COLUMNA_PROVINCIA, ESTILOS_PROVINCIA)
+
+
+def aplicar_plan(df_reporte, plan):
+    """Devuelve las filas de una agencia con las columnas finales del plan."""
+    return df_reporte.iloc[:, plan.posiciones].set_axis(plan.nombres, axis=1)
+
+
+def escribir_reporte_con_plan(writer, nombre_hoja, df_reporte, plan):
+    """
+    Escribe la hoja de reporte de una agencia aplicando el plan ya compilado.
+    Como antes, un error al dar formato no hace fallar la agencia: el archivo sale
+    con los datos y la cabecera sin colores.
+    """
+    aplicar_plan(df_reporte, plan).to_excel(writer, sheet_name=nombre_hoja, index=False, startrow=1, header=False)
+    worksheet = writer.sheets[nombre_hoja]
+    try:
+        # Los formatos de xlsxwriter pertenecen a cada libro: se registran una vez por archivo
+        formatos = {clave: writer.book.add_format(props) for clave, props in plan.estilos.items()}
+        for col_idx, (texto, estilo) in enumerate(zip(plan.nombres, plan.estilos_cabecera)):
+            worksheet.write(0, col_idx, texto, formatos[estilo])
+        for col_idx, ancho, estilo in plan.formatos_columna:
+            worksheet.set_column(col_idx, col_idx, ancho, formatos[estilo])
+    except Exception:
+        for col_idx, texto in enumerate(plan.nombres):
+            worksheet.write(0, col_idx, texto)
@@ -0,0 +1,243 @@
+# segmentador/provincia_corte_1.py
+"""Segmentación del consolidado de Provincia Corte 1 por zona (columna ZONA de la BASE)."""
+import io
+import time
+
+import pandas as pd
+
+from segmentador.alias import ALIAS_PROVINCIA, mapeo_alias
+from segmentador.base_salida import FORMATO_XLSX, escribir_base
+from segmentador.integridad import NOMBRE_RESUMEN, integridad_de, libro_resumen
+from segmentador.lectura import leer_hoja, leer_reporte_y_base
+from segmentador.metricas import marcar_etapa
+from segmentador.normalizacion import normalizar_nombre
+from segmentador.particion import filas_de_asesores, particion_base
+from segmentador.registros import DESCUADRE, ERROR, OK, Bitacora, RegistroAgencia
+from segmentador.salida import SalidaValidacion, SalidaZip
+from segmentador.zonas import agencias_sin_asesores, claves_con_asesores, linea_sin_asesores
+
+
+def validar_cabeceras_provincia(archivo_excel, nombre_hoja, cabeceras_esperadas):
+    try:
+        df_primera_fila = leer_hoja(archivo_excel, sheet_name=nombre_hoja, header=None, nrows=1)
+        cabeceras_reales = [str(col).strip().upper() for col in df_primera_fila.iloc[0].values]
+        for cabecera in cabeceras_esperadas:
+            if cabecera.upper() not in cabeceras_reales: return False
+        return True
+    except Exception: return False
+
+
+def get_agencia_base(nombre_completo, lista_departamentos):
+    if not isinstance(nombre_completo, str): return ""
+    nombre_completo_norm = normalizar_nombre(nombre_completo)
+    for depto in lista_departamentos:
+        if nombre_completo_norm.endswith(normalizar_nombre(depto)):
+            nombre_base = nombre_completo[:-len(depto)].strip()
+            return nombre_base
+    return nombre_completo.strip()
+
+def cargar_datos(archivo_excel_cargado, zona_seleccionada):
+    """
+    Valida cabeceras, lee las hojas y las filtra por zona.
+    Devuelve (datos, log); datos es None si algo falló.
+    """
+    log_output = []
+    log_output.append(f"--- INICIO DEL PROCESO PARA ZONA: {zona_seleccionada} ---")
+    marcar_etapa("validacion")
+
+    # ... (Validación de cabeceras no cambia) ...
+    cabeceras_reporte = ['AGENCIA', 'RUC', 'ALTAS']
+    if not validar_cabeceras_provincia(archivo_excel_cargado, 'Reporte CORTE 1', cabeceras_reporte):
+        log_output.append("ALERTA: Cabeceras esperadas no encontradas en la hoja 'Reporte CORTE 1'.")
+        return None, log_output
+    cabeceras_base = ['COD_PEDIDO', 'ASESOR', 'ZONA', 'DEPARTAMENTO']
+    if not validar_cabeceras_provincia(archivo_excel_cargado, 'BASE', cabeceras_base):
+        log_output.append("ALERTA: Cabeceras esperadas no encontradas en la hoja 'BASE'.")
+        return None, log_output
+    log_output.append("Validación de cabeceras exitosa.")
+
+    try:
+        # ... (La lógica de lectura y filtrado inicial no cambia) ...
+        log_output.append("Leyendo datos completos del archivo...")
+        marcar_etapa("lectura")
+        # Reporte y BASE a la vez: la BASE se lee en otro proceso o sale de la caché (ver segmentador/lectura.py)
+        df_reporte_total, df_base_total, base_reutilizada = leer_reporte_y_base(
+            archivo_excel_cargado,
+            dict(sheet_name='Reporte CORTE 1', dtype=str),
+            dict(sheet_name='BASE', dtype=str),
+        )
+        if base_reutilizada:
+            log_output.append("Hoja 'BASE' idéntica a una ya leída: se reutiliza sin volver a leerla.")
+        marcar_etapa("preparacion")
+        df_reporte_total.columns = df_reporte_total.columns.str.strip().str.upper()
+        df_base_total.columns = df_base_total.columns.str.strip().str.upper()
+        base_filtrada_por_zona = df_base_total[df_base_total['ZONA'].str.strip().str.upper() == zona_seleccionada.upper()]
+        if base_filtrada_por_zona.empty:
+            log_output.append(f"ALERTA: No se encontraron registros en la hoja 'BASE' para la zona '{zona_seleccionada}'.")
+            return None, log_output
+        
+        # Corrección: Aseguramos que trabajamos con una Serie de Pandas
+        lista_departamentos = pd.Series(base_filtrada_por_zona['DEPARTAMENTO']).dropna().unique().tolist()
+        lista_departamentos.sort(key=len, reverse=True)
+        df_reporte_total['AGENCIA_BASE'] = df_reporte_total['AGENCIA'].apply(lambda x: get_agencia_base(x, lista_departamentos))
+        
+        # Aplicamos la misma corrección para futuras operaciones
+        asesores_normalizados = pd.Series(base_filtrada_por_zona['ASESOR']).apply(normalizar_nombre)
+        base_filtrada_por_zona = base_filtrada_por_zona.assign(ASESOR_NORMALIZADO=asesores_normalizados)
+
+        agencias_de_la_zona = base_filtrada_por_zona['ASESOR_NORMALIZADO'].dropna().unique().tolist()
+        
+        # Continuamos con la lógica, asegurando el tipo correcto donde sea necesario
+        df_reporte_total['AGENCIA_BASE_NORMALIZADA'] = df_reporte_total['AGENCIA_BASE'].apply(normalizar_nombre)
+        # Agencias de la zona: con asesores en su BASE, por su nombre o por alias
+        claves_zona = claves_con_asesores(agencias_de_la_zona, mapeo_alias(ALIAS_PROVINCIA))
+        reporte_filtrado_por_zona = df_reporte_total[df_reporte_total['AGENCIA_BASE_NORMALIZADA'].isin(claves_zona)].copy()
+        # Sin asesores pero con un departamento de la BASE de la zona en el nombre: solo para sugerir alias
+        sin_asesores = agencias_sin_asesores(df_reporte_total, 'AGENCIA_BASE_NORMALIZADA', 'AGENCIA', 'ALTAS',
+                                             claves_zona, lista_departamentos, zona_seleccionada)
+        linea = linea_sin_asesores(sin_asesores)
+        if linea:
+            log_output.append(linea)
+        if reporte_filtrado_por_zona.empty:
+            log_output.append(f"ALERTA: No se encontraron datos en la hoja 'Reporte CORTE 1' para las agencias de la zona '{zona_seleccionada}'.")
+            return None, log_output
+    except Exception as e:
+        log_output.append(f"ERROR: No se pudo leer o filtrar el archivo Excel. Error: {e}")
+        return None, log_output
+
+    reporte_filtrado_por_zona['ALTAS'] = pd.to_numeric(reporte_filtrado_por_zona['ALTAS'])
+    
+    try:
+        columnas_base_original = list(base_filtrada_por_zona.columns)
+        indice_final = columnas_base_original.index('RECIBO1_PAGADO')
+        columnas_a_mantener_en_base = columnas_base_original[:indice_final + 1]
+        if 'ZONA' not in columnas_a_mantener_en_base: columnas_a_mantener_en_base.append('ZONA')
+        if 'ASESOR_NORMALIZADO' not in columnas_a_mantener_en_base: columnas_a_mantener_en_base.append('ASESOR_NORMALIZADO')
+    except ValueError as e:
+        log_output.append(f"ERROR: No se encontró una columna esencial como 'RECIBO1_PAGADO'. Error: {e}")
+        return None, log_output
+        
+    agencias_base_a_procesar = pd.Series(reporte_filtrado_por_zona['AGENCIA_BASE_NORMALIZADA']).dropna().unique().tolist()
+    log_output.append(f"Se van a generar reportes para {len(agencias_base_a_procesar)} agencias base (normalizadas).")
+
+    datos = {
+        'reporte': reporte_filtrado_por_zona,
+        'base': base_filtrada_por_zona,
+        'columnas_base': columnas_a_mantener_en_base,
+        'agencias': agencias_base_a_procesar,
+        'sin_asesores': sin_asesores,
+        'log_carga': list(log_output),
+    }
+    return datos, log_output
+
+
+def _linea_log(registro):
+    """Línea del log para una agencia (mismo formato de siempre)."""
+    if registro.estado == ERROR:
+        return f"Error validando la agencia '{registro.clave}': {registro.detalle}"
+    if registro.estado == OK:
+        return f"ÉXITO    | {registro.clave:<40} | ALTAS: {registro.altas:<5} | Registros BASE: {registro.filas_base:<5} | OK"
+    return f"DESCUADRE | {registro.clave:<40} | ALTAS: {registro.altas:<5} | Registros BASE: {registro.filas_base:<5} | REVISAR"
+
+
+def procesar_reportes_provincia(archivo_excel_cargado, zona_seleccionada, salida=None, formato_base=FORMATO_XLSX,
+                                solo_validar=False, datos=None, agencias=None, resumen=False):
+    """
+    Genera un Excel por agencia de la zona seleccionada.
+    Con `solo_validar=True` solo valida y concilia ALTAS contra BASE, sin generar
+    archivos, y devuelve los datos leídos; pasándolos luego en `datos` se generan
+    los reportes sin volver a leer el Excel.
+    Con `resumen=True` se agrega además NOMBRE_RESUMEN (registros por agencia e
+    integridad de la BASE, segmentador/integridad.py); por defecto no se incluye.
+    Con `agencias` (claves normalizadas) solo se generan esas agencias, sin el libro
+    de resumen: es lo que usa la vista por agencia de la página.
+    El log se devuelve como Bitacora (segmentador/registros.py), con un registro por agencia.
+    """
+    if datos is None:
+        datos, log_carga = cargar_datos(archivo_excel_cargado, zona_seleccionada)
+        if datos is None:
+            return None, Bitacora(_linea_log, log_carga)
+    else:
+        log_carga = datos['log_carga']
+    log_output = Bitacora(_linea_log, log_carga)
+    reporte_filtrado_por_zona = datos['reporte']
+    base_filtrada_por_zona = datos['base']
+    columnas_a_mantener_en_base = datos['columnas_base']
+    agencias_base_a_procesar = datos['agencias']
+    if agencias is not None:
+        agencias_base_a_procesar = [a for a in agencias_base_a_procesar if a in agencias]
+
+    # Qué nombres de asesor en la BASE corresponden a una misma agencia (ver segmentador/alias.py)
+    mapeo_asesor_alias = mapeo_alias(ALIAS_PROVINCIA)
+
+    # COD_PEDIDO duplicados o en varias agencias y filas de BASE (de la zona) sin agencia
+    integridad = integridad_de(datos, 'ASESOR_NORMALIZADO', datos['agencias'], mapeo_asesor_alias)
+    # Filas de BASE por asesor, agrupadas una sola vez (queda en `datos`)
+    particion = particion_base(datos)
+
+    marcar_etapa("segmentacion")
+    if solo_validar:
+        salida = SalidaValidacion()
+    elif salida is None:
+        salida = SalidaZip()
+    with salida as destino:
+        for agencia_base_norm in agencias_base_a_procesar:
+            reporte_agencia = reporte_filtrado_por_zona[reporte_filtrado_por_zona['AGENCIA_BASE_NORMALIZADA'] == agencia_base_norm].copy()
+            
+            # ==============================================================================
+            # === MEJORA CLAVE: Usamos el mapa de alias para buscar en la BASE ===
+            # ==============================================================================
+            # (si no está en el mapa, se usa la lógica normal: el propio nombre)
+            nombres_a_buscar = mapeo_asesor_alias.get(agencia_base_norm, [agencia_base_norm])
+            base_agencia = filas_de_asesores(base_filtrada_por_zona, particion, nombres_a_buscar).copy()
+            
+            base_agencia_sin_asesor = pd.DataFrame(base_agencia).drop(columns=['ASESOR_NORMALIZADO'], errors='ignore')
+            base_agencia_final = base_agencia_sin_asesor[columnas_a_mantener_en_base[:-1]]
+            
+            nombre_original_agencia = pd.Series(reporte_agencia['AGENCIA_BASE']).iloc[0].strip()
+            registro = RegistroAgencia(agencia=nombre_original_agencia, clave=agencia_base_norm, zona=zona_seleccionada,
+                                       filas_base=len(base_agencia_final))
+            try:
+                registro.altas = reporte_agencia['ALTAS'].sum()
+                registro.estado = OK if registro.altas == registro.filas_base else DESCUADRE
+            except Exception as e:
+                registro.estado = ERROR
+                registro.detalle = str(e)
+            log_output.registrar(registro)
+
+            if solo_validar:
+                continue
+
+            inicio_render = time.perf_counter()
+            output_buffer = io.BytesIO()
+            with pd.ExcelWriter(output_buffer, engine='xlsxwriter') as writer: # type: ignore
+                # Corrección final: guardar el resultado de drop en una variable intermedia
+                reporte_agencia_final = pd.DataFrame(reporte_agencia).drop(columns=['AGENCIA_BASE', 'AGENCIA_BASE_NORMALIZADA'], errors='ignore')
+                reporte_agencia_final.to_excel(writer, sheet_name='Reporte Agencia', index=False)
+                partes_base = escribir_base(writer, base_agencia_final, formato_base, destino, nombre_original_agencia, f"BASE {nombre_original_agencia}")
+                if len(partes_base) > 1:
+                    log_output.append(f"          | {agencia_base_norm:<40} | BASE dividida en {len(partes_base)} hojas")
+            contenido = output_buffer.getvalue()
+            registro.archivo = f"Reporte {nombre_original_agencia}.xlsx"
+            destino.agregar(nombre_original_agencia, registro.archivo, contenido)
+            registro.segundos_render = round(time.perf_counter() - inicio_render, 4)
+            registro.bytes_salida = len(contenido)
+
+        if resumen and not solo_validar and agencias is None:
+            destino.agregar(None, NOMBRE_RESUMEN, libro_resumen(log_output, integridad))
+
+    log_output.append(f"INTEGRIDAD | {integridad.texto()}")
+    log_output.append("--- FIN DEL PROCESO ---")
+    if solo_validar:
+        return datos, log_output
+    return salida.resultado, log_output
+
+
+def leer_zonas(archivo_excel_cargado):
+    """
+    Zonas distintas de la columna ZONA de la hoja 'BASE' (para el selector de la página),
+    sin espacios y en mayúsculas como las recibe la API: el filtro ya las compara así.
+    """
+    df_zonas = leer_hoja(archivo_excel_cargado, sheet_name='BASE', usecols=['ZONA'])
+    zonas = df_zonas['ZONA'].dropna().astype(str).str.strip().str.upper()
+    return [zona for zona in zonas.unique().tolist() if zona]
@@ -0,0 +1,271 @@
+# segmentador/provincia_corte_2.py
+"""Segmentación del consolidado de Provincia Corte 2 por zona homologada (NORTE/SUR)."""
+import io
+import re
+import time
+from functools import lru_cache
+
+import pandas as pd
+
+from segmentador.alias import ALIAS_PROVINCIA, mapeo_alias
+from segmentador.base_salida import FORMATO_XLSX, escribir_base
+from segmentador.empalme_base import fuente_base
+from segmentador.integridad import NOMBRE_RESUMEN, integridad_de, libro_resumen
+from segmentador.lectura import leer_hoja, leer_reporte_y_base
+from segmentador.metricas import marcar_etapa
+from segmentador.normalizacion import normalizar_nombre
+from segmentador.particion import filas_de_asesores, particion_base
+from segmentador.plan_corte2 import compilar_plan_provincia_corte_2, escribir_reporte_con_plan
+from segmentador.registros import DESCUADRE, ERROR, OK, SIN_VALIDAR, Bitacora, RegistroAgencia
+from segmentador.salida import SalidaValidacion, SalidaZip, limpiar_nombre_archivo
+from segmentador.zonas import (agencias_sin_asesores, claves_con_asesores, departamentos_de_zona,
+                               get_zona_departamento, linea_sin_asesores)
+
+
+@lru_cache(maxsize=8)
+def _patron_departamentos(departamentos):
+    """
+    Una sola expresión para todos los departamentos, compilada una vez por lista.
+    El match más a la izquierda es el sufijo más largo, igual que probar la lista
+    ordenada de mayor a menor longitud.
+    """
+    alternativas = '|'.join(re.escape(depto) for depto in departamentos)
+    return re.compile(r'\s+(?:' + alternativas + ')$', flags=re.IGNORECASE)
+
+
+def get_agencia_base(nombre_completo, lista_departamentos):
+    """
+    Separa el nombre base de la agencia del departamento de forma robusta.
+    Ej: 'MI AGENCIA PIURA' -> 'MI AGENCIA'
+    """
+    if not isinstance(nombre_completo, str):
+        return ""
+    if lista_departamentos:
+        cleaned_name, num_subs = _patron_departamentos(tuple(lista_departamentos)).subn('', nombre_completo)
+        if num_subs > 0:
+            return cleaned_name.strip()
+    return nombre_completo.strip()
+
+
+def cargar_datos(archivo_excel_cargado, zona_seleccionada):
+    """
+    Valida cabeceras, lee las hojas y filtra BASE y reporte por la zona homologada.
+    Devuelve (datos, log); datos es None si algo falló.
+    """
+    log_output = []
+    log_output.append(f"--- INICIO DEL PROCESO: PROVINCIA CORTE 2 | ZONA: {zona_seleccionada} ---")
+
+    mapeo_asesor_alias = mapeo_alias(ALIAS_PROVINCIA)
+    log_output.append(f"Usando mapa de alias para: {', '.join(mapeo_asesor_alias.keys())}")
+
+    # --- 1. Validación de Cabeceras ---
+    marcar_etapa("validacion")
+    try:
+        df_headers_reporte = leer_hoja(archivo_excel_cargado, sheet_name='Reporte CORTE 2', header=None, nrows=2)
+        fila2_headers = [str(h).strip().upper() for h in df_headers_reporte.iloc[1].values]
+        if 'AGENCIA' not in fila2_headers or 'RUC' not in fila2_headers:
+            log_output.append("ALERTA: Cabeceras 'AGENCIA' o 'RUC' no encontradas en 'Reporte CORTE 2'.")
+            return None, log_output
+
+        df_headers_base = leer_hoja(archivo_excel_cargado, sheet_name='BASE', header=None, nrows=1)
+        base_headers = [str(h).strip().upper() for h in df_headers_base.iloc[0].values]
+        if 'ASESOR' not in base_headers or 'DEPARTAMENTO' not in base_headers:
+            log_output.append("ALERTA: Cabeceras 'ASESOR' o 'DEPARTAMENTO' no encontradas en la hoja 'BASE'.")
+            return None, log_output
+        log_output.append("Validación de cabeceras exitosa.")
+
+    except Exception as e:
+        log_output.append(f"ERROR al validar cabeceras: {e}")
+        return None, log_output
+
+    # --- 2. Lectura y Preparación de Datos ---
+    try:
+        log_output.append("Leyendo datos completos...")
+        marcar_etapa("lectura")
+        # Reporte y BASE a la vez: la BASE se lee en otro proceso o sale de la caché (ver segmentador/lectura.py)
+        df_reporte_total, df_base_total, base_reutilizada = leer_reporte_y_base(
+            archivo_excel_cargado,
+            dict(sheet_name='Reporte CORTE 2', header=[0, 1]),
+            dict(sheet_name='BASE'),
+        )
+        if base_reutilizada:
+            log_output.append("Hoja 'BASE' idéntica a una ya leída: se reutiliza sin volver a leerla.")
+        df_base_total.columns = df_base_total.columns.str.strip().str.upper()
+
+        # --- FILTRO DE ZONA en la BASE ---
+        marcar_etapa("preparacion")
+        df_base_total['ZONA'] = df_base_total['DEPARTAMENTO'].apply(get_zona_departamento)
+
+        base_sin_zona = df_base_total['ZONA'].isna().sum()
+        if base_sin_zona > 0:
+            deptos_sin_zona = df_base_total[df_base_total['ZONA'].isna()]['DEPARTAMENTO'].unique().tolist()
+            log_output.append(f"ALERTA: {base_sin_zona} registros no tienen zona asignada. Departamentos: {deptos_sin_zona}")
+
+        df_base_filtrada = df_base_total[df_base_total['ZONA'] == zona_seleccionada].copy()
+        log_output.append(f"BASE filtrada por zona '{zona_seleccionada}': {len(df_base_filtrada)} de {len(df_base_total)} registros.")
+
+        # Obtener lista de asesores válidos en la zona para filtrar el reporte
+        asesores_en_zona = set(df_base_filtrada['ASESOR'].apply(normalizar_nombre).tolist())
+
+        lista_departamentos = df_base_total['DEPARTAMENTO'].dropna().unique().tolist()
+        lista_departamentos.sort(key=len, reverse=True)
+        log_output.append(f"Detectados {len(lista_departamentos)} departamentos para limpieza de nombres.")
+
+        col_agencia_reporte = next((col for col in df_reporte_total.columns if 'AGENCIA' in col[1]), None)
+        if not col_agencia_reporte:
+            log_output.append("ERROR: No se encontró la columna 'AGENCIA' en 'Reporte CORTE 2'.")
+            return None, log_output
+
+        df_reporte_total['AGENCIA_BASE'] = df_reporte_total[col_agencia_reporte].apply(
+            lambda x: get_agencia_base(x, lista_departamentos)
+        )
+        df_reporte_total['AGENCIA_BASE_NORMALIZADA'] = df_reporte_total['AGENCIA_BASE'].apply(normalizar_nombre)
+        df_base_filtrada['ASESOR_NORMALIZADO'] = df_base_filtrada['ASESOR'].apply(normalizar_nombre)
+
+        # --- FILTRO DE ZONA en el REPORTE ---
+        # Agencias con registros en la BASE filtrada por zona (por su nombre o por alias)
+        claves_zona = claves_con_asesores(df_base_filtrada['ASESOR_NORMALIZADO'], mapeo_asesor_alias)
+        df_reporte_filtrado = df_reporte_total[df_reporte_total['AGENCIA_BASE_NORMALIZADA'].isin(claves_zona)].copy()
+        # Sin asesores pero de la zona por el departamento de su nombre: solo para sugerir alias
+        departamentos_zona = departamentos_de_zona(zona_seleccionada) + [
+            d for d in lista_departamentos if get_zona_departamento(d) == zona_seleccionada]
+        col_altas_reporte = next((col for col in df_reporte_total.columns if 'ALTAS' in col[1]), None)
+        sin_asesores = agencias_sin_asesores(df_reporte_total, 'AGENCIA_BASE_NORMALIZADA', col_agencia_reporte,
+                                             col_altas_reporte, claves_zona, departamentos_zona, zona_seleccionada)
+        linea = linea_sin_asesores(sin_asesores)
+        if linea:
+            log_output.append(linea)
+        log_output.append(f"REPORTE filtrado por zona '{zona_seleccionada}': {len(df_reporte_filtrado)} de {len(df_reporte_total)} filas.")
+
+    except Exception as e:
+        log_output.append(f"ERROR al leer o preparar datos: {e}")
+        return None, log_output
+
+    datos = {'reporte': df_reporte_filtrado, 'base': df_base_filtrada, 'sin_asesores': sin_asesores,
+             'log_carga': list(log_output)}
+    return datos, log_output
+
+
+def _linea_log(registro):
+    """Línea del log para una agencia (mismo formato de siempre)."""
+    if registro.estado == ERROR:
+        return f"Error validando la agencia '{registro.clave}': {registro.detalle}"
+    if registro.estado == SIN_VALIDAR:
+        return f"INFO     | {registro.clave:<40} | No se pudo encontrar la columna ALTAS para validar."
+    if registro.estado == OK:
+        return f"ÉXITO    | {registro.clave:<40} | ALTAS: {registro.altas:<5} | Registros BASE: {registro.filas_base:<5} | OK"
+    return f"DESCUADRE | {registro.clave:<40} | ALTAS: {registro.altas:<5} | Registros BASE: {registro.filas_base:<5} | REVISAR"
+
+
+def procesar_provincia_corte_2(archivo_excel_cargado, zona_seleccionada, salida=None, formato_base=FORMATO_XLSX,
+                               solo_validar=False, datos=None, agencias=None, resumen=False):
+    """
+    Genera un Excel por agencia de la zona seleccionada.
+    Con `solo_validar=True` solo valida y concilia ALTAS contra BASE, sin generar
+    archivos, y devuelve los datos leídos; pasándolos luego en `datos` se generan
+    los reportes sin volver a leer el Excel.
+    Con `resumen=True` se agrega además NOMBRE_RESUMEN (registros por agencia e
+    integridad de la BASE, segmentador/integridad.py); por defecto no se incluye.
+    Con `agencias` (claves normalizadas) solo se generan esas agencias, sin el libro
+    de resumen: es lo que usa la vista por agencia de la página.
+    El log se devuelve como Bitacora (segmentador/registros.py), con un registro por agencia.
+    """
+    if datos is None:
+        datos, log_carga = cargar_datos(archivo_excel_cargado, zona_seleccionada)
+        if datos is None:
+            return None, Bitacora(_linea_log, log_carga)
+    else:
+        log_carga = datos['log_carga']
+    log_output = Bitacora(_linea_log, log_carga)
+    df_reporte_filtrado = datos['reporte']
+    df_base_filtrada = datos['base']
+    mapeo_asesor_alias = mapeo_alias(ALIAS_PROVINCIA)
+
+    # --- 3. Proceso de Segmentación ---
+    marcar_etapa("segmentacion")
+    if solo_validar:
+        salida = SalidaValidacion()
+    elif salida is None:
+        salida = SalidaZip()
+    with salida as destino:
+        todas_las_agencias = df_reporte_filtrado['AGENCIA_BASE_NORMALIZADA'].dropna().unique().tolist()
+        agencias_a_procesar = todas_las_agencias if agencias is None else [a for a in todas_las_agencias if a in agencias]
+        log_output.append(f"Se encontraron {len(agencias_a_procesar)} agencias en zona '{zona_seleccionada}' para procesar.")
+
+        # Layout de salida y columna ALTAS: se resuelven una vez para todas las agencias
+        plan_salida = compilar_plan_provincia_corte_2(df_reporte_filtrado.columns)
+        col_altas = next((col for col in df_reporte_filtrado.columns if 'ALTAS' in col[1]), None)
+
+        # COD_PEDIDO duplicados o en varias agencias y filas de BASE (de la zona) sin agencia
+        integridad = integridad_de(datos, 'ASESOR_NORMALIZADO', todas_las_agencias, mapeo_asesor_alias)
+        # Filas de BASE por asesor, agrupadas una sola vez (queda en `datos`)
+        particion = particion_base(datos)
+        # Filas de la hoja BASE copiadas del XML original (segmentador/empalme_base.py)
+        fuente = fuente_base(archivo_excel_cargado, df_base_filtrada) if formato_base == FORMATO_XLSX and not solo_validar else None
+
+        for agencia_norm in agencias_a_procesar:
+            reporte_agencia = df_reporte_filtrado[
+                df_reporte_filtrado['AGENCIA_BASE_NORMALIZADA'] == agencia_norm
+            ].copy()
+
+            # --- Lógica de cruce con mapa de alias ---
+            nombres_a_buscar = mapeo_asesor_alias.get(agencia_norm, [agencia_norm])
+            base_agencia = filas_de_asesores(df_base_filtrada, particion, nombres_a_buscar).copy()
+
+            if reporte_agencia.empty:
+                continue
+
+            # --- Nombre de la agencia para el archivo ---
+            nombre_original_agencia = reporte_agencia[('AGENCIA_BASE', '')].iloc[0]
+
+            # --- Bloque de validación (queda en el registro de la agencia) ---
+            registro = RegistroAgencia(agencia=nombre_original_agencia, clave=agencia_norm, zona=zona_seleccionada,
+                                       filas_base=len(base_agencia))
+            try:
+                if col_altas:
+                    registro.altas = int(pd.to_numeric(reporte_agencia[col_altas], errors='coerce').fillna(0).sum())
+                    registro.estado = OK if registro.altas == registro.filas_base else DESCUADRE
+                else:
+                    registro.estado = SIN_VALIDAR
+            except Exception as e:
+                registro.estado = ERROR
+                registro.detalle = str(e)
+            log_output.registrar(registro)
+
+            if solo_validar:
+                continue
+
+            # --- Generación del archivo Excel ---
+            inicio_render = time.perf_counter()
+            nombre_archivo_limpio = limpiar_nombre_archivo(nombre_original_agencia)
+            output_buffer = io.BytesIO()
+            libro_base = fuente.libro() if fuente is not None else None
+            with pd.ExcelWriter(output_buffer, engine='xlsxwriter') as writer:
+                # Cabeceras aplanadas, colores y formatos salen del plan compilado una sola vez
+                escribir_reporte_con_plan(writer, 'Reporte CORTE 2', reporte_agencia, plan_salida)
+                partes_base = escribir_base(
+                    writer,
+                    base_agencia.drop(columns=['ASESOR_NORMALIZADO', 'ZONA'], errors='ignore'),
+                    formato_base, destino, nombre_archivo_limpio,
+                    f"BASE Provincia Corte 2 {nombre_archivo_limpio}",
+                    empalme=libro_base,
+                )
+                if len(partes_base) > 1:
+                    log_output.append(f"          | {agencia_norm:<40} | BASE dividida en {len(partes_base)} hojas")
+
+            contenido = output_buffer.getvalue()
+            if libro_base is not None:
+                contenido = libro_base.completar(contenido)
+            registro.archivo = f"Reporte Provincia Corte 2 {nombre_archivo_limpio}.xlsx"
+            destino.agregar(nombre_archivo_limpio, registro.archivo, contenido)
+            registro.segundos_render = round(time.perf_counter() - inicio_render, 4)
+            registro.bytes_salida = len(contenido)
+
+        if resumen and not solo_validar and agencias is None:
+            destino.agregar(None, NOMBRE_RESUMEN, libro_resumen(log_output, integridad))
+
+    log_output.append(f"INTEGRIDAD | {integridad.texto()}")
+    log_output.append("--- FIN DEL PROCESO ---")
+    if solo_validar:
+        return datos, log_output
+    return salida.resultado, log_output
@@ -0,0 +1,108 @@
+# segmentador/registros.py
+"""
+Registro estructurado de cada agencia procesada.
+
+Cada proceso anota por agencia un RegistroAgencia (agencia, zona, ALTAS, filas
+de BASE, estado, tiempo de armado y bytes del archivo) en una Bitacora. El log
+de texto que se muestra en la página se arma a partir de esos registros, con el
+formato de línea propio de cada reporte; las métricas de la interfaz y las
+exportaciones JSON/CSV leen los registros directamente.
+"""
+import csv
+import io
+import json
+from dataclasses import asdict, dataclass, fields
+
+# Estados posibles de una agencia
+OK = "OK"
+DESCUADRE = "DESCUADRE"
+ERROR = "ERROR"
+SIN_VALIDAR = "SIN_VALIDAR"
+
+
+def _nativo(valor):
+    """Convierte escalares de numpy/pandas a tipos de Python (para JSON/CSV)."""
+    if hasattr(valor, "item"):
+        return valor.item()
+    return valor
+
+
+@dataclass
+class RegistroAgencia:
+    agencia: str
+    clave: str = ""
+    zona: str = ""
+    altas: object = None
+    filas_base: int = 0
+    estado: str = OK
+    segundos_render: float = 0.0
+    bytes_salida: int = 0
+    archivo: str = ""
+    detalle: str = ""
+
+
+class Bitacora:
+    """
+    Log de un proceso: líneas de texto sueltas más un RegistroAgencia por agencia.
+    `append` acepta líneas como una lista, así que el código del proceso sigue
+    escribiendo el log igual que antes; `registrar` agrega una agencia, cuya línea
+    se arma con `formatear(registro)` recién al pedir `lineas_log()`.
+    """
+
+    def __init__(self, formatear=None, lineas=None):
+        self.formatear = formatear
+        self.registros = []
+        self._entradas = list(lineas or [])
+
+    def append(self, linea):
+        self._entradas.append(linea)
+
+    def registrar(self, registro):
+        self.registros.append(registro)
+        self._entradas.append(registro)
+        return registro
+
+    def lineas_log(self):
+        return [e if isinstance(e, str) else self.formatear(e) for e in self._entradas]
+
+    def texto(self):
+        return "\n".join(self.lineas_log())
+
+    def contar(self, *estados):
+        return sum(1 for r in self.registros if r.estado in estados)
+
+    def resumen(self):
+        """Totales para las métricas de la página."""
+        return {
+            'agencias': len(self.registros),
+            'ok': self.contar(OK),
+            'descuadres': self.contar(DESCUADRE),
+            'errores': self.contar(ERROR),
+            'segundos_render': round(sum(r.segundos_render for r in self.registros), 3),
+            'bytes_salida': sum(r.bytes_salida for r in self.registros),
+        }
+
+    # --- Exportación ---
+    def registros_dict(self):
+        return [{k: _nativo(v) for k, v in asdict(r).items()} for r in self.registros]
+
+    def a_json(self):
+        return json.dumps(self.registros_dict(), ensure_ascii=False, indent=2).encode('utf-8')
+
+    def a_csv(self):
+        texto = io.StringIO()
+        escritor = csv.DictWriter(texto, fieldnames=[f.name for f in fields(RegistroAgencia)])
+        escritor.writeheader()
+        escritor.writerows(self.registros_dict())
+        return texto.getvalue().encode('utf-8-sig')
+
+    # --- Persistencia (caché de resultados) ---
+    def a_dict(self):
+        return {'lineas': self.lineas_log(), 'registros': self.registros_dict()}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        """Bitácora guardada con `a_dict`: las líneas ya vienen armadas."""
+        bitacora = cls(lineas=datos.get('lineas', []))
+        bitacora.registros = [RegistroAgencia(**r) for r in datos.get('registros', [])]
+        return bitacora
@@ -0,0 +1,217 @@
+# segmentador/salida.py
+"""
+Destinos de salida para los reportes generados por agencia.
+
+Todas las páginas entregan sus archivos a un "destino" con la misma interfaz:
+`agregar(agencia, nombre_archivo, datos)` por cada archivo (agencia=None para los
+archivos generales, como el resumen), usado dentro de un bloque `with` (igual que
+antes con zipfile). Al salir del bloque sin errores el
+destino se cierra y su `resultado` queda listo para devolverlo a la página.
+- SalidaZip: el .zip en memoria de siempre, listo para st.download_button.
+- SalidaDirectorio: escribe cada archivo directamente en una carpeta compartida
+  (tipo de reporte / zona / agencia) y deja un manifiesto con tamaños y checksums.
+  La carpeta tiene que quedar dentro de SEGMENTADOR_DESTINO; sin esa variable no
+  se escribe en carpetas del servidor.
+- SalidaValidacion: validación en seco; no escribe nada.
+- SalidaMemoria: archivos sueltos en memoria, para generar una sola agencia a pedido.
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+NOMBRE_MANIFIESTO = "manifiesto.json"
+
+
+class DestinoNoPermitido(ValueError):
+    """La carpeta pedida queda fuera de SEGMENTADOR_DESTINO, o no hay raíz configurada."""
+
+
+def raiz_destino():
+    """Raíz permitida para escribir en carpeta (SEGMENTADOR_DESTINO, ya resuelta), o None si no se configuró."""
+    raiz = os.environ.get("SEGMENTADOR_DESTINO", "").strip()
+    return os.path.realpath(raiz) if raiz else None
+
+
+def resolver_destino(destino):
+    """
+    Ruta real de `destino` (relativa a la raíz si no es absoluta), con enlaces
+    simbólicos y '..' resueltos. Lanza DestinoNoPermitido si queda fuera de la raíz.
+    """
+    raiz = raiz_destino()
+    if raiz is None:
+        raise DestinoNoPermitido("La escritura en carpeta está desactivada: falta configurar SEGMENTADOR_DESTINO")
+    ruta = os.path.realpath(os.path.join(raiz, str(destino).strip()))
+    if os.path.commonpath([raiz, ruta]) != raiz:
+        raise DestinoNoPermitido(f"La carpeta {destino!r} queda fuera de {raiz}")
+    return ruta
+
+
+def limpiar_nombre_archivo(nombre):
+    """Deja solo letras, números, espacios y guiones bajos (mismo criterio de siempre)."""
+    return "".join(c for c in str(nombre) if c.isalnum() or c in (' ', '_')).rstrip()
+
+
+def _escribir_atomico(ruta_final, datos):
+    """
+    Escribe `datos` en un temporal de la misma carpeta y lo renombra al final.
+    Quien lea la carpeta nunca ve un archivo a medio escribir.
+    """
+    carpeta = os.path.dirname(ruta_final)
+    os.makedirs(carpeta, exist_ok=True)
+    fd, ruta_tmp = tempfile.mkstemp(dir=carpeta, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(datos)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta_tmp, ruta_final)
+    except BaseException:
+        try:
+            os.remove(ruta_tmp)
+        except OSError:
+            pass
+        raise
+
+
+class _Salida:
+    """Base común: manejo del bloque `with` y del resultado final."""
+
+    resultado = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_exc, exc, tb):
+        if tipo_exc is None:
+            self.resultado = self.cerrar()
+        else:
+            self.abortar()
+        return False
+
+    def abortar(self):
+        pass
+
+
+class SalidaValidacion(_Salida):
+    """Destino de la validación en seco: los procesos no generan archivos y esto no escribe nada."""
+
+    def agregar(self, agencia, nombre_archivo, datos):
+        pass
+
+    def cerrar(self):
+        return None
+
+
+class SalidaMemoria(_Salida):
+    """Archivos sueltos en un dict {nombre_archivo: bytes}; es el `resultado` al cerrar."""
+
+    def __init__(self):
+        self.archivos = {}
+
+    def agregar(self, agencia, nombre_archivo, datos):
+        self.archivos[nombre_archivo] = datos
+
+    def cerrar(self):
+        return self.archivos
+
+
+class SalidaZip(_Salida):
+    """
+    Acumula los reportes en un .zip. Sin `ruta` queda en memoria (comportamiento
+    original); con `ruta` se escribe directamente en ese archivo.
+    El archivo se abre al entrar al bloque `with`.
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta
+        self.buffer = io.BytesIO() if ruta is None else None
+        self._zf = None
+
+    def __enter__(self):
+        self._zf = zipfile.ZipFile(self.ruta or self.buffer, 'w', zipfile.ZIP_DEFLATED)
+        return self
+
+    def agregar(self, agencia, nombre_archivo, datos):
+        self._zf.writestr(nombre_archivo, datos)
+
+    def cerrar(self):
+        """Cierra el zip y devuelve su ruta, o el BytesIO posicionado al inicio."""
+        self._zf.close()
+        if self.ruta:
+            return self.ruta
+        self.buffer.seek(0)
+        return self.buffer
+
+    def abortar(self):
+        self._zf.close()
+        if self.ruta:
+            try:
+                os.remove(self.ruta)
+            except OSError:
+                pass
+
+
+class SalidaDirectorio(_Salida):
+    """
+    Escribe cada reporte en `destino/<tipo_reporte>/<zona>/<agencia>/<archivo>`;
+    `destino` pasa por `resolver_destino` (DestinoNoPermitido si sale de la raíz).
+
+    Las escrituras (hash + disco) se reparten en un pool de hilos mientras el
+    proceso principal sigue generando el siguiente Excel. Cada archivo se
+    publica con renombrado atómico y, al cerrar, se escribe `manifiesto.json`
+    en la carpeta de la zona con tamaño y SHA-256 de cada archivo.
+    """
+
+    def __init__(self, destino, tipo_reporte, zona, max_hilos=4):
+        self.carpeta = os.path.join(resolver_destino(destino), limpiar_nombre_archivo(tipo_reporte), limpiar_nombre_archivo(zona))
+        self.tipo_reporte = tipo_reporte
+        self.zona = zona
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='salida')
+        self._pendientes = []
+
+    def _escribir(self, ruta_relativa, datos):
+        _escribir_atomico(os.path.join(self.carpeta, ruta_relativa), datos)
+        return {
+            'archivo': ruta_relativa.replace(os.sep, '/'),
+            'bytes': len(datos),
+            'sha256': hashlib.sha256(datos).hexdigest(),
+        }
+
+    def agregar(self, agencia, nombre_archivo, datos):
+        if agencia is None:
+            # Archivo general del proceso (p. ej. el resumen): va en la carpeta de la zona
+            ruta_relativa = nombre_archivo
+        else:
+            ruta_relativa = os.path.join(limpiar_nombre_archivo(agencia) or '_SIN_NOMBRE', nombre_archivo)
+        self._pendientes.append(self._pool.submit(self._escribir, ruta_relativa, datos))
+
+    def cerrar(self):
+        """Espera todas las escrituras, publica el manifiesto y devuelve su ruta."""
+        try:
+            archivos = [futuro.result() for futuro in self._pendientes]
+        finally:
+            self._pool.shutdown(wait=True)
+        manifiesto = {
+            'tipo_reporte': self.tipo_reporte,
+            'zona': self.zona,
+            'generado': datetime.now().isoformat(timespec='seconds'),
+            'total_archivos': len(archivos),
+            'total_bytes': sum(a['bytes'] for a in archivos),
+            'archivos': sorted(archivos, key=lambda a: a['archivo']),
+        }
+        ruta_manifiesto = os.path.join(self.carpeta, NOMBRE_MANIFIESTO)
+        _escribir_atomico(ruta_manifiesto, json.dumps(manifiesto, ensure_ascii=False, indent=2).encode('utf-8'))
+        return ruta_manifiesto
+
+    def abortar(self):
+        # Los archivos ya publicados quedan, pero sin manifiesto nuevo: el
+        # consumidor sigue viendo el manifiesto de la última corrida completa.
+        for futuro in self._pendientes:
+            futuro.cancel()
+        self._pool.shutdown(wait=True)
+
@@ -0,0 +1,165 @@
+# segmentador/sugerencias_alias.py
+"""
+Sugerencias de alias para agencias en DESCUADRE.
+
+Cuando el AGENCIA del reporte y el ASESOR de la BASE difieren en algo más que
+mayúsculas y puntuación (tildes, "SAC" vs "S.A.C.", una letra cambiada...), la
+agencia sale con menos filas de BASE que ALTAS y sus filas quedan huérfanas.
+Aquí se proponen, para cada agencia a la que le faltan filas, los asesores
+huérfanos con nombre más parecido, ordenados por puntaje.
+
+Sin comparar todos contra todos: se arma un índice invertido de trigramas de
+caracteres sobre los asesores normalizados distintos que ninguna agencia toma.
+Los nombres se comparan sin tildes, puntuación, forma societaria ni las palabras
+que comparten casi todos (p. ej. "AGENCIA"). Cada agencia solo se compara con
+los asesores que comparten alguno de sus trigramas menos frecuentes; el puntaje
+final es el coeficiente de Dice de los trigramas, desempatado por difflib.
+
+Las sugerencias aceptadas en la página se guardan con alias.aceptar_alias y
+entran en el mapa de alias de las siguientes corridas.
+"""
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+
+from segmentador.integridad import indice_asesores
+from segmentador.particion import COLUMNA_ASESOR, particion_base
+from segmentador.registros import DESCUADRE
+
+# Formas societarias: no ayudan a distinguir agencias
+FORMAS_SOCIETARIAS = frozenset(['SAC', 'SA', 'SAA', 'SRL', 'EIRL', 'SCRL', 'SL'])
+PUNTAJE_MINIMO = 0.45
+SUGERENCIAS_POR_AGENCIA = 3
+MAX_CANDIDATOS = 50
+# Una palabra presente en más de esta fracción de los nombres no distingue agencias
+FRACCION_PALABRA_COMUN = 0.5
+
+
+def palabras(nombre):
+    """Palabras del nombre sin tildes ni puntuación ('Agencia Núñez S. A. C.' -> ['AGENCIA', 'NUNEZ', 'SAC'])."""
+    texto = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode('ascii').upper()
+    texto = texto.replace('.', '')
+    resultado = []
+    anterior_suelta = False
+    for palabra in ''.join(c if c.isalnum() else ' ' for c in texto).split():
+        suelta = len(palabra) == 1 and palabra.isalpha()
+        if suelta and anterior_suelta:
+            resultado[-1] += palabra  # letras sueltas seguidas ("S A C") son una sola palabra
+        else:
+            resultado.append(palabra)
+        anterior_suelta = suelta
+    return resultado
+
+
+def palabras_comunes(nombres, fraccion=FRACCION_PALABRA_COMUN):
+    """Palabras que aparecen en más de `fraccion` de los nombres (con al menos 5 nombres)."""
+    nombres = list(nombres)
+    if len(nombres) < 5:
+        return frozenset()
+    conteo = Counter(p for nombre in nombres for p in set(palabras(nombre)))
+    return frozenset(p for p, n in conteo.items() if n > fraccion * len(nombres))
+
+
+def clave_comparacion(nombre, comunes=frozenset()):
+    """Palabras que distinguen al nombre: sin forma societaria ni palabras comunes ('AGENCIA NUÑEZ S.A.C.' -> 'NUNEZ')."""
+    todas = palabras(nombre)
+    utiles = [p for p in todas if p not in FORMAS_SOCIETARIAS and p not in comunes]
+    return ' '.join(utiles or todas)
+
+
+def trigramas(clave):
+    relleno = f"  {clave} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class IndiceTrigramas:
+    """Índice invertido trigrama -> nombres, sobre nombres ya normalizados."""
+
+    def __init__(self, nombres, comunes=frozenset()):
+        self.nombres = list(dict.fromkeys(nombres))
+        self.comunes = comunes
+        self.claves = [clave_comparacion(n, comunes) for n in self.nombres]
+        self.gramas = [trigramas(c) for c in self.claves]
+        self.indice = defaultdict(list)
+        for posicion, gramas in enumerate(self.gramas):
+            for grama in gramas:
+                self.indice[grama].append(posicion)
+        # Un trigrama presente en más de esta cantidad de nombres no sirve para elegir candidatos
+        self.max_frecuencia = max(20, len(self.nombres) // 10)
+
+    def buscar(self, nombre, limite=SUGERENCIAS_POR_AGENCIA, minimo=PUNTAJE_MINIMO):
+        """[(nombre, puntaje)] de los más parecidos, de mayor a menor puntaje."""
+        clave = clave_comparacion(nombre, self.comunes)
+        gramas = trigramas(clave)
+        listas = sorted((self.indice[g] for g in gramas if g in self.indice), key=len)
+        if not listas:
+            return []
+        selectivas = [lista for lista in listas if len(lista) <= self.max_frecuencia] or listas[:3]
+        coincidencias = Counter()
+        for lista in selectivas:
+            coincidencias.update(lista)
+        resultados = []
+        for posicion, _ in coincidencias.most_common(MAX_CANDIDATOS):
+            otros = self.gramas[posicion]
+            dice = 2 * len(gramas & otros) / (len(gramas) + len(otros))
+            if dice < minimo:
+                continue
+            parecido = SequenceMatcher(None, clave, self.claves[posicion]).ratio()
+            resultados.append((self.nombres[posicion], round(dice, 3), parecido))
+        resultados.sort(key=lambda r: (-r[1], -r[2], r[0]))
+        return [(nombre, puntaje) for nombre, puntaje, _ in resultados[:limite]]
+
+
+@dataclass
+class SugerenciaAlias:
+    agencia: str        # nombre para mostrar
+    clave: str          # agencia normalizada (clave del mapa de alias)
+    altas: int
+    filas_base: int
+    asesor: str         # asesor normalizado propuesto como alias
+    filas_asesor: int
+    puntaje: float
+
+    @property
+    def faltan(self):
+        return self.altas - self.filas_base
+
+    @property
+    def cuadra(self):
+        """True si con este alias la agencia quedaría con tantas filas como ALTAS."""
+        return self.filas_asesor == self.faltan
+
+
+def sugerir_alias(datos, bitacora, mapeo_alias, limite=SUGERENCIAS_POR_AGENCIA, minimo=PUNTAJE_MINIMO):
+    """
+    Sugerencias para cada agencia en DESCUADRE con menos filas de BASE que ALTAS, a
+    partir de los datos y la bitácora de una validación (`solo_validar=True`).
+    También entran las agencias de la zona sin ningún asesor en la BASE, que no se
+    generan (datos['sin_asesores'], ver zonas.agencias_sin_asesores).
+    Solo se proponen asesores que hoy no toma ninguna agencia.
+    """
+    registros = bitacora.registros + list(datos.get('sin_asesores') or [])
+    particion = particion_base(datos)
+    tomados = indice_asesores([r.clave for r in registros], mapeo_alias)
+    huerfanos = [asesor for asesor in particion if asesor and asesor not in tomados]
+    if not huerfanos or COLUMNA_ASESOR not in datos['base'].columns:
+        return []
+    claves_agencias = [r.clave for r in registros]
+    indice = IndiceTrigramas(huerfanos, palabras_comunes(claves_agencias + huerfanos))
+
+    sugerencias = []
+    for registro in registros:
+        try:
+            faltan = int(registro.altas) - int(registro.filas_base)
+        except (TypeError, ValueError):
+            continue
+        if registro.estado != DESCUADRE or faltan <= 0:
+            continue
+        for asesor, puntaje in indice.buscar(registro.clave, limite, minimo):
+            sugerencias.append(SugerenciaAlias(
+                agencia=registro.agencia, clave=registro.clave, altas=int(registro.altas),
+                filas_base=int(registro.filas_base), asesor=asesor,
+                filas_asesor=len(particion[asesor]), puntaje=puntaje,
+            ))
+    return sugerencias
@@ -0,0 +1,381 @@
+# segmentador/ui.py
+"""Piezas de interfaz Streamlit que comparten todas las páginas."""
+import importlib
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+
+import streamlit as st
+
+from segmentador.alias import aceptar_alias, mapeo_alias
+from segmentador.almacen import AlmacenResultados, SalidaAlmacen, iniciar_limpieza_periodica
+from segmentador.base_salida import FORMATO_XLSX, formatos_disponibles
+from segmentador.cache_resultados import buscar, clave_resultado, hash_contenido
+from segmentador.registros import DESCUADRE, ERROR, OK, SIN_VALIDAR, Bitacora
+from segmentador.salida import DestinoNoPermitido, SalidaDirectorio, SalidaMemoria, raiz_destino, resolver_destino
+
+MODO_ZIP = "Descargar .zip"
+MODO_CARPETA = "Escribir en carpeta compartida"
+
+_candado_importacion = threading.Lock()
+
+
+@st.cache_resource(show_spinner=False)
+def cargar_proceso(nombre_modulo):
+    """
+    Importa `segmentador.<nombre_modulo>` (y con él pandas) recién cuando se va a
+    procesar. Queda en caché para todas las sesiones: los reruns de la página no
+    vuelven a pagar la importación ni a reconstruir tablas, regex o estilos.
+    Las importaciones van de a una: dos sesiones importando a la vez procesos que
+    comparten módulos (openpyxl, pandas) pueden recibir un módulo a medio inicializar.
+    """
+    with _candado_importacion:
+        return importlib.import_module(f"segmentador.{nombre_modulo}")
+
+
+@st.cache_resource(show_spinner=False)
+def almacen_resultados():
+    """Almacén de zips compartido por todas las sesiones, con su hilo de limpieza."""
+    almacen = AlmacenResultados()
+    iniciar_limpieza_periodica(almacen)
+    return almacen
+
+
+def preparar_salida(carpeta_destino, tipo_reporte, zona, id_resultado=None):
+    """
+    Destino del proceso: la carpeta compartida si se indicó una, si no un zip
+    escrito en el almacén de resultados (el proceso devuelve su id).
+    """
+    if carpeta_destino:
+        return SalidaDirectorio(carpeta_destino, tipo_reporte, zona)
+    return SalidaAlmacen(almacen_resultados(), {'tipo_reporte': tipo_reporte, 'zona': zona}, id_resultado)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _hash_archivo(file_id, _archivo):
+    """Hash del contenido subido, una vez por archivo (file_id)."""
+    return hash_contenido(_archivo.getvalue())
+
+
+def ejecutar_con_cache(archivo, carpeta_destino, tipo_reporte, zona, opciones, ejecutar):
+    """
+    Corre `ejecutar(salida) -> (resultado, bitacora)` salvo que el mismo archivo ya se
+    haya procesado con el mismo tipo de reporte, zona y opciones (en cualquier
+    sesión): en ese caso devuelve el zip y el log guardados.
+    Devuelve (resultado, log, reutilizado). La carpeta compartida nunca usa caché.
+    """
+    if carpeta_destino:
+        resultado, log = ejecutar(preparar_salida(carpeta_destino, tipo_reporte, zona))
+        return resultado, log, False
+    almacen = almacen_resultados()
+    clave = clave_resultado(_hash_archivo(archivo.file_id, archivo), tipo_reporte, zona, opciones)
+    meta = buscar(almacen, clave)
+    if meta is not None:
+        return clave, Bitacora.desde_dict(meta['log']), True
+    resultado, log = ejecutar(preparar_salida(None, tipo_reporte, zona, clave))
+    if resultado:
+        almacen.actualizar_metadatos(resultado, {'log': log.a_dict()})
+    return resultado, log, False
+
+
+AVISO_EXPIRADO = "El archivo generado ya expiró del servidor. Vuelve a procesar el archivo para descargarlo."
+
+
+def _zip_expirado():
+    """Zip con un LEEME.txt, para el clic que llega después de que el resultado expiró."""
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, 'w') as zf:
+        zf.writestr("LEEME.txt", AVISO_EXPIRADO)
+    return salida.getvalue()
+
+
+def abrir_para_descarga(almacen, id_resultado):
+    """
+    Lo que entrega el botón al hacer clic: el zip abierto del almacén (Streamlit lo lee
+    desde el archivo, sin una copia previa en la sesión) o, si expiró entre que se
+    dibujó la página y el clic, un zip con el aviso en vez de un error en el servidor.
+    """
+    try:
+        return almacen.abrir(id_resultado)
+    except FileNotFoundError:
+        return _zip_expirado()
+
+
+def boton_descarga(id_resultado, **kwargs):
+    """
+    Botón de descarga de un zip del almacén. El archivo se abre recién al hacer clic
+    (data como función: Streamlit >= 1.52); la sesión solo guarda el id.
+    """
+    almacen = almacen_resultados()
+    if not almacen.existe(id_resultado):
+        st.warning(f"⌛ {AVISO_EXPIRADO}")
+        return
+    almacen.tocar(id_resultado)
+    st.download_button(data=lambda: abrir_para_descarga(almacen, id_resultado), mime="application/zip", **kwargs)
+
+
+def selector_salida(clave):
+    """
+    Permite elegir entre el .zip descargable y la escritura directa en una carpeta
+    dentro de SEGMENTADOR_DESTINO (sin esa variable solo se ofrece el .zip).
+    Devuelve la carpeta destino ya resuelta, o None si se eligió el .zip.
+    """
+    raiz = raiz_destino()
+    if raiz is None:
+        return None
+    modo = st.radio("Destino de los reportes", [MODO_ZIP, MODO_CARPETA], horizontal=True, key=f"{clave}_modo_salida")
+    if modo != MODO_CARPETA:
+        return None
+    destino = st.text_input(
+        f"Carpeta destino (dentro de {raiz})",
+        value=raiz,
+        key=f"{clave}_carpeta_destino",
+        help="Se crean subcarpetas por tipo de reporte / zona / agencia y un manifiesto.json con tamaños y checksums.",
+    )
+    try:
+        return resolver_destino(destino.strip() or raiz)
+    except DestinoNoPermitido as e:
+        st.error(f"❌ {e}")
+        st.stop()
+
+
+def mostrar_resultado_carpeta(ruta_manifiesto):
+    """Resumen de lo escrito en la carpeta compartida, leído desde el manifiesto."""
+    with open(ruta_manifiesto, encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    total_mb = manifiesto['total_bytes'] / (1024 * 1024)
+    st.success(f"📂 {manifiesto['total_archivos']} archivos escritos en `{os.path.dirname(ruta_manifiesto)}` ({total_mb:.1f} MB)")
+    st.caption(f"Manifiesto: `{ruta_manifiesto}`")
+
+
+def selector_formato_base(clave):
+    """Formato de salida de la BASE para este tipo de reporte (el 'Reporte' siempre va en Excel)."""
+    etiquetas = {
+        'xlsx': "Excel (hoja BASE; se divide en BASE_2, BASE_3... si excede el límite de filas)",
+        'csv': "CSV aparte (más rápido)",
+        'parquet': "Parquet aparte (columnar, el más rápido y liviano)",
+    }
+    formatos = formatos_disponibles()
+    return st.selectbox(
+        "Formato de la BASE",
+        formatos,
+        index=formatos.index(FORMATO_XLSX),
+        format_func=lambda f: etiquetas.get(f, f),
+        key=f"{clave}_formato_base",
+    )
+
+
+def selector_resumen(clave):
+    """Si se agrega al resultado el libro 'Resumen del proceso.xlsx' (registros e integridad de la BASE)."""
+    return st.checkbox(
+        "Incluir libro de resumen del proceso",
+        value=False,
+        help="Agrega 'Resumen del proceso.xlsx' con los registros por agencia y la integridad de la BASE.",
+        key=f"{clave}_resumen",
+    )
+
+
+def validacion_en_seco(clave, archivo, zona, validar, generar_agencia=None, opciones=None, tipo_alias=None):
+    """
+    Botón "Solo validar": corre `validar() -> (datos, bitacora)` (lectura, cabeceras y
+    conciliación ALTAS vs BASE, sin generar archivos) y guarda el resultado en la
+    sesión para este archivo y zona. Muestra el log y, si la lectura fue correcta,
+    el botón "Generar ahora", que reutiliza los datos ya leídos.
+    Con `generar_agencia(salida, datos, clave_agencia) -> (archivos, bitacora)` muestra además
+    la vista por agencia (ver `vista_por_agencia`); con `tipo_alias` ('lima' o
+    'provincia'), las sugerencias de alias para las agencias en descuadre.
+    Devuelve esos datos cuando se pulsa "Generar ahora"; si no, None.
+    """
+    clave_estado = f"validacion_{clave}"
+    if st.button("🔎 Solo validar (sin generar archivos)", key=f"{clave}_validar",
+                 help="Lee y concilia el archivo sin generar reportes; luego se puede generar una sola agencia."):
+        with st.spinner("Validando archivo..."):
+            datos, log = validar()
+        st.session_state[clave_estado] = {'file_id': archivo.file_id, 'zona': zona, 'datos': datos, 'log': log}
+
+    estado = st.session_state.get(clave_estado)
+    if not estado:
+        return None
+    if estado['file_id'] != archivo.file_id or estado['zona'] != zona:
+        # Otro archivo u otra zona: se descartan los datos leídos para liberar memoria
+        del st.session_state[clave_estado]
+        return None
+
+    st.subheader("Resultado de la validación")
+    if estado['datos'] is None:
+        st.error("El archivo no pasó la validación.")
+        st.code(estado['log'].texto(), language=None)
+        return None
+    descuadres = estado['log'].resumen()['descuadres']
+    if descuadres:
+        st.warning(f"{descuadres} agencias con descuadre entre ALTAS y BASE.")
+    else:
+        st.success("Sin descuadres entre ALTAS y BASE.")
+    with st.expander("📋 Ver log de validación", expanded=False):
+        st.code(estado['log'].texto(), language=None)
+    con_descuadre = descuadres or estado['datos'].get('sin_asesores')
+    if tipo_alias is not None and con_descuadre and sugerencias_de_alias(clave, estado, tipo_alias):
+        # Alias nuevos: lo validado ya no vale (se concilió con el mapa anterior)
+        del st.session_state[clave_estado]
+        st.success("✓ Alias guardados. Vuelve a validar o procesar el archivo para aplicarlos.")
+        return None
+    if generar_agencia is not None:
+        vista_por_agencia(clave, estado, generar_agencia, opciones)
+    if st.button("✅ Generar ahora", key=f"{clave}_generar", type="primary"):
+        del st.session_state[clave_estado]
+        return estado['datos']
+    return None
+
+
+def sugerencias_de_alias(clave, estado, tipo_alias):
+    """
+    Asesores huérfanos de la BASE con nombre parecido a cada agencia en descuadre
+    (segmentador/sugerencias_alias.py), para aceptarlos como alias. Se calculan una
+    vez por validación. Devuelve True si se guardaron alias.
+    """
+    if 'sugerencias' not in estado:
+        sugerencias_alias = cargar_proceso("sugerencias_alias")
+        estado['sugerencias'] = sugerencias_alias.sugerir_alias(estado['datos'], estado['log'], mapeo_alias(tipo_alias))
+    sugerencias = estado['sugerencias']
+    if not sugerencias:
+        return False
+    with st.expander(f"🔗 Sugerencias de alias ({len({s.clave for s in sugerencias})} agencias en descuadre)", expanded=False):
+        st.caption("Asesores de la BASE que hoy no toma ninguna agencia, ordenados por parecido. "
+                   "Los aceptados se suman al mapa de alias para las siguientes corridas.")
+        elegidas = []
+        for i, sugerencia in enumerate(sugerencias):
+            etiqueta = (f"{sugerencia.agencia} ← {sugerencia.asesor} · {sugerencia.filas_asesor} filas "
+                        f"(faltan {sugerencia.faltan}) · {sugerencia.puntaje:.0%}")
+            if sugerencia.cuadra:
+                etiqueta += " · ✓ cuadra"
+            if st.checkbox(etiqueta, key=f"{clave}_alias_{i}"):
+                elegidas.append(sugerencia)
+        if elegidas and st.button(f"Aceptar {len(elegidas)} alias", key=f"{clave}_aceptar_alias"):
+            for sugerencia in elegidas:
+                aceptar_alias(tipo_alias, sugerencia.clave, [sugerencia.asesor])
+            return True
+    return False
+
+
+_ICONOS_ESTADO = {OK: "✓", DESCUADRE: "⚠", ERROR: "✗", SIN_VALIDAR: "ℹ"}
+
+
+def _etiqueta_agencia(registro):
+    return f"{_ICONOS_ESTADO.get(registro.estado, '')} {registro.agencia} · ALTAS {registro.altas} · BASE {registro.filas_base}"
+
+
+def vista_por_agencia(clave, estado, generar_agencia, opciones=None):
+    """
+    Una sola agencia sin armar el zip completo: lista las agencias validadas con su
+    conciliación y genera solo la elegida sobre los datos ya leídos y particionados
+    de la sesión. Los archivos generados quedan en la sesión por agencia y opciones,
+    así que volver a elegirla (o cada rerun) no vuelve a generarla.
+    """
+    registros = estado['log'].registros
+    if not registros:
+        return
+    por_clave = {registro.clave: registro for registro in registros}
+    st.markdown("**Una sola agencia** (vista previa y descarga sin generar todo)")
+    elegida = st.selectbox(
+        "Agencia", list(por_clave), index=None, placeholder="Elige una agencia",
+        format_func=lambda c: _etiqueta_agencia(por_clave[c]), key=f"{clave}_agencia",
+    )
+    if elegida is None:
+        return
+    generadas = estado.setdefault('agencias', {})
+    clave_generada = (elegida, json.dumps(opciones or {}, sort_keys=True))
+    if clave_generada not in generadas:
+        inicio = time.perf_counter()
+        archivos, _ = generar_agencia(SalidaMemoria(), estado['datos'], elegida)
+        generadas[clave_generada] = (archivos, time.perf_counter() - inicio)
+    archivos, segundos = generadas[clave_generada]
+    st.caption(f"Generada en {segundos * 1000:.0f} ms sobre los datos ya leídos.")
+
+    for nombre, contenido in archivos.items():
+        if nombre.endswith('.xlsx'):
+            # Vista previa de la hoja de reporte (la primera del libro)
+            lectura = cargar_proceso("lectura")
+            st.dataframe(lectura.leer_hoja(io.BytesIO(contenido), sheet_name=0), hide_index=True)
+        st.download_button(f"📥 {nombre}", data=contenido, file_name=nombre, key=f"{clave}_descargar_{nombre}")
+
+
+def mostrar_metricas(bitacora):
+    """Tarjetas de resumen leídas de los registros por agencia."""
+    resumen = bitacora.resumen()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Agencias Exitosas", resumen['ok'], delta=None)
+    with col2:
+        descuadres = resumen['descuadres']
+        if descuadres > 0:
+            st.metric("Agencias con Descuadre", descuadres, delta=f"-{descuadres}", delta_color="inverse")
+        else:
+            st.metric("Agencias con Descuadre", 0, delta="Todo OK")
+
+
+def descargas_registros(bitacora, nombre_base):
+    """Botones para bajar los registros por agencia en JSON y CSV."""
+    if not bitacora.registros:
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Registros por agencia (.json)", data=bitacora.a_json(),
+                           file_name=f"{nombre_base}.json", mime="application/json")
+    with col2:
+        st.download_button("Registros por agencia (.csv)", data=bitacora.a_csv(),
+                           file_name=f"{nombre_base}.csv", mime="text/csv")
+
+
+def cruce_de_cortes(clave, archivo_corte_1, archivo_corte_2, tipo):
+    """
+    Cruce de Corte 1 con Corte 2 por RUC o nombre de agencia (segmentador/cruce_cortes.py):
+    agencias que faltan en un corte, ALTAS distintas y ajustes frente a lo pagado.
+    Corre apenas están los dos archivos; si las páginas ya procesaron esos consolidados,
+    las hojas de reporte salen de la caché. El resultado queda en la sesión por par de
+    archivos, así que los reruns no vuelven a cruzar.
+    """
+    clave_estado = f"cruce_{clave}"
+    par = (archivo_corte_1.file_id, archivo_corte_2.file_id, tipo)
+    estado = st.session_state.get(clave_estado)
+    if not estado or estado['par'] != par:
+        try:
+            resultado = cargar_proceso("cruce_cortes").cruzar_cortes(archivo_corte_1, archivo_corte_2, tipo)
+        except (ValueError, KeyError) as e:
+            st.error(f"❌ No se pudo cruzar los cortes: {e}")
+            return None
+        estado = st.session_state[clave_estado] = {'par': par, 'resultado': resultado}
+
+    resultado = estado['resultado']
+    resumen = resultado.resumen
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("En ambos cortes", resumen['En ambos cortes'])
+    col2.metric("Solo en Corte 1", resumen['Solo en Corte 1'])
+    col3.metric("Solo en Corte 2", resumen['Solo en Corte 2'])
+    col4.metric("ALTAS distintas", resumen['ALTAS distintas'])
+    detalle_lectura = f" · {resultado.reutilizadas} hoja(s) reutilizadas de lo ya leído" if resultado.reutilizadas else ""
+    st.caption(f"Cruce en {resultado.segundos:.2f} s{detalle_lectura}")
+
+    observadas = resultado.observadas()
+    if observadas.empty:
+        st.success("✓ Los cortes cuadran: mismas agencias, mismas ALTAS y ajustes dentro de lo pagado.")
+    else:
+        st.warning(f"{len(observadas)} agencias con observaciones en el cruce.")
+    solo_observadas = st.toggle("Solo agencias con observaciones", value=not observadas.empty, key=f"{clave}_cruce_filtro")
+    st.dataframe(observadas if solo_observadas else resultado.detalle, hide_index=True)
+    st.download_button("📥 Descargar cruce (.xlsx)", data=resultado.a_excel,
+                       file_name=f"Cruce_Cortes_{tipo.capitalize()}_{time.strftime('%Y%m%d_%H%M%S')}.xlsx",
+                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                       key=f"{clave}_cruce_descarga")
+    return resultado
+
+
+def cruce_con_corte_1(clave, archivo_corte_2, tipo):
+    """Sección plegable de las páginas de Corte 2: sube el Corte 1 del periodo y cruza (ver `cruce_de_cortes`)."""
+    with st.expander("🔗 Cruce con Corte 1", expanded=False):
+        archivo_corte_1 = st.file_uploader("Consolidado de CORTE 1 del mismo periodo", type=["xlsx"],
+                                           key=f"{clave}_corte_1_uploader")
+        if archivo_corte_1 is not None:
+            cruce_de_cortes(clave, archivo_corte_1, archivo_corte_2, tipo)
@@ -0,0 +1,445 @@
+# segmentador/xlsx_rapido.py
+"""
+Lector de .xlsx por streaming: zipfile + análisis incremental del XML de la hoja.
+
+pd.read_excel con openpyxl crea un objeto celda (con estilo) por cada valor y es
+lo que más tarda en cada proceso. Este lector recorre el XML de la hoja fila por
+fila (ElementTree.iterparse, en C), resuelve la tabla de cadenas compartidas una
+sola vez y convierte cada celda directamente al valor que pandas espera. Todo lo
+demás (cabeceras de uno o dos niveles, dtype, valores nulos, usecols...) lo sigue
+haciendo pandas: LectorXlsx hereda de su lector openpyxl y solo reemplaza la
+carga del libro y la lectura de filas, así que el DataFrame resultante es el mismo.
+
+Tipos de celda: números (int si no tienen decimales), cadenas compartidas, cadenas
+en línea (inlineStr), fórmulas con resultado de texto (str), booleanos, errores
+(NaN) y fechas/duraciones según el formato numérico del estilo, con la misma regla
+y la misma época (1900/1904) que openpyxl.
+
+Dependencia privada: LectorXlsx hereda de `pandas.io.excel._openpyxl.OpenpyxlReader`,
+que no es API pública. Si esa clase no existe (o cambia de forma) en la versión de
+pandas instalada, `leer_excel` lanza FormatoNoSoportado y segmentador/lectura.py usa
+`pd.read_excel`; requirements.txt acota pandas a las versiones probadas.
+
+Selección de columnas: con `usecols` como lista de nombres y cabecera de una fila,
+las celdas de las demás columnas ni siquiera se convierten.
+
+Huella de una hoja (`huella_hoja`): hash del XML crudo de la hoja con las cadenas
+compartidas ya resueltas, más la época y los estilos de fecha. Dos libros con la
+misma hoja dan la misma huella aunque el resto del libro (y por tanto el orden de
+la tabla de cadenas) sea distinto, como los consolidados de Corte 1 y Corte 2 de
+un mismo periodo.
+
+Uso:
+    df = leer_excel(datos, sheet_name='BASE', dtype=str)   # mismos argumentos que pd.read_excel
+"""
+import hashlib
+import io
+import posixpath
+import re
+import shutil
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+try:
+    from pandas.io.excel._openpyxl import OpenpyxlReader
+except ImportError:  # módulo privado de pandas: puede moverse entre versiones
+    OpenpyxlReader = None
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_ATTR_RID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+_FILA = _NS + 'row'
+_V = _NS + 'v'
+_T = _NS + 't'
+_R = _NS + 'r'
+_IS = _NS + 'is'
+_SI = _NS + 'si'
+_DIGITOS = '0123456789'
+# Valor de una celda de cadena compartida: (atributos hasta <v>)(índice)
+_CELDA_TEXTO = re.compile(rb'(t="s"[^>]*><v>)(\d+)(?=</v>)')
+
+# Argumentos de pd.read_excel que este lector entiende (los demás usan pandas tal cual)
+ARGUMENTOS_SOPORTADOS = frozenset({
+    'sheet_name', 'header', 'names', 'index_col', 'usecols', 'dtype', 'skiprows',
+    'nrows', 'na_values', 'keep_default_na', 'na_filter', 'true_values', 'false_values',
+    'thousands', 'decimal', 'engine',
+})
+
+
+class FormatoNoSoportado(Exception):
+    """El archivo no es un .xlsx que este lector sepa abrir (p. ej. .xls o .xlsb)."""
+
+
+def _texto(nodo):
+    """Texto de un <si> o <is>: el <t> directo seguido de los <t> de cada <r> (igual que openpyxl)."""
+    if len(nodo) == 1 and nodo[0].tag == _T:  # caso común: texto sin formato
+        return nodo[0].text or ''
+    partes = []
+    plano = nodo.find(_T)
+    if plano is not None and plano.text is not None:
+        partes.append(plano.text)
+    for trozo in nodo.iterfind(_R):
+        texto = trozo.findtext(_T)
+        if texto:
+            partes.append(texto)
+    return ''.join(partes)
+
+
+def _destino(base, objetivo):
+    """Ruta dentro del zip de un Target de relaciones (absoluto o relativo a `base`)."""
+    if objetivo.startswith('/'):
+        return objetivo.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), objetivo))
+
+
+def _relaciones(zf, ruta_parte):
+    """{rId: (tipo, ruta)} del archivo .rels de una parte del paquete."""
+    ruta_rels = posixpath.join(posixpath.dirname(ruta_parte), '_rels', posixpath.basename(ruta_parte) + '.rels')
+    if ruta_rels not in zf.namelist():
+        return {}
+    relaciones = {}
+    with zf.open(ruta_rels) as f:
+        for _, nodo in iterparse(f):
+            if nodo.tag == _NS_REL + 'Relationship' and nodo.get('TargetMode') != 'External':
+                relaciones[nodo.get('Id')] = (nodo.get('Type', ''), _destino(ruta_parte, nodo.get('Target', '')))
+    return relaciones
+
+
+class LibroXlsx:
+    """Lo mínimo del libro: hojas, época, estilos de fecha y cadenas compartidas."""
+
+    def __init__(self, archivo):
+        try:
+            self.zip = zipfile.ZipFile(archivo)
+        except zipfile.BadZipFile as e:
+            raise FormatoNoSoportado(str(e)) from e
+        ruta_libro = 'xl/workbook.xml'
+        for tipo, ruta in _relaciones(self.zip, '').values():
+            if tipo.endswith('/officeDocument'):
+                ruta_libro = ruta
+        if ruta_libro not in self.zip.namelist():
+            raise FormatoNoSoportado(f"No se encontró {ruta_libro}")
+        relaciones = _relaciones(self.zip, ruta_libro)
+
+        self.epoca = CALENDAR_WINDOWS_1900
+        self.hojas = {}
+        with self.zip.open(ruta_libro) as f:
+            for _, nodo in iterparse(f):
+                if nodo.tag == _NS + 'workbookPr' and nodo.get('date1904', '').lower() in ('1', 'true'):
+                    self.epoca = CALENDAR_MAC_1904
+                elif nodo.tag == _NS + 'sheet':
+                    tipo, ruta = relaciones.get(nodo.get(_ATTR_RID), ('', ''))
+                    if tipo.endswith('/worksheet'):  # las hojas de gráfico no cuentan, como en openpyxl
+                        self.hojas[nodo.get('name')] = ruta
+
+        self.ruta_textos = None
+        self._ruta_estilos = None
+        for tipo, ruta in relaciones.values():
+            if tipo.endswith('/sharedStrings'):
+                self.ruta_textos = ruta
+            elif tipo.endswith('/styles'):
+                self._ruta_estilos = ruta
+        self._textos = None
+        self._leer_estilos()
+
+    def _leer_estilos(self):
+        """Índices de estilo (atributo s de la celda) cuyo formato numérico es fecha o duración."""
+        self.estilos_fecha = set()
+        self.estilos_duracion = set()
+        self.formatos_xf = []  # (numFmtId, código) de cada estilo, en orden
+        if not self._ruta_estilos or self._ruta_estilos not in self.zip.namelist():
+            return
+        personalizados = {}
+        ids_formato = []
+        with self.zip.open(self._ruta_estilos) as f:
+            dentro_de_xfs = False
+            for evento, nodo in iterparse(f, events=('start', 'end')):
+                if nodo.tag == _NS + 'cellXfs':
+                    dentro_de_xfs = evento == 'start'
+                elif evento == 'end' and nodo.tag == _NS + 'numFmt':
+                    personalizados[int(nodo.get('numFmtId'))] = nodo.get('formatCode')
+                elif evento == 'end' and nodo.tag == _NS + 'xf' and dentro_de_xfs:
+                    ids_formato.append(int(nodo.get('numFmtId', 0)))
+        for indice, id_formato in enumerate(ids_formato):
+            formato = personalizados.get(id_formato, BUILTIN_FORMATS.get(id_formato))
+            self.formatos_xf.append((id_formato, formato))
+            if is_date_format(formato):
+                self.estilos_fecha.add(indice)
+            if is_timedelta_format(formato):
+                self.estilos_duracion.add(indice)
+
+    @property
+    def textos(self):
+        """Tabla de cadenas compartidas (se lee una vez, al primer uso)."""
+        if self._textos is None:
+            self._textos = []
+            if self.ruta_textos and self.ruta_textos in self.zip.namelist():
+                with self.zip.open(self.ruta_textos) as f:
+                    for _, nodo in iterparse(f):
+                        if nodo.tag == _SI:
+                            self._textos.append(_texto(nodo).replace('x005F_', ''))
+                            nodo.clear()
+        return self._textos
+
+    def leer_parte(self, ruta):
+        """Bytes de una parte del zip sin el pico de memoria de ZipFile.read (que une los trozos al final)."""
+        with self.zip.open(ruta) as f:
+            destino = io.BytesIO()
+            shutil.copyfileobj(f, destino, 1 << 20)
+        return destino.getvalue()
+
+    def close(self):
+        self.zip.close()
+
+
+class LectorXlsx(OpenpyxlReader or object):
+    """Lector de pandas (motor openpyxl) con la carga del libro y de las filas reemplazadas."""
+
+    def __init__(self, archivo, columnas=None, fila_cabecera=None):
+        # Selección anticipada de columnas: nombres buscados en la fila de cabecera
+        self._columnas = set(columnas) if columnas is not None else None
+        self._fila_cabecera = fila_cabecera
+        super().__init__(archivo)
+
+    def load_workbook(self, filepath_or_buffer, engine_kwargs):
+        return LibroXlsx(filepath_or_buffer)
+
+    @property
+    def sheet_names(self):
+        return list(self.book.hojas)
+
+    def get_sheet_by_name(self, name):
+        self.raise_if_bad_sheet_by_name(name)
+        return self.book.hojas[name]
+
+    def get_sheet_by_index(self, index):
+        self.raise_if_bad_sheet_by_index(index)
+        return list(self.book.hojas.values())[index]
+
+    def get_sheet_data(self, sheet, file_rows_needed=None):
+        libro = self.book
+        textos = libro.textos
+        epoca = libro.epoca
+        estilos_fecha = libro.estilos_fecha
+        estilos_duracion = libro.estilos_duracion
+        columnas_por_letras = {}
+        seleccion = None  # columnas (1-based) a conservar una vez leída la cabecera
+
+        def convertir(c, tipo):
+            """Valor de la celda tal como lo devuelve pandas con openpyxl ("" si está vacía)."""
+            if tipo == 'inlineStr':
+                nodo = c.find(_IS)
+                return _texto(nodo) if nodo is not None else ""
+            valor = c.findtext(_V) or None
+            if valor is None:
+                return ""
+            if tipo == 'n':
+                numero = float(valor) if ('.' in valor or 'E' in valor or 'e' in valor) else int(valor)
+                estilo = c.get('s')
+                if estilo and int(estilo) in estilos_fecha:
+                    try:
+                        return from_excel(numero, epoca, timedelta=int(estilo) in estilos_duracion)
+                    except (OverflowError, ValueError):
+                        return np.nan
+                entero = int(numero)
+                return entero if entero == numero else float(numero)
+            if tipo == 's':
+                return textos[int(valor)]
+            if tipo == 'str':
+                return valor
+            if tipo == 'b':
+                return bool(int(valor))
+            if tipo == 'e':
+                return np.nan
+            if tipo == 'd':
+                return from_ISO8601(valor)
+            return valor
+
+        def tiene_dato(c, tipo):
+            """Si una celda descartada por la selección habría dejado algo distinto de ""."""
+            if tipo == 'inlineStr':
+                nodo = c.find(_IS)
+                return nodo is not None and _texto(nodo) != ""
+            valor = c.findtext(_V)
+            if not valor:
+                return False
+            if tipo == 's':
+                return textos[int(valor)] != ""
+            return True
+
+        data = []
+        last_row_with_data = -1
+        siguiente = 1  # número de fila (1-based) que se espera a continuación
+        with libro.zip.open(sheet) as fuente:
+            for _, fila in iterparse(fuente):
+                if fila.tag != _FILA:
+                    continue
+                r = fila.get('r')
+                numero_fila = int(float(r)) if r else siguiente
+                # Filas ausentes en el XML: openpyxl las entrega vacías
+                while siguiente < numero_fila:
+                    data.append([])
+                    siguiente += 1
+                    if file_rows_needed is not None and len(data) >= file_rows_needed:
+                        return self._terminar(data, last_row_with_data)
+                if siguiente > numero_fila:
+                    fila.clear()  # fila repetida o desordenada: openpyxl la ignora
+                    continue
+                siguiente += 1
+
+                valores = {}
+                con_datos = False
+                columna = 0
+                for c in fila:
+                    ref = c.get('r')
+                    if ref:
+                        letras = ref.rstrip(_DIGITOS)
+                        columna = columnas_por_letras.get(letras)
+                        if columna is None:
+                            columna = columnas_por_letras[letras] = column_index_from_string(letras)
+                    else:
+                        columna += 1
+                    tipo = c.get('t', 'n')
+                    if seleccion is not None and columna not in seleccion:
+                        if not con_datos and tiene_dato(c, tipo):
+                            con_datos = True
+                        continue
+                    # Cadenas compartidas y números sin estilo de fecha, los casos más comunes, sin llamar a convertir
+                    if tipo == 's':
+                        valor = c.findtext(_V)
+                        valores[columna] = textos[int(valor)] if valor else ""
+                    elif tipo == 'n' and not c.get('s'):
+                        valor = c.findtext(_V)
+                        if not valor:
+                            valores[columna] = ""
+                        elif '.' in valor or 'E' in valor or 'e' in valor:
+                            numero = float(valor)
+                            entero = int(numero)
+                            valores[columna] = entero if entero == numero else numero
+                        else:
+                            valores[columna] = int(valor)
+                    else:
+                        valores[columna] = convertir(c, tipo)
+                fila.clear()
+
+                if seleccion is not None:
+                    convertida = [valores.get(col, "") for col in seleccion]
+                elif valores:
+                    # Igual que openpyxl en modo solo lectura: ancho hasta la última celda de la fila
+                    ultima = columna
+                    convertida = [""] * ultima
+                    for col, valor in valores.items():
+                        if col <= ultima:
+                            convertida[col - 1] = valor
+                else:
+                    convertida = []
+                while convertida and isinstance(convertida[-1], str) and convertida[-1] == "":
+                    convertida.pop()
+                if convertida or con_datos:
+                    last_row_with_data = len(data)
+                data.append(convertida)
+
+                if (self._columnas is not None and seleccion is None
+                        and len(data) - 1 == self._fila_cabecera):
+                    seleccion = self._elegir_columnas(convertida)
+                    if seleccion is not None:
+                        data[-1] = [convertida[col - 1] for col in seleccion]
+
+                if file_rows_needed is not None and len(data) >= file_rows_needed:
+                    break
+        return self._terminar(data, last_row_with_data)
+
+    def _elegir_columnas(self, cabecera):
+        """Columnas (1-based, en orden del archivo) cuyo nombre está en la selección; None si es ambiguo."""
+        posiciones = [i + 1 for i, nombre in enumerate(cabecera) if isinstance(nombre, str) and nombre in self._columnas]
+        nombres = [cabecera[i - 1] for i in posiciones]
+        if len(set(nombres)) != len(nombres) or set(nombres) != self._columnas:
+            # Nombres repetidos o faltantes: se lee todo y pandas decide (y avisa) como siempre
+            return None
+        return posiciones
+
+    @staticmethod
+    def _terminar(data, last_row_with_data):
+        """Recorte final de filas vacías y ancho uniforme (como el lector openpyxl de pandas)."""
+        data = data[: last_row_with_data + 1]
+        if len(data) > 0:
+            max_width = max(len(data_row) for data_row in data)
+            if min(len(data_row) for data_row in data) < max_width:
+                empty_cell = [""]
+                data = [data_row + (max_width - len(data_row)) * empty_cell for data_row in data]
+        return data
+
+
+def leer_excel(archivo, **argumentos):
+    """
+    Equivalente a pd.read_excel para .xlsx (mismos argumentos, ver ARGUMENTOS_SOPORTADOS).
+    Lanza FormatoNoSoportado si el archivo no es un .xlsx; ValueError como pandas si la hoja no existe.
+    """
+    argumentos = dict(argumentos)
+    argumentos.pop('engine', None)
+    no_soportados = set(argumentos) - ARGUMENTOS_SOPORTADOS
+    if no_soportados:
+        raise FormatoNoSoportado(f"Argumentos no soportados: {', '.join(sorted(no_soportados))}")
+    if isinstance(argumentos.get('sheet_name'), list) or argumentos.get('sheet_name', 0) is None:
+        raise FormatoNoSoportado("Solo se lee una hoja por llamada")
+    if OpenpyxlReader is None:
+        raise FormatoNoSoportado("Esta versión de pandas no tiene pandas.io.excel._openpyxl.OpenpyxlReader")
+    if isinstance(archivo, (bytes, bytearray)):
+        archivo = io.BytesIO(archivo)
+
+    columnas = argumentos.get('usecols')
+    header = argumentos.get('header', 0)
+    seleccion_anticipada = (
+        isinstance(columnas, (list, tuple)) and columnas and all(isinstance(c, str) for c in columnas)
+        and isinstance(header, int) and not isinstance(header, bool)
+        and argumentos.get('names') is None and argumentos.get('skiprows') is None
+        and argumentos.get('index_col') is None
+    )
+    if seleccion_anticipada:
+        lector = LectorXlsx(archivo, columnas=columnas, fila_cabecera=header)
+    else:
+        lector = LectorXlsx(archivo)
+    try:
+        df = lector.parse(**argumentos)
+    finally:
+        lector.close()
+    return df
+
+
+def huella_hoja(archivo, nombre_hoja):
+    """
+    SHA-256 de lo que determina la lectura de la hoja: su XML crudo con cada índice de
+    cadena compartida reemplazado por el texto, la época y los estilos de fecha/duración.
+    None si la hoja no existe; FormatoNoSoportado si el archivo no es un .xlsx.
+    """
+    if isinstance(archivo, (bytes, bytearray)):
+        archivo = io.BytesIO(archivo)
+    libro = LibroXlsx(archivo)
+    try:
+        ruta = libro.hojas.get(nombre_hoja)
+        if ruta is None or ruta not in libro.zip.namelist():
+            return None
+        crudo = libro.leer_parte(ruta)
+        h = hashlib.sha256()
+        h.update(repr((libro.epoca, sorted(libro.estilos_fecha), sorted(libro.estilos_duracion))).encode('ascii'))
+        partes = _CELDA_TEXTO.split(crudo)
+        textos = libro.textos if len(partes) > 1 else []
+        if crudo.count(b't="s"') != (len(partes) - 1) // 3 or b"t='s'" in crudo:
+            # Celdas de texto con otra sintaxis: la tabla de cadenas completa entra en la huella
+            h.update(crudo)
+            for texto in libro.textos:
+                h.update(texto.encode('utf-8') + b'\x00')
+            return h.hexdigest()
+        for i in range(0, len(partes) - 1, 3):
+            h.update(partes[i])
+            h.update(partes[i + 1])
+            h.update(textos[int(partes[i + 2])].encode('utf-8'))
+        h.update(partes[-1])
+        return h.hexdigest()
+    finally:
+        libro.close()
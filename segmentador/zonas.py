@@ -0,0 +1,97 @@
+# segmentador/zonas.py
+"""Homologación de departamentos a zonas (Provincia Corte 2) y filtro del reporte por zona."""
+import unicodedata
+from functools import lru_cache
+
+from segmentador.normalizacion import normalizar_nombre
+from segmentador.registros import DESCUADRE, RegistroAgencia
+
+# --- Mapa fijo de Homologación de Zonas ---
+HOMOLOGACION_ZONAS = {
+    'AREQUIPA':    'SUR',
+    'JUNIN':       'SUR',
+    'CUSCO':       'SUR',
+    'LA LIBERTAD': 'NORTE',
+    'LAMBAYEQUE':  'NORTE',
+    'PIURA':       'NORTE',
+    'ANCASH':      'NORTE',
+}
+
+
+def quitar_tildes(texto):
+    """Elimina tildes y caracteres diacríticos de un string."""
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', texto)
+        if unicodedata.category(c) != 'Mn'
+    )
+
+
+@lru_cache(maxsize=None)
+def get_zona_departamento(depto):
+    """
+    Retorna la zona (NORTE/SUR) de un departamento, normalizando el nombre.
+    Se llama por cada fila de la BASE pero hay pocos departamentos: se memoriza.
+    """
+    if not isinstance(depto, str):
+        return None
+    depto_norm = quitar_tildes(depto.upper().strip().replace('.', '').replace(',', ''))
+    return HOMOLOGACION_ZONAS.get(depto_norm, None)
+
+
+def departamentos_de_zona(zona):
+    """Departamentos homologados a `zona`, en orden alfabético."""
+    return sorted(d for d, z in HOMOLOGACION_ZONAS.items() if z == zona)
+
+
+def departamento_de_agencia(nombre_agencia, departamentos):
+    """
+    Departamento con que termina el nombre de la agencia en el reporte
+    ('AGENCIA X SAC PIURA' -> 'PIURA'), comparando nombres normalizados; None si ninguno.
+    """
+    if not isinstance(nombre_agencia, str):
+        return None
+    nombre = normalizar_nombre(nombre_agencia)
+    for depto in sorted(departamentos, key=len, reverse=True):
+        if nombre.endswith(normalizar_nombre(depto)):
+            return depto
+    return None
+
+
+def claves_con_asesores(asesores_en_zona, mapeo_asesor_alias):
+    """Agencias (normalizadas) con filas en la BASE de la zona: por su nombre o por un alias."""
+    claves = set(asesores_en_zona)
+    for agencia_principal, aliases in mapeo_asesor_alias.items():
+        if any(normalizar_nombre(a) in claves for a in aliases):
+            claves.add(normalizar_nombre(agencia_principal))
+    return claves
+
+
+def agencias_sin_asesores(reporte, columna_clave, columna_nombre, columna_altas, claves_zona, departamentos_zona, zona):
+    """
+    Agencias del reporte sin ningún asesor en la BASE de la zona (ni por alias) cuyo
+    nombre termina en un departamento de la zona. No se generan ni se filtran con
+    el reporte: quedan como registros en DESCUADRE con 0 filas de BASE solo para
+    las sugerencias de alias (sugerencias_alias.sugerir_alias, datos['sin_asesores']).
+    """
+    import pandas as pd
+
+    fuera = reporte[~reporte[columna_clave].isin(claves_zona) & reporte[columna_clave].notna()]
+    if fuera.empty:
+        return []
+    departamentos = sorted(set(departamentos_zona), key=len, reverse=True)
+    en_zona = fuera[columna_nombre].map(lambda n: departamento_de_agencia(n, departamentos) is not None)
+    fuera = fuera[en_zona.astype(bool)]
+    registros = []
+    for clave, filas in fuera.groupby(fuera[columna_clave], sort=False):
+        altas = int(pd.to_numeric(filas[columna_altas], errors='coerce').fillna(0).sum()) if columna_altas is not None else 0
+        registros.append(RegistroAgencia(agencia=str(filas[columna_nombre].iloc[0]).strip(), clave=clave, zona=zona,
+                                         altas=altas, filas_base=0, estado=DESCUADRE))
+    return registros
+
+
+def linea_sin_asesores(registros):
+    """Línea de log con las agencias de la zona sin asesores en la BASE, o None si no hay."""
+    if not registros:
+        return None
+    return (f"ALERTA: {len(registros)} agencias de la zona sin asesores en la BASE "
+            f"(no se generan; ver sugerencias de alias): {', '.join(r.agencia for r in registros)}")
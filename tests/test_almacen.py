@@ -0,0 +1,144 @@
+# tests/test_almacen.py
+"""Almacén de resultados (segmentador/almacen.py): expiración, desalojo por tamaño y publicación atómica."""
+import io
+import os
+import zipfile
+
+import pytest
+
+from segmentador import almacen as modulo_almacen
+from segmentador import ui
+from segmentador.almacen import AlmacenResultados, SalidaAlmacen
+
+TTL = 100
+TAMANO = 1000
+
+
+class _Reloj:
+    """Reemplaza al módulo `time` de almacen.py: la hora solo avanza cuando la prueba lo pide."""
+
+    def __init__(self):
+        self.ahora = 1_700_000_000.0
+
+    def time(self):
+        return self.ahora
+
+    def avanzar(self, segundos):
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(modulo_almacen, 'time', reloj)
+    return reloj
+
+
+@pytest.fixture
+def almacen(tmp_path, reloj):
+    return AlmacenResultados(str(tmp_path / 'resultados'), ttl_segundos=TTL, max_bytes=int(2.5 * TAMANO))
+
+
+def _publicar(almacen, id_resultado, contenido=b'x' * TAMANO, metadatos=None):
+    ruta = almacen.ruta_temporal(id_resultado)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    return almacen.publicar(id_resultado, ruta, metadatos)
+
+
+def _archivos(almacen):
+    return sorted(os.listdir(almacen.carpeta))
+
+
+def test_expira_por_tiempo_desde_el_ultimo_uso(almacen, reloj):
+    _publicar(almacen, 'a')
+    _publicar(almacen, 'b')
+    reloj.avanzar(TTL - 10)
+    almacen.tocar('b')
+    reloj.avanzar(20)
+    assert almacen.purgar() == 1
+    assert not almacen.existe('a') and almacen.metadatos('a') is None
+    assert almacen.existe('b')
+    reloj.avanzar(TTL + 1)
+    assert almacen.purgar() == 1
+    assert _archivos(almacen) == []
+
+
+def test_leer_y_abrir_cuentan_como_uso(almacen, reloj):
+    _publicar(almacen, 'a', b'zip')
+    reloj.avanzar(TTL - 1)
+    assert almacen.leer('a') == b'zip'
+    reloj.avanzar(TTL - 1)
+    with almacen.abrir('a') as f:
+        assert f.read() == b'zip'
+    reloj.avanzar(TTL - 1)
+    assert almacen.purgar() == 0
+
+
+def test_desaloja_el_menos_usado_al_superar_el_tamano(almacen, reloj):
+    _publicar(almacen, 'a')
+    reloj.avanzar(1)
+    _publicar(almacen, 'b')
+    reloj.avanzar(1)
+    almacen.tocar('a')
+    reloj.avanzar(1)
+    _publicar(almacen, 'c')  # 3000 bytes > 2500: sale 'b', el de uso más antiguo
+    assert [almacen.existe(i) for i in 'abc'] == [True, False, True]
+    assert almacen.total_bytes() == 2 * TAMANO
+
+
+def test_publicacion_atomica(almacen):
+    salida = SalidaAlmacen(almacen, {'tipo_reporte': "Lima Corte 1", 'zona': "LIMA"}, 'id')
+    with salida as destino:
+        destino.agregar("AGENCIA", "Reporte AGENCIA.xlsx", b'datos')
+        # Mientras se escribe solo hay un temporal oculto: el resultado todavía no existe
+        assert not almacen.existe('id')
+        assert all(nombre.startswith('.') for nombre in _archivos(almacen))
+    assert salida.resultado == 'id'
+    assert _archivos(almacen) == ['id.json', 'id.zip']
+    meta = almacen.metadatos('id')
+    assert (meta['tipo_reporte'], meta['bytes'], meta['creado']) == ("Lima Corte 1", os.path.getsize(
+        os.path.join(almacen.carpeta, 'id.zip')), modulo_almacen.time.time())
+    assert zipfile.ZipFile(io.BytesIO(almacen.leer('id'))).read("Reporte AGENCIA.xlsx") == b'datos'
+
+
+def test_si_falla_el_renombrado_no_queda_publicado(almacen, monkeypatch):
+    def falla(origen, destino):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(modulo_almacen.os, 'replace', falla)
+    with pytest.raises(OSError):
+        _publicar(almacen, 'id')
+    assert not almacen.existe('id')
+    assert almacen.metadatos('id') is None
+
+
+def test_borra_temporales_abandonados(almacen, reloj):
+    abandonado = almacen.ruta_temporal('muerto')
+    with open(abandonado, 'wb') as f:
+        f.write(b'a medias')
+    os.utime(abandonado, (reloj.time(), reloj.time()))
+    reloj.avanzar(TTL - 1)
+    almacen.purgar()
+    assert os.path.exists(abandonado)
+    reloj.avanzar(2)
+    almacen.purgar()
+    assert not os.path.exists(abandonado)
+
+
+def test_actualizar_metadatos(almacen):
+    _publicar(almacen, 'id', metadatos={'zona': 'NORTE'})
+    assert almacen.actualizar_metadatos('id', {'log': {'registros': []}})
+    assert almacen.metadatos('id')['zona'] == 'NORTE' and 'log' in almacen.metadatos('id')
+    assert not almacen.actualizar_metadatos('no-existe', {'log': {}})
+
+
+def test_descarga_expirada_entrega_leeme(almacen, reloj):
+    _publicar(almacen, 'id', b'zip')
+    with ui.abrir_para_descarga(almacen, 'id') as f:
+        assert f.read() == b'zip'
+    reloj.avanzar(TTL + 1)
+    almacen.purgar()
+    expirado = ui.abrir_para_descarga(almacen, 'id')
+    with zipfile.ZipFile(io.BytesIO(expirado)) as zf:
+        assert zf.namelist() == ["LEEME.txt"]
+        assert zf.read("LEEME.txt").decode('utf-8') == ui.AVISO_EXPIRADO
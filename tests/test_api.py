@@ -0,0 +1,153 @@
+# tests/test_api.py
+"""API HTTP local (segmentador/api.py): peticiones inválidas, raíz de `ruta` y caché compartida con las páginas."""
+import io
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import openpyxl
+import pytest
+
+from herramientas.sinteticos import CABECERAS_BASE, CABECERAS_CORTE_1
+from segmentador import cache_base, ui
+from segmentador.almacen import AlmacenResultados
+from segmentador.api import TERMINADO, ColaTrabajos, SolicitudInvalida, crear_servidor, resolver_origen
+from segmentador.provincia_corte_1 import leer_zonas, procesar_reportes_provincia
+
+
+def _consolidado():
+    """Provincia Corte 1 con la zona escrita en minúsculas en la BASE."""
+    libro = openpyxl.Workbook()
+    ws = libro.active
+    ws.title = 'Reporte CORTE 1'
+    ws.append(CABECERAS_CORTE_1)
+    ws.append([20100000001, 'AGENCIA 001 SAC PIURA', 100, 'A', 2, 50.5, 1000.0, 0.85, 'NO', 1.2, 10.0, 1.1, 1234.5])
+    base = libro.create_sheet('BASE')
+    base.append(CABECERAS_BASE)
+    for i in range(2):
+        base.append([f"P{i:04d}", 'AGENCIA 001 SAC', ' Norte', 'PIURA', '2026-01-01', 'FIBRA', 79.9, '40000000',
+                     'SI', ''])
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+@pytest.fixture
+def origen(tmp_path, monkeypatch):
+    carpeta = tmp_path / 'entrada'
+    carpeta.mkdir()
+    (carpeta / 'consolidado.xlsx').write_bytes(_consolidado())
+    (tmp_path / 'fuera.xlsx').write_bytes(_consolidado())
+    monkeypatch.setenv('SEGMENTADOR_ORIGEN', str(carpeta))
+    monkeypatch.delenv('SEGMENTADOR_DESTINO', raising=False)
+    return carpeta
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    servidor = crear_servidor(puerto=0, trabajadores=1, carpeta=str(tmp_path / 'almacen'), registrar_peticiones=False)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+    servidor.cola.cerrar()
+
+
+def _pedir(servidor, metodo, ruta, cuerpo=None, tipo_contenido='application/json'):
+    host, puerto = servidor.server_address[:2]
+    if isinstance(cuerpo, dict):
+        cuerpo = json.dumps(cuerpo).encode('utf-8')
+    peticion = urllib.request.Request(f"http://{host}:{puerto}{ruta}", data=cuerpo, method=metodo)
+    if cuerpo is not None:
+        peticion.add_header('Content-Type', tipo_contenido)
+    try:
+        with urllib.request.urlopen(peticion, timeout=30) as respuesta:
+            return respuesta.status, respuesta.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_validar_parametros():
+    assert ColaTrabajos.validar_parametros('provincia_corte_1', ' norte ', None) == ('NORTE', 'xlsx')
+    assert ColaTrabajos.validar_parametros('lima_corte_2', 'SUR', 'xlsx') == ('LIMA', 'xlsx')
+    with pytest.raises(SolicitudInvalida):
+        ColaTrabajos.validar_parametros('provincia_corte_2', '  ', None)
+
+
+@pytest.mark.parametrize('cuerpo, tipo_contenido, mensaje', [
+    ({'ruta': 'consolidado.xlsx', 'tipo': 'otro_reporte'}, 'application/json', 'Tipo de reporte desconocido'),
+    ({'ruta': 'consolidado.xlsx', 'tipo': 'provincia_corte_1'}, 'application/json', 'necesitan una zona'),
+    ({'ruta': 'consolidado.xlsx', 'tipo': 'lima_corte_1', 'formato_base': 'dbf'}, 'application/json',
+     'Formato de BASE no disponible'),
+    ({'tipo': 'lima_corte_1'}, 'application/json', "Falta 'ruta'"),
+    (b'{no es json', 'application/json', 'no es un JSON'),
+    (b'', 'application/octet-stream', 'Cuerpo vacío'),
+    ({'ruta': 'no_existe.xlsx', 'tipo': 'lima_corte_1'}, 'application/json', 'No existe el archivo'),
+    ({'ruta': 'consolidado.xlsx', 'tipo': 'lima_corte_1', 'destino': 'salida'}, 'application/json',
+     'falta configurar SEGMENTADOR_DESTINO'),
+], ids=['tipo', 'zona', 'formato_base', 'sin_ruta', 'json', 'vacio', 'inexistente', 'destino'])
+def test_solicitudes_invalidas(origen, servidor, cuerpo, tipo_contenido, mensaje):
+    codigo, respuesta = _pedir(servidor, 'POST', '/trabajos', cuerpo, tipo_contenido)
+    assert codigo == 400
+    assert mensaje in json.loads(respuesta)['error']
+    assert servidor.cola.listar() == []
+
+
+@pytest.mark.parametrize('ruta', ['../fuera.xlsx', 'ABSOLUTA', 'enlace.xlsx'])
+def test_ruta_fuera_de_la_raiz(origen, servidor, ruta):
+    if ruta == 'ABSOLUTA':
+        ruta = str(origen.parent / 'fuera.xlsx')
+    if ruta == 'enlace.xlsx':
+        (origen / ruta).symlink_to(origen.parent / 'fuera.xlsx')
+    codigo, respuesta = _pedir(servidor, 'POST', '/trabajos', {'ruta': ruta, 'tipo': 'lima_corte_1'})
+    assert codigo == 400
+    assert 'queda fuera de' in json.loads(respuesta)['error']
+
+
+def test_sin_raiz_no_se_lee_por_ruta(origen, servidor, monkeypatch):
+    monkeypatch.delenv('SEGMENTADOR_ORIGEN')
+    codigo, respuesta = _pedir(servidor, 'POST', '/trabajos', {'ruta': str(origen / 'consolidado.xlsx'),
+                                                              'tipo': 'lima_corte_1'})
+    assert codigo == 400
+    assert 'SEGMENTADOR_ORIGEN' in json.loads(respuesta)['error']
+
+
+class _Subida(io.BytesIO):
+    """Lo mínimo de un UploadedFile de Streamlit."""
+    file_id = 'consolidado'
+
+
+def test_reutiliza_el_resultado_de_las_paginas(origen, servidor, monkeypatch):
+    cache_base.vaciar()
+    monkeypatch.setattr(ui, 'almacen_resultados', lambda: servidor.cola.almacen)
+    archivo = _Subida((origen / 'consolidado.xlsx').read_bytes())
+
+    # Página 2: la zona sale del selector, armado con leer_zonas sobre la BASE (' Norte')
+    zona = leer_zonas(archivo)[0]
+    assert zona == 'NORTE'
+    id_pagina, _, reutilizado = ui.ejecutar_con_cache(
+        archivo, None, "Provincia Corte 1", zona, {'formato_base': 'xlsx', 'resumen': False},
+        lambda salida: procesar_reportes_provincia(archivo, zona, salida, 'xlsx'))
+    assert id_pagina and not reutilizado
+
+    # La API recibe la zona como la escriba el cliente y la pasa a mayúsculas
+    codigo, respuesta = _pedir(servidor, 'POST', '/trabajos', {'ruta': 'consolidado.xlsx',
+                                                              'tipo': 'provincia_corte_1', 'zona': 'norte'})
+    assert codigo == 202
+    trabajo = json.loads(respuesta)
+    assert (trabajo['estado'], trabajo['reutilizado'], trabajo['resultado']) == (TERMINADO, True, id_pagina)
+
+    codigo, zip_api = _pedir(servidor, 'GET', f"/trabajos/{trabajo['id']}/archivo")
+    assert codigo == 200
+    with AlmacenResultados(servidor.cola.almacen.carpeta).abrir(id_pagina) as f:
+        assert zip_api == f.read()
+    cache_base.vaciar()
+
+
+def test_resolver_origen_relativa_y_absoluta(origen):
+    real = os.path.realpath(origen / 'consolidado.xlsx')
+    assert resolver_origen('consolidado.xlsx') == real
+    assert resolver_origen(str(origen / 'sub' / '..' / 'consolidado.xlsx')) == real
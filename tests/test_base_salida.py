@@ -0,0 +1,125 @@
+# tests/test_base_salida.py
+"""Escritura de la BASE (segmentador/base_salida.py): reparto en hojas y archivos CSV/Parquet aparte."""
+import codecs
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from segmentador.base_salida import (FORMATO_CSV, FORMATO_PARQUET, FORMATO_XLSX, escribir_base,
+                                     escribir_base_excel, formatos_disponibles, nombres_hojas_base,
+                                     serializar_base)
+from segmentador.salida import SalidaMemoria
+
+# Con max_filas=4 caben 3 filas de datos por hoja (la primera es la cabecera)
+MAX_FILAS = 4
+
+
+def _base(filas):
+    return pd.DataFrame({'PEDIDO': [f"P{i:04d}" for i in range(filas)], 'PRECIO': [79.9 + i for i in range(filas)],
+                         'DNI': [f"4000{i:04d}" for i in range(filas)]})
+
+
+@pytest.mark.parametrize('filas, hojas', [
+    (0, ['BASE']),
+    (1, ['BASE']),
+    (3, ['BASE']),
+    (4, ['BASE', 'BASE_2']),
+    (6, ['BASE', 'BASE_2']),
+    (7, ['BASE', 'BASE_2', 'BASE_3']),
+])
+def test_nombres_hojas_en_el_limite(filas, hojas):
+    assert nombres_hojas_base(filas, max_filas=MAX_FILAS) == hojas
+
+
+def test_limite_real_de_excel():
+    assert nombres_hojas_base(1_048_575) == ['BASE']
+    assert nombres_hojas_base(1_048_576) == ['BASE', 'BASE_2']
+
+
+def _escribir_excel(df, **kwargs):
+    salida = io.BytesIO()
+    with pd.ExcelWriter(salida, engine='xlsxwriter') as writer:
+        hojas = escribir_base_excel(writer, df, **kwargs)
+    return hojas, openpyxl.load_workbook(salida)
+
+
+def _filas(hoja):
+    return [list(fila) for fila in hoja.iter_rows(values_only=True)]
+
+
+@pytest.mark.parametrize('filas', [3, 4, 7])
+def test_reparte_las_filas_sin_perder_ni_repetir(filas):
+    df = _base(filas)
+    hojas, libro = _escribir_excel(df, max_filas=MAX_FILAS)
+    assert libro.sheetnames == hojas
+    leidas = []
+    for nombre in hojas:
+        contenido = _filas(libro[nombre])
+        assert contenido[0] == list(df.columns)  # cada hoja repite la cabecera
+        assert 2 <= len(contenido) <= MAX_FILAS
+        leidas.extend(contenido[1:])
+    assert leidas == df.values.tolist()
+
+
+def test_nombre_de_hoja_propio():
+    hojas, libro = _escribir_excel(_base(4), nombre_hoja='DETALLE', max_filas=MAX_FILAS)
+    assert hojas == libro.sheetnames == ['DETALLE', 'DETALLE_2']
+
+
+# --- BASE en archivo aparte ---
+
+def test_csv_con_bom_y_tildes():
+    df = pd.DataFrame({'AGENCIA': ['Agencia Ñandú', 'Peñaranda'], 'ALTAS': [1, 2]})
+    datos = serializar_base(df, FORMATO_CSV)
+    assert datos.startswith(codecs.BOM_UTF8)
+    assert datos.decode('utf-8-sig').splitlines() == ['AGENCIA,ALTAS', 'Agencia Ñandú,1', 'Peñaranda,2']
+
+
+def test_parquet_conserva_tipos():
+    pytest.importorskip('pyarrow')
+    df = _base(5)
+    leido = pd.read_parquet(io.BytesIO(serializar_base(df, FORMATO_PARQUET)))
+    pd.testing.assert_frame_equal(leido, df, check_dtype=False)
+    assert leido['PRECIO'].dtype == 'float64'
+
+
+def test_parquet_con_columna_mezclada_pasa_a_texto():
+    pytest.importorskip('pyarrow')
+    # Un DNI leído de Excel puede venir como número en unas filas y como texto en otras
+    df = pd.DataFrame({'DNI': pd.Series([40000001, '0400002X', None], dtype=object), 'ALTAS': [1, 2, 3]})
+    leido = pd.read_parquet(io.BytesIO(serializar_base(df, FORMATO_PARQUET)))
+    assert leido['DNI'].tolist()[:2] == ['40000001', '0400002X']
+    assert pd.isna(leido['DNI'].iloc[2])
+    assert leido['ALTAS'].tolist() == [1, 2, 3]
+
+
+def test_formato_no_soportado():
+    with pytest.raises(ValueError, match='no soportado'):
+        serializar_base(_base(1), 'ods')
+
+
+@pytest.mark.parametrize('formato', [FORMATO_CSV, FORMATO_PARQUET])
+def test_escribir_base_entrega_archivo_aparte(formato):
+    if formato not in formatos_disponibles():
+        pytest.skip(f"{formato} no disponible")
+    df = _base(2)
+    destino = SalidaMemoria()
+    with pd.ExcelWriter(io.BytesIO(), engine='xlsxwriter') as writer:
+        pd.DataFrame({'AGENCIA': ['AGENCIA UNO']}).to_excel(writer, sheet_name='Reporte', index=False)
+        archivos = escribir_base(writer, df, formato, destino, 'AGENCIA UNO', 'Reporte AGENCIA UNO')
+        assert list(writer.sheets) == ['Reporte']  # la BASE no entra al libro
+    nombre = f"Reporte AGENCIA UNO.{formato}"
+    assert archivos == [nombre]
+    assert list(destino.archivos) == [nombre]
+    assert destino.archivos[nombre] == serializar_base(df, formato)
+
+
+def test_escribir_base_xlsx_queda_en_el_libro():
+    destino = SalidaMemoria()
+    salida = io.BytesIO()
+    with pd.ExcelWriter(salida, engine='xlsxwriter') as writer:
+        assert escribir_base(writer, _base(2), FORMATO_XLSX, destino, 'AGENCIA UNO', 'Reporte') == ['BASE']
+    assert destino.archivos == {}
+    assert openpyxl.load_workbook(salida).sheetnames == ['BASE']
@@ -0,0 +1,75 @@
+# tests/test_cache_base.py
+"""Caché de hojas BASE (segmentador/cache_base.py): lo que un proceso cambia no llega a los demás."""
+import pandas as pd
+import pytest
+
+from segmentador import cache_base
+
+
+@pytest.fixture(autouse=True)
+def _cache_vacia(monkeypatch):
+    monkeypatch.setenv('SEGMENTADOR_CACHE_BASE', '2')
+    cache_base.vaciar()
+    yield
+    cache_base.vaciar()
+
+
+@pytest.fixture(params=[True, False], ids=['copy_on_write', 'sin_copy_on_write'])
+def copy_on_write(request, monkeypatch):
+    """Con y sin Copy-on-Write (pandas 2 por defecto): el segundo caso usa copias completas."""
+    monkeypatch.setattr(cache_base, '_copy_on_write', lambda: request.param)
+    return request.param
+
+
+def _base():
+    return pd.DataFrame({'asesor ': ['A', 'B', 'A'], 'ZONA': ['NORTE', 'SUR', 'NORTE'], 'MONTO': [1.0, 2.0, 3.0]})
+
+
+def _cambiar(df):
+    """Lo que hacen los procesos con la BASE que reciben."""
+    df.columns = df.columns.str.strip().str.upper()
+    df['ASESOR_NORMALIZADO'] = df['ASESOR'].str.lower()
+    df['ZONA'] = 'OTRA'
+    df.loc[0, 'MONTO'] = -1.0
+    df['MONTO'] *= 10
+
+
+def test_cambios_en_lo_entregado_no_tocan_la_entrada(copy_on_write):
+    clave = cache_base.clave_lectura('huella', {'sheet_name': 'BASE'}, True)
+    cache_base.guardar(clave, _base())
+    _cambiar(cache_base.buscar(clave))
+    pd.testing.assert_frame_equal(cache_base.buscar(clave), _base())
+
+
+def test_cambios_en_lo_guardado_no_tocan_la_entrada(copy_on_write):
+    clave = cache_base.clave_lectura('huella', {'sheet_name': 'BASE'}, True)
+    df = _base()
+    cache_base.guardar(clave, df)
+    _cambiar(df)
+    pd.testing.assert_frame_equal(cache_base.buscar(clave), _base())
+
+
+def test_reportes_tambien_se_entregan_como_copia(copy_on_write):
+    clave = cache_base.clave_lectura('hash', {'sheet_name': 'Reporte CORTE 1'}, True)
+    cache_base.guardar_reporte(clave, _base())
+    _cambiar(cache_base.buscar_reporte(clave))
+    pd.testing.assert_frame_equal(cache_base.buscar_reporte(clave), _base())
+
+
+def test_desaloja_la_menos_usada_y_se_desactiva_con_cero(monkeypatch):
+    claves = [cache_base.clave_lectura(h, {}, True) for h in 'abc']
+    cache_base.guardar(claves[0], _base())
+    cache_base.guardar(claves[1], _base())
+    cache_base.buscar(claves[0])
+    cache_base.guardar(claves[2], _base())
+    assert cache_base.buscar(claves[1]) is None
+    assert cache_base.buscar(claves[0]) is not None
+    monkeypatch.setenv('SEGMENTADOR_CACHE_BASE', '0')
+    cache_base.vaciar()
+    cache_base.guardar(claves[0], _base())
+    assert cache_base.buscar(claves[0]) is None
+
+
+def test_la_clave_ignora_el_motor():
+    assert (cache_base.clave_lectura('h', {'sheet_name': 'BASE', 'engine': 'openpyxl'}, True)
+            == cache_base.clave_lectura('h', {'sheet_name': 'BASE'}, True))
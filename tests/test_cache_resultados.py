@@ -0,0 +1,128 @@
+# tests/test_cache_resultados.py
+"""Caché de resultados (segmentador/cache_resultados.py): qué cambia el id y qué no pasa por la caché."""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from herramientas.sinteticos import generar
+from segmentador import cache_base, cache_resultados, ui
+from segmentador.almacen import AlmacenResultados
+from segmentador.api import TERMINADO, ColaTrabajos
+from segmentador.cache_resultados import buscar, clave_resultado, hash_contenido
+from segmentador.lima_corte_1 import procesar_archivos_excel
+
+ENTRADA = ('hash-del-archivo', "Provincia Corte 1", "NORTE", {'formato_base': 'xlsx', 'resumen': False})
+
+
+def test_mismo_id_para_las_mismas_entradas():
+    assert clave_resultado(*ENTRADA) == clave_resultado(*ENTRADA)
+    # El orden de las opciones no importa
+    assert clave_resultado(*ENTRADA[:3], {'resumen': False, 'formato_base': 'xlsx'}) == clave_resultado(*ENTRADA)
+
+
+@pytest.mark.parametrize('posicion, valor', [
+    (0, 'otro-hash'),
+    (1, "Provincia Corte 2"),
+    (2, "SUR"),
+    (3, {'formato_base': 'csv', 'resumen': False}),
+    (3, {'formato_base': 'xlsx', 'resumen': True}),
+], ids=['archivo', 'tipo_reporte', 'zona', 'formato_base', 'resumen'])
+def test_cada_entrada_cambia_el_id(posicion, valor):
+    entrada = list(ENTRADA)
+    entrada[posicion] = valor
+    assert clave_resultado(*entrada) != clave_resultado(*ENTRADA)
+
+
+@pytest.mark.parametrize('version', ['version_codigo', 'version_alias'])
+def test_version_del_codigo_y_de_los_alias_cambian_el_id(monkeypatch, version):
+    antes = clave_resultado(*ENTRADA)
+    monkeypatch.setattr(cache_resultados, version, lambda: 'otra-version')
+    assert clave_resultado(*ENTRADA) != antes
+
+
+def test_version_codigo_depende_de_los_fuentes(tmp_path, monkeypatch):
+    (tmp_path / 'modulo.py').write_text("x = 1\n")
+    monkeypatch.setattr(cache_resultados, '_CARPETA_CODIGO', str(tmp_path))
+    cache_resultados.version_codigo.cache_clear()
+    try:
+        antes = cache_resultados.version_codigo()
+        (tmp_path / 'modulo.py').write_text("x = 2\n")
+        cache_resultados.version_codigo.cache_clear()
+        assert cache_resultados.version_codigo() != antes
+    finally:
+        cache_resultados.version_codigo.cache_clear()
+
+
+def test_hash_contenido():
+    assert hash_contenido(b'a') == hash_contenido(b'a') != hash_contenido(b'b')
+
+
+# --- La carpeta compartida no usa la caché ---
+
+class _Subida(io.BytesIO):
+    file_id = 'lima_corte_1'
+
+
+@pytest.fixture
+def consolidado(tmp_path):
+    ruta = tmp_path / 'lima_corte_1.xlsx'
+    generar('lima_corte_1', str(ruta), filas=200, agencias=3)
+    return ruta
+
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    almacen = AlmacenResultados(str(tmp_path / 'almacen'))
+    monkeypatch.setattr(ui, 'almacen_resultados', lambda: almacen)
+    monkeypatch.setenv('SEGMENTADOR_DESTINO', str(tmp_path / 'compartida'))
+    cache_base.vaciar()
+    yield almacen
+    cache_base.vaciar()
+
+
+def test_pagina_con_carpeta_no_usa_la_cache(consolidado, almacen, tmp_path):
+    archivo = _Subida(consolidado.read_bytes())
+    opciones = {'formato_base': 'xlsx', 'resumen': False}
+    corridas = []
+
+    def ejecutar(salida):
+        corridas.append(type(salida).__name__)
+        return procesar_archivos_excel(archivo, salida, 'xlsx')
+
+    id_zip, _, reutilizado = ui.ejecutar_con_cache(archivo, None, "Lima Corte 1", "LIMA", opciones, ejecutar)
+    assert not reutilizado and almacen.existe(id_zip)
+    assert ui.ejecutar_con_cache(archivo, None, "Lima Corte 1", "LIMA", opciones, ejecutar)[2]
+
+    carpeta = ui.resolver_destino('periodo')
+    for _ in range(2):
+        manifiesto, _, reutilizado = ui.ejecutar_con_cache(archivo, carpeta, "Lima Corte 1", "LIMA", opciones,
+                                                           ejecutar)
+        assert not reutilizado and os.path.isfile(manifiesto)
+    assert corridas == ['SalidaAlmacen', 'SalidaDirectorio', 'SalidaDirectorio']
+    assert len(almacen._entradas()) == 1
+
+
+def test_api_con_destino_no_usa_la_cache(consolidado, almacen, monkeypatch):
+    cola = ColaTrabajos(almacen, trabajadores=1)
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(cola, '_pool_trabajos', lambda: pool)
+    try:
+        hash_archivo = ColaTrabajos.hash_ruta(str(consolidado))
+        primero = cola.enviar('lima_corte_1', 'LIMA', 'xlsx', str(consolidado), hash_archivo)
+        pool.submit(lambda: None).result()
+        assert cola.obtener(primero.id).estado == TERMINADO
+        assert buscar(almacen, primero.resultado) is not None
+
+        # El mismo archivo ya está en caché, pero con destino se vuelve a procesar y no se lee el almacén
+        leidos = []
+        monkeypatch.setattr('segmentador.api.buscar', lambda *a: leidos.append(a))
+        con_destino = cola.enviar('lima_corte_1', 'LIMA', 'xlsx', str(consolidado), hash_archivo,
+                                  destino=ui.resolver_destino('api'))
+        pool.submit(lambda: None).result()
+        trabajo = cola.obtener(con_destino.id)
+        assert (trabajo.estado, trabajo.reutilizado, leidos) == (TERMINADO, False, [])
+        assert os.path.isfile(trabajo.resultado)
+    finally:
+        pool.shutdown()
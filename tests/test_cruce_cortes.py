@@ -0,0 +1,93 @@
+# tests/test_cruce_cortes.py
+"""Cruce entre Corte 1 y Corte 2 (segmentador/cruce_cortes.py) sobre libros armados en memoria."""
+import io
+
+import openpyxl
+import pytest
+
+from segmentador import cache_base
+from segmentador.cruce_cortes import AMBOS, SOLO_CORTE_1, cruzar_cortes
+
+CABECERA_CORTE_1 = ['RUC', 'AGENCIA', 'META', 'GRUPO', 'ALTAS', 'ARPU SIN IGV', 'CORTE 1', 'TOTAL A PAGAR']
+CABECERA_CORTE_2 = ['RUC', 'AGENCIA', 'META', 'GRUPO', 'ALTAS', 'PENALIDAD 1', 'CLAWBACK 1', 'TOTAL A PAGAR CORTE 2']
+
+
+def _libro(hoja, filas):
+    libro = openpyxl.Workbook()
+    ws = libro.active
+    ws.title = hoja
+    for fila in filas:
+        ws.append(fila)
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def _corte_1(agencias):
+    """agencias: [(ruc, nombre, altas, total)]"""
+    return _libro('Reporte CORTE 1', [CABECERA_CORTE_1] + [
+        [ruc, nombre, 100, 'A', altas, 50, 1000, total] for ruc, nombre, altas, total in agencias])
+
+
+def _corte_2(agencias):
+    """agencias: [(ruc, nombre, altas, penalidad, clawback)]; cabecera de dos niveles."""
+    superior = ['', '', '', '', '', 'PENALIDAD 1', 'CLAWBACK 1', 'TOTAL A PAGAR CORTE 2']
+    return _libro('Reporte CORTE 2', [superior, CABECERA_CORTE_2] + [
+        [ruc, nombre, 100, 'A', altas, penalidad, clawback, 500] for ruc, nombre, altas, penalidad, clawback in agencias])
+
+
+@pytest.fixture(autouse=True)
+def _sin_cache():
+    cache_base.vaciar()
+    yield
+    cache_base.vaciar()
+
+
+def test_ruc_compartido_por_dos_agencias_cruza_uno_a_uno():
+    corte_1 = _corte_1([
+        (20100000001, 'AG UNO', 10, 1000),
+        (20100000001, 'AG UNO BIS', 20, 1000),
+        (20100000002, 'AG DOS', 30, 1000),
+        (20100000003, 'AG TRES', 40, 1000),
+    ])
+    corte_2 = _corte_2([
+        (20100000001, 'AG UNO BIS', 20, -50, -20),
+        (20100000001, 'AG UNO', 10, -50, -20),
+        (20100000002, 'AG DOS', 30, -50, -20),
+    ])
+    resultado = cruzar_cortes(corte_1, corte_2)
+    detalle = resultado.detalle.set_index('AGENCIA')
+
+    assert len(detalle) == 4
+    assert resultado.resumen['Agencias en Corte 1'] == 4
+    assert resultado.resumen['Agencias en Corte 2'] == 3
+    assert resultado.resumen['En ambos cortes'] == 3
+    assert resultado.resumen['Solo en Corte 1'] == 1
+    assert resultado.resumen['ALTAS distintas'] == 0
+    assert detalle.loc['AG UNO', 'CRUCE POR'] == 'RUC Y AGENCIA'
+    assert detalle.loc['AG UNO BIS', 'ALTAS CORTE 2'] == 20
+    assert detalle.loc['AG TRES', 'PRESENCIA'] == SOLO_CORTE_1
+    assert 'ALTAS DISTINTAS' not in ' '.join(detalle['OBSERVACIONES'])
+
+
+def test_marcas_de_altas_ruc_y_ajustes():
+    corte_1 = _corte_1([
+        (20100000001, 'AG UNO', 10, 1000),
+        (20100000002, 'AG DOS', 20, 1000),
+        (20100000003, 'AG TRES', 30, 0),
+        (20100000004, 'AG CUATRO', 40, 100),
+    ])
+    corte_2 = _corte_2([
+        (20100000001, 'AG UNO', 11, -50, -20),
+        (20999999999, 'AG DOS', 20, -50, -20),
+        (20100000003, 'AG TRES', 30, -50, -20),
+        (20100000004, 'AG CUATRO', 40, -500, 0),
+    ])
+    detalle = cruzar_cortes(corte_1, corte_2).detalle.set_index('AGENCIA')
+
+    assert (detalle['PRESENCIA'] == AMBOS).all()
+    assert detalle.loc['AG UNO', 'OBSERVACIONES'] == 'ALTAS DISTINTAS'
+    assert detalle.loc['AG UNO', 'DIFERENCIA ALTAS'] == 1
+    assert detalle.loc['AG DOS', 'OBSERVACIONES'] == 'RUC DISTINTO'
+    assert detalle.loc['AG TRES', 'OBSERVACIONES'] == 'AJUSTE SIN PAGO EN CORTE 1'
+    assert detalle.loc['AG CUATRO', 'OBSERVACIONES'] == 'AJUSTE MAYOR A LO PAGADO EN CORTE 1'
@@ -0,0 +1,319 @@
+# tests/test_empalme_base.py
+"""
+BASE por empalme (segmentador/empalme_base.py) frente al escritor de pandas
+(SEGMENTADOR_EMPALME=0), sobre libros armados a mano con la sintaxis que no escribe
+openpyxl: fórmulas con valor guardado, cadenas en línea y cadenas con formato.
+"""
+import datetime
+import io
+import zipfile
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from segmentador import cache_base
+from segmentador.empalme_base import NoEmpalmable, FuenteBase, fuente_base
+from segmentador.integridad import NOMBRE_RESUMEN
+from segmentador.lima_corte_1 import procesar_archivos_excel
+
+CABECERA_REPORTE = ['RUC', 'AGENCIA', 'META', 'GRUPO', 'ALTAS', 'ARPU SIN IGV', 'CORTE 1', 'TOTAL A PAGAR']
+CABECERA_BASE = ['COD_PEDIDO', 'ASESOR', 'FECHA', 'MONTO', 'FACTOR', 'TOTAL', 'ETIQUETA', 'NOTA']
+
+FECHA = 45413  # 2024-05-01
+_TIPOS = {
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml': '/xl/workbook.xml',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml': '/xl/styles.xml',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml': '/xl/sharedStrings.xml',
+}
+_ESTILOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/><numFmt numFmtId="165" formatCode="0.000"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+ESTILO_FECHA, ESTILO_MONTO, ESTILO_FACTOR = 1, 2, 3
+
+
+class _Libro:
+    """Libro .xlsx escrito a mano: cada celda se da como (valor) o (tipo, ...)."""
+
+    def __init__(self):
+        self.textos = []
+        self.hojas = {}
+
+    def _texto(self, fragmento):
+        self.textos.append(fragmento)
+        return len(self.textos) - 1
+
+    def _celda(self, ref, valor):
+        if valor is None:
+            return ''
+        if isinstance(valor, str):
+            return f'<c r="{ref}" t="s"><v>{self._texto(f"<si><t>{valor}</t></si>")}</v></c>'
+        if isinstance(valor, (int, float)):
+            return f'<c r="{ref}"><v>{valor}</v></c>'
+        tipo, *resto = valor
+        if tipo == 'crudo':  # XML de la celda tal cual (sin referencia)
+            return resto[0]
+        if tipo == 'rico':
+            runs = ''.join(f'<r><rPr><b/></rPr><t xml:space="preserve">{t}</t></r>' for t in resto)
+            return f'<c r="{ref}" t="s"><v>{self._texto(f"<si>{runs}</si>")}</v></c>'
+        if tipo == 'linea':
+            return f'<c r="{ref}" t="inlineStr"><is><t>{resto[0]}</t></is></c>'
+        if tipo == 'estilo':
+            return f'<c r="{ref}" s="{resto[0]}"><v>{resto[1]}</v></c>'
+        if tipo == 'formula':
+            return f'<c r="{ref}" s="{ESTILO_MONTO}"><f>{resto[0]}</f><v>{resto[1]}</v></c>'
+        if tipo == 'formula_texto':
+            return f'<c r="{ref}" t="str"><f>{resto[0]}</f><v>{resto[1]}</v></c>'
+        if tipo == 'vacia':
+            return f'<c r="{ref}" s="{ESTILO_MONTO}"/>'
+        raise ValueError(tipo)
+
+    def hoja(self, nombre, filas):
+        """filas: {número de fila: [valores]} (se pueden saltar números) o lista desde la fila 1."""
+        if isinstance(filas, list):
+            filas = dict(enumerate(filas, start=1))
+        xml = []
+        for numero, valores in sorted(filas.items()):
+            if not valores:
+                xml.append(f'<row r="{numero}"/>')
+                continue
+            celdas = ''.join(self._celda(f"{openpyxl.utils.get_column_letter(i + 1)}{numero}", v)
+                             for i, v in enumerate(valores))
+            xml.append(f'<row r="{numero}">{celdas}</row>')
+        self.hojas[nombre] = ''.join(xml)
+
+    def bytes(self):
+        salida = io.BytesIO()
+        with zipfile.ZipFile(salida, 'w') as z:
+            tipos = ''.join(f'<Override PartName="{ruta}" ContentType="{tipo}"/>' for tipo, ruta in _TIPOS.items())
+            tipos += ''.join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in range(1, len(self.hojas) + 1))
+            z.writestr('[Content_Types].xml',
+                       '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                       '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                       '<Default Extension="xml" ContentType="application/xml"/>' + tipos + '</Types>')
+            z.writestr('_rels/.rels',
+                       '<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                       '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+                       'Target="xl/workbook.xml"/></Relationships>')
+            hojas = ''.join(f'<sheet name="{nombre}" sheetId="{i}" r:id="rId{i}"/>'
+                            for i, nombre in enumerate(self.hojas, start=1))
+            z.writestr('xl/workbook.xml',
+                       '<?xml version="1.0" encoding="UTF-8"?><workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                       'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                       f'<sheets>{hojas}</sheets></workbook>')
+            relaciones = ''.join(
+                f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, len(self.hojas) + 1))
+            n = len(self.hojas)
+            relaciones += (
+                f'<Relationship Id="rId{n + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+                f'<Relationship Id="rId{n + 2}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>')
+            z.writestr('xl/_rels/workbook.xml.rels',
+                       '<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                       f'{relaciones}</Relationships>')
+            for i, contenido in enumerate(self.hojas.values(), start=1):
+                z.writestr(f'xl/worksheets/sheet{i}.xml',
+                           '<?xml version="1.0" encoding="UTF-8"?><worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                           f'<sheetData>{contenido}</sheetData></worksheet>')
+            z.writestr('xl/sharedStrings.xml',
+                       '<?xml version="1.0" encoding="UTF-8"?><sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                       f'count="{len(self.textos)}" uniqueCount="{len(self.textos)}">{"".join(self.textos)}</sst>')
+            z.writestr('xl/styles.xml', _ESTILOS)
+        return salida.getvalue()
+
+
+def _fila_base(cod, asesor, monto, etiqueta=None, nota=None):
+    return [cod, asesor, ('estilo', ESTILO_FECHA, FECHA + cod % 7), ('estilo', ESTILO_MONTO, monto),
+            ('estilo', ESTILO_FACTOR, 0.125 * cod), ('formula', f'D{cod}*2', monto * 2),
+            etiqueta, nota]
+
+
+def _consolidado(filas_base=None, cabecera_base=CABECERA_BASE):
+    """Consolidado de Lima Corte 1: tres agencias, EXPORTEL con dos asesores por alias (segmentador/alias.py)."""
+    libro = _Libro()
+    libro.hoja('Reporte CORTE 1', [CABECERA_REPORTE] + [
+        [20100000001, 'AGENCIA NORTE', 10, 'A', 4, 30.5, 100, 1000],
+        [20100000002, 'EXPORTEL S.A.C.', 10, 'B', 4, 31.5, 100, 2000],
+        [20100000003, 'AGENCIA SUR', 10, 'C', 1, 32.5, 100, 3000],
+    ])
+    if filas_base is None:
+        filas_base = {
+            1: cabecera_base,
+            2: _fila_base(2, 'AGENCIA NORTE', 1234.5, ('rico', 'PLAN ', 'MAX'), ('linea', 'en línea &amp; más')),
+            3: _fila_base(3, 'EXPORTEL S.A.C.', 99.99, ('formula_texto', 'B3&amp;""', 'EXPORTEL'), None),
+            4: _fila_base(4, 'AGENCIA NORTE', 0, None, ('vacia',)),
+            # fila 5 ausente, fila 6 vacía y fila 7 solo con celdas sin valor: pandas no las cuenta
+            6: [],
+            7: [None, ('vacia',)],
+            8: _fila_base(8, 'EXPORTEL PROVINCIA', 10, ('rico', 'PLAN ', 'MAX'), 'compartida'),
+            9: _fila_base(9, 'AGENCIA NORTE', 7.25, 'compartida', None),
+            10: _fila_base(10, 'EXPORTEL S.A.C.', 1e6, None, ('linea', 'x')),
+            11: _fila_base(11, 'SIN AGENCIA', 5, None, None),
+            12: _fila_base(12, 'AGENCIA NORTE', -3.5, None, None),
+            13: _fila_base(13, 'EXPORTEL PROVINCIA', 8, None, None),
+        }
+    libro.hoja('BASE', filas_base)
+    return libro.bytes()
+
+
+def _libros(zip_memoria):
+    """{nombre: libro de openpyxl} de cada .xlsx de agencia del zip (todos deben abrir)."""
+    with zipfile.ZipFile(zip_memoria) as z:
+        return {nombre: openpyxl.load_workbook(io.BytesIO(z.read(nombre)))
+                for nombre in z.namelist() if nombre.endswith('.xlsx') and nombre != NOMBRE_RESUMEN}
+
+
+def _valores(libro):
+    return {hoja.title: [list(fila) for fila in hoja.iter_rows(values_only=True)] for hoja in libro.worksheets}
+
+
+def _procesar(datos, monkeypatch, empalme):
+    monkeypatch.setenv('SEGMENTADOR_EMPALME', '1' if empalme else '0')
+    cache_base.vaciar()
+    zip_memoria, log = procesar_archivos_excel(io.BytesIO(datos))
+    assert zip_memoria is not None, log.lineas_log()
+    return _libros(zip_memoria)
+
+
+@pytest.fixture(autouse=True)
+def _sin_cache():
+    cache_base.vaciar()
+    yield
+    cache_base.vaciar()
+
+
+def test_mismos_valores_que_pandas(monkeypatch):
+    datos = _consolidado()
+    con_empalme = _procesar(datos, monkeypatch, empalme=True)
+    con_pandas = _procesar(datos, monkeypatch, empalme=False)
+    assert sorted(con_empalme) == sorted(con_pandas)
+    for nombre in con_pandas:
+        assert _valores(con_empalme[nombre]) == _valores(con_pandas[nombre]), nombre
+
+    base = con_empalme['Reporte AGENCIA NORTE.xlsx']['BASE']
+    filas = list(base.iter_rows(min_row=2, values_only=True))
+    assert [f[0] for f in filas] == [2, 4, 9, 12]
+    assert filas[0][6] == 'PLAN MAX' and filas[0][7] == 'en línea & más'
+    assert filas[0][2] == datetime.datetime(2024, 5, 3)
+    # EXPORTEL: sus dos asesores por alias, en el orden de la BASE
+    exportel = con_empalme['Reporte EXPORTEL SAC.xlsx']['BASE']
+    assert [(f[0], f[1]) for f in exportel.iter_rows(min_row=2, values_only=True)] == [
+        (3, 'EXPORTEL S.A.C.'), (8, 'EXPORTEL PROVINCIA'), (10, 'EXPORTEL S.A.C.'), (13, 'EXPORTEL PROVINCIA')]
+
+
+def test_conserva_formatos_y_quita_formulas(monkeypatch):
+    libro = _procesar(_consolidado(), monkeypatch, empalme=True)['Reporte AGENCIA NORTE.xlsx']
+    base = libro['BASE']
+    assert base['C2'].number_format == 'dd/mm/yyyy'
+    assert base['D2'].number_format == '#,##0.00'
+    assert base['E2'].number_format == '0.000'
+    assert base['F2'].data_type == 'n' and base['F2'].value == 2469.0  # fórmula como su valor
+    assert base.max_row == 5 and base.calculate_dimension() == 'A1:H5'
+
+
+def _fuente(datos):
+    """FuenteBase sobre la BASE leída como la leen los procesos."""
+    df_base = pd.read_excel(io.BytesIO(datos), sheet_name='BASE', engine='openpyxl')
+    return FuenteBase(datos, df_base), df_base
+
+
+@pytest.mark.parametrize('ultima', [
+    [('crudo', '<c t="s"><v>0</v></c>')],                       # celda sin referencia
+    [('crudo', '<c s="0" r="A3"><v>1</v></c>'), 'AGENCIA NORTE'],  # referencia que no va primero
+])
+def test_sintaxis_desconocida_usa_pandas(ultima, monkeypatch):
+    filas = {1: CABECERA_BASE, 2: _fila_base(2, 'AGENCIA NORTE', 1, None, None), 3: ultima}
+    datos = _consolidado(filas)
+    df_base = pd.read_excel(io.BytesIO(datos), sheet_name='BASE', engine='openpyxl')
+    with pytest.raises(NoEmpalmable):
+        FuenteBase(datos, df_base)
+    assert fuente_base(datos, df_base) is None
+    # El proceso igual genera los archivos, con pandas
+    con_empalme = _procesar(datos, monkeypatch, empalme=True)
+    con_pandas = _procesar(datos, monkeypatch, empalme=False)
+    assert {n: _valores(l) for n, l in con_empalme.items()} == {n: _valores(l) for n, l in con_pandas.items()}
+
+
+@pytest.mark.parametrize('cabecera', [
+    [c if c != 'ASESOR' else 'VENDEDOR' for c in CABECERA_BASE],   # sin ASESOR
+    CABECERA_BASE[:-1] + ['MONTO'],                                # nombre repetido
+])
+def test_cabecera_que_no_cuadra(cabecera, monkeypatch):
+    datos = _consolidado(cabecera_base=cabecera)
+    df_base = pd.read_excel(io.BytesIO(datos), sheet_name='BASE', engine='openpyxl')
+    fuente = fuente_base(datos, df_base)
+    if fuente is not None:
+        # La hoja se indexa, pero las columnas del reporte no se ubican sin ambigüedad
+        assert fuente.destinos(df_base.columns) is None
+    con_empalme = _procesar(datos, monkeypatch, empalme=True)
+    con_pandas = _procesar(datos, monkeypatch, empalme=False)
+    assert {n: _valores(l) for n, l in con_empalme.items()} == {n: _valores(l) for n, l in con_pandas.items()}
+
+
+def test_cabecera_fuera_de_la_fila_1():
+    filas = {2: CABECERA_BASE, 3: _fila_base(3, 'AGENCIA NORTE', 1, None, None)}
+    datos = _consolidado(filas)
+    df_base = pd.read_excel(io.BytesIO(datos), sheet_name='BASE', engine='openpyxl')
+    assert fuente_base(datos, df_base) is None
+
+
+def test_filas_desordenadas_usan_pandas():
+    libro = _Libro()
+    libro.hoja('BASE', {1: CABECERA_BASE, 3: _fila_base(3, 'AGENCIA NORTE', 1, None, None)})
+    libro.hoja('fila 2', {2: _fila_base(2, 'AGENCIA NORTE', 1, None, None)})
+    libro.hojas['BASE'] += libro.hojas.pop('fila 2')  # la fila 2 después de la 3
+    datos = libro.bytes()
+    df_base = pd.read_excel(io.BytesIO(datos), sheet_name='BASE', engine='openpyxl')
+    with pytest.raises(NoEmpalmable):
+        FuenteBase(datos, df_base)
+
+
+def test_filas_desalineadas():
+    fuente, df_base = _fuente(_consolidado())
+    assert fuente.destinos(df_base.columns) is not None
+    # Otra BASE (un asesor cambiado, o filas de más): la verificación por ASESOR la rechaza
+    distinta = df_base.copy()
+    distinta.loc[1, 'ASESOR'] = 'OTRO'
+    with pytest.raises(NoEmpalmable):
+        FuenteBase(_consolidado(), distinta)
+    mas_larga = pd.concat([df_base, df_base], ignore_index=True)
+    with pytest.raises(NoEmpalmable):
+        FuenteBase(_consolidado(), mas_larga)
+    # Posiciones que no existen en la hoja: esa agencia va con pandas
+    libro = fuente.libro()
+    with pd.ExcelWriter(io.BytesIO(), engine='xlsxwriter') as writer:
+        assert libro.escribir(writer, df_base.set_axis(df_base.index + 100)) is None
+
+
+def test_mas_filas_que_una_hoja_usa_pandas():
+    fuente, df_base = _fuente(_consolidado())
+    libro = fuente.libro()
+    with pd.ExcelWriter(io.BytesIO(), engine='xlsxwriter') as writer:
+        # Con un límite de 3 filas por hoja (cabecera incluida) no entran las 10 de la BASE
+        assert libro.escribir(writer, df_base, max_filas=3) is None
+        assert libro.escribir(writer, df_base.iloc[:2], max_filas=3) == ['BASE']
+    assert len(libro.pendientes) == 1
+
+
+def test_fuente_no_queda_en_datos(monkeypatch):
+    from segmentador.lima_corte_1 import cargar_datos
+
+    monkeypatch.setenv('SEGMENTADOR_EMPALME', '1')
+    datos_leidos, _ = cargar_datos(io.BytesIO(_consolidado()))
+    procesar_archivos_excel(io.BytesIO(_consolidado()), datos=datos_leidos)
+    assert not any(isinstance(v, FuenteBase) for v in datos_leidos.values())
@@ -0,0 +1,118 @@
+# tests/test_integridad.py
+"""Integridad de la BASE (segmentador/integridad.py) y libro de resumen opcional de los procesos."""
+import importlib
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+from herramientas.sinteticos import PERFILES, generar
+from segmentador import cache_base
+from segmentador.api import TIPOS
+from segmentador.integridad import NOMBRE_RESUMEN, integridad_de, libro_resumen, verificar_integridad
+from segmentador.registros import OK, Bitacora, RegistroAgencia
+
+
+def _base(filas):
+    """BASE con (COD_PEDIDO, asesor normalizado); ASESOR es el mismo nombre en minúsculas."""
+    return pd.DataFrame({
+        'COD_PEDIDO': [codigo for codigo, _ in filas],
+        'ASESOR': [asesor.lower() for _, asesor in filas],
+        'ASESOR_NORMALIZADO': [asesor for _, asesor in filas],
+    })
+
+
+# (id, filas de BASE, agencias, alias, conteos esperados)
+CASOS = [
+    ('limpia', [(1, 'A'), (2, 'A'), (3, 'B')], ['A', 'B'], None,
+     dict(codigos_unicos=3, codigos_duplicados=0, filas_duplicadas=0, colisiones=0, filas_huerfanas=0)),
+    ('duplicado_en_una_agencia', [(1, 'A'), (1, 'A'), (2, 'B')], ['A', 'B'], None,
+     dict(codigos_unicos=2, codigos_duplicados=1, filas_duplicadas=2, colisiones=0)),
+    ('mismo_codigo_en_dos_agencias', [(1, 'A'), (1, 'B'), (2, 'B')], ['A', 'B'], None,
+     dict(codigos_duplicados=1, filas_duplicadas=2, colisiones=1)),
+    ('codigos_equivalentes', [(123, 'A'), (123.0, 'A'), (' 123 ', 'B'), (None, 'B'), ('', 'B')], ['A', 'B'], None,
+     dict(filas_sin_codigo=2, codigos_unicos=1, codigos_duplicados=1, filas_duplicadas=3, colisiones=1)),
+    # X es alias de A y a la vez una agencia propia: cada fila de X va a dos archivos
+    ('alias_reclamado_por_dos', [(1, 'X'), (2, 'X'), (3, 'A')], ['A', 'X'], {'A': ['A', 'X']},
+     dict(codigos_duplicados=0, filas_duplicadas=0, colisiones=2, filas_huerfanas=0)),
+    ('filas_sin_agencia', [(1, 'A'), (2, 'Z'), (3, 'Z'), (4, 'Y')], ['A'], None,
+     dict(colisiones=0, filas_huerfanas=3, asesores_huerfanos=2)),
+    ('todo_junto', [(1, 'A'), (1, 'A'), (2, 'A'), (2, 'B'), (3, 'X'), (4, 'Z')], ['A', 'B', 'X'], {'B': ['B', 'X']},
+     dict(codigos_duplicados=2, filas_duplicadas=4, colisiones=2, filas_huerfanas=1, asesores_huerfanos=1)),
+]
+
+
+@pytest.mark.parametrize('filas, agencias, alias, esperado', [c[1:] for c in CASOS], ids=[c[0] for c in CASOS])
+def test_conteos(filas, agencias, alias, esperado):
+    resultado = verificar_integridad(_base(filas), 'ASESOR_NORMALIZADO', agencias, alias)
+    assert resultado.filas_base == len(filas)
+    assert {clave: getattr(resultado, clave) for clave in esperado} == esperado
+    assert resultado.sin_problemas() == (not (resultado.codigos_duplicados or resultado.colisiones
+                                              or resultado.filas_huerfanas))
+
+
+def test_muestras():
+    resultado = verificar_integridad(_base(CASOS[-1][1]), 'ASESOR_NORMALIZADO', ['A', 'B', 'X'], {'B': ['B', 'X']})
+    colisiones = resultado.muestras['colisiones'].set_index('COD_PEDIDO')
+    assert colisiones.loc['2', 'AGENCIAS'] == 'A, B'
+    assert colisiones.loc['3', 'AGENCIAS'] == 'B, X'
+    assert resultado.muestras['duplicados'].set_index('COD_PEDIDO')['FILAS'].to_dict() == {'1': 2, '2': 2}
+    assert resultado.muestras['asesores_huerfanos'].to_dict('records') == [{'ASESOR': 'z', 'FILAS': 1}]
+
+
+def test_sin_columna_de_pedido():
+    resultado = verificar_integridad(_base([(1, 'A'), (2, 'Z')]).drop(columns='COD_PEDIDO'), 'ASESOR_NORMALIZADO', ['A'])
+    assert not resultado.con_codigo
+    assert resultado.filas_huerfanas == 1
+    assert 'sin columna COD_PEDIDO' in resultado.texto()
+
+
+def test_integridad_de_se_calcula_una_vez():
+    datos = {'base': _base([(1, 'A'), (1, 'A')])}
+    primero = integridad_de(datos, 'ASESOR_NORMALIZADO', ['A'])
+    datos['base'] = _base([(1, 'A')])
+    assert integridad_de(datos, 'ASESOR_NORMALIZADO', ['A']) is primero
+
+
+def test_libro_resumen():
+    bitacora = Bitacora()
+    bitacora.registrar(RegistroAgencia('Agencia A', clave='A', altas=3, filas_base=3, estado=OK))
+    integridad = verificar_integridad(_base(CASOS[-1][1]), 'ASESOR_NORMALIZADO', ['A', 'B', 'X'], {'B': ['B', 'X']})
+    hojas = pd.read_excel(io.BytesIO(libro_resumen(bitacora, integridad)), sheet_name=None, header=None)
+    assert list(hojas) == ['Agencias', 'Integridad']
+    assert hojas['Agencias'].iloc[1, 0] == 'Agencia A'
+    indicadores = dict(hojas['Integridad'].iloc[1:9, :2].values)
+    assert indicadores['COD_PEDIDO duplicados'] == 2
+    assert indicadores['COD_PEDIDO en más de una agencia'] == 2
+    assert indicadores['Filas de BASE sin agencia'] == 1
+
+
+# --- El libro de resumen solo va en el resultado si se pide ---
+
+@pytest.fixture(scope='module')
+def consolidados(tmp_path_factory):
+    carpeta = tmp_path_factory.mktemp('consolidados')
+    rutas = {}
+    for perfil in PERFILES:
+        rutas[perfil] = carpeta / f"{perfil}.xlsx"
+        generar(perfil, str(rutas[perfil]), filas=300, agencias=4)
+    return rutas
+
+
+@pytest.mark.parametrize('perfil', PERFILES)
+def test_resumen_solo_si_se_pide(consolidados, perfil):
+    _, funcion, pide_zona = TIPOS[perfil]
+    proceso = getattr(importlib.import_module(f"segmentador.{perfil}"), funcion)
+    argumentos = ('NORTE',) if pide_zona else ()
+    datos = consolidados[perfil].read_bytes()
+    cache_base.vaciar()
+
+    zip_memoria, _ = proceso(io.BytesIO(datos), *argumentos)
+    assert NOMBRE_RESUMEN not in zipfile.ZipFile(zip_memoria).namelist()
+
+    zip_memoria, bitacora = proceso(io.BytesIO(datos), *argumentos, resumen=True)
+    with zipfile.ZipFile(zip_memoria) as zf:
+        hojas = pd.read_excel(io.BytesIO(zf.read(NOMBRE_RESUMEN)), sheet_name=None)
+    assert len(hojas['Agencias']) == len(bitacora.registros) > 0
+    cache_base.vaciar()
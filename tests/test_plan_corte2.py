@@ -0,0 +1,129 @@
+# tests/test_plan_corte2.py
+"""Formato de la hoja 'Reporte CORTE 2' (segmentador/plan_corte2.py) en los archivos generados."""
+import io
+import zipfile
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from herramientas.sinteticos import CABECERAS_BASE
+from segmentador import cache_base
+from segmentador.lima_corte_2 import procesar_reporte_corte_2
+from segmentador.plan_corte2 import compilar_plan_lima_corte_2, escribir_reporte_con_plan
+from segmentador.provincia_corte_2 import procesar_provincia_corte_2
+
+AMARILLO, AZUL, AZUL_OSCURO = 'FFFFC000', 'FF0070C0', 'FF002060'
+
+# Cabecera de dos niveles; PENALIDAD 1 y CLAWBACK 1 combinadas sobre sus cuatro columnas
+NIVEL_1 = ['', '', '', '', '', '', 'PENALIDAD 1', '', '', '', 'CLAWBACK 1', '', '', '', 'TOTAL A PAGAR CORTE 2']
+NIVEL_2 = ['RUC', 'AGENCIA', 'META', 'GRUPO', 'ALTAS', 'CUMPLIMIENTO ALTAS %', 'CHURN 4.5%', 'UMBRAL',
+           'ALTAS PENALIZADAS', 'PENALIDAD 1', 'UMBRAL 1', 'CUMPLIMIENTO CORTE 2 %', 'MULTIPLICADOR CORTE 2',
+           'CLAWBACK 1', 'TOTAL A PAGAR CORTE 2']
+
+# (cabecera, relleno, formato numérico de la columna, ancho); las demás columnas van en amarillo, sin formato
+ESPERADO_LIMA = [
+    ('CUMPLIMIENTO ALTAS %', AMARILLO, '0.00%', 20),
+    ('PENALIDAD 1 - CHURN 4.5%', AZUL, 'General', None),
+    ('PENALIDAD 1 - UMBRAL', AZUL, 'General', None),
+    ('PENALIDAD 1 - ALTAS PENALIZADAS', AZUL, 'General', None),
+    ('PENALIDAD 1', AZUL, 'General', None),
+    ('CLAWBACK 1 - UMBRAL 1', AZUL_OSCURO, 'General', None),
+    ('CLAWBACK 1 - CUMPLIMIENTO CORTE 2 %', AZUL_OSCURO, '0.00%', 20),
+    ('CLAWBACK 1 - MULTIPLICADOR CORTE 2', AZUL_OSCURO, 'General', None),
+    ('CLAWBACK 1', AZUL_OSCURO, 'General', None),
+    ('TOTAL A PAGAR CORTE 2', AMARILLO, '#,##0.00', 18),
+]
+# Provincia solo colorea las columnas con prefijo y solo da formato a los porcentajes
+ESPERADO_PROVINCIA = [
+    ('Cumplimiento Altas %', AMARILLO, '0.00%', 18),
+    ('PENALIDAD 1 - CHURN 4.5%', AZUL, 'General', None),
+    ('PENALIDAD 1 - UMBRAL', AZUL, 'General', None),
+    ('PENALIDAD 1 - ALTAS PENALIZADAS', AZUL, 'General', None),
+    ('PENALIDAD 1', AMARILLO, 'General', None),
+    ('CLAWBACK 1 - UMBRAL 1', AZUL_OSCURO, 'General', None),
+    ('CLAWBACK 1 - Cumplimiento Corte 2 %', AZUL_OSCURO, '0.00%', 18),
+    ('CLAWBACK 1 - MULTIPLICADOR CORTE 2', AZUL_OSCURO, 'General', None),
+    ('CLAWBACK 1', AMARILLO, 'General', None),
+    ('TOTAL A PAGAR CORTE 2', AMARILLO, 'General', None),
+]
+
+
+def _consolidado(provincia):
+    libro = openpyxl.Workbook()
+    ws = libro.active
+    ws.title = 'Reporte CORTE 2'
+    nivel_2 = list(NIVEL_2)
+    if provincia:
+        nivel_2[5], nivel_2[11] = 'Cumplimiento Altas %', 'Cumplimiento Corte 2 %'
+    ws.append(NIVEL_1)
+    ws.append(nivel_2)
+    ws.merge_cells('G1:J1')
+    ws.merge_cells('K1:N1')
+    agencia = 'AGENCIA UNO SAC PIURA' if provincia else 'AGENCIA UNO SAC'
+    ws.append([20100000001, agencia, 100, 'A', 2, 0.85, 0.045, 3, 1, -50.0, 0.9, 0.8, 1.0, -20.0, 900.0])
+    base = libro.create_sheet('BASE')
+    base.append(CABECERAS_BASE)
+    for i in range(2):
+        base.append([f"P{i:04d}", 'AGENCIA UNO SAC', 'NORTE', 'PIURA', '2026-01-01', 'FIBRA', 79.9, '40000000',
+                     'SI', ''])
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def _hoja_reporte(provincia):
+    cache_base.vaciar()
+    archivo = io.BytesIO(_consolidado(provincia))
+    if provincia:
+        zip_memoria, bitacora = procesar_provincia_corte_2(archivo, 'NORTE')
+    else:
+        zip_memoria, bitacora = procesar_reporte_corte_2(archivo)
+    cache_base.vaciar()
+    assert zip_memoria is not None, bitacora.lineas_log()
+    with zipfile.ZipFile(zip_memoria) as zf:
+        nombres = zf.namelist()
+        assert len(nombres) == 1
+        libro = openpyxl.load_workbook(io.BytesIO(zf.read(nombres[0])))
+    return libro['Reporte CORTE 2']
+
+
+@pytest.mark.parametrize('provincia, esperado', [(False, ESPERADO_LIMA), (True, ESPERADO_PROVINCIA)],
+                         ids=['lima', 'provincia'])
+def test_formatos_y_anchos(provincia, esperado):
+    hoja = _hoja_reporte(provincia)
+    cabecera = [celda.value for celda in hoja[1]]
+    assert cabecera == ['RUC', 'AGENCIA', 'META', 'GRUPO', 'ALTAS'] + [nombre for nombre, *_ in esperado]
+    assert (hoja['A2'].value, hoja['E2'].value, hoja['O2'].value) == (20100000001, 2, 900)
+    assert hoja.max_row == 2
+
+    por_nombre = {celda.value: celda for celda in hoja[1]}
+    for nombre in cabecera[:5]:
+        assert por_nombre[nombre].fill.fgColor.rgb == AMARILLO
+    for nombre, relleno, formato, ancho in esperado:
+        celda = por_nombre[nombre]
+        assert celda.fill.fgColor.rgb == relleno, nombre
+        assert celda.font.b, nombre
+        assert (celda.font.color is not None and celda.font.color.rgb == 'FFFFFFFF') == (relleno != AMARILLO), nombre
+        assert hoja.cell(row=2, column=celda.column).number_format == formato, nombre
+        dimension = hoja.column_dimensions[celda.column_letter]
+        if ancho is None:
+            assert dimension.width == 13, nombre  # ancho por defecto de openpyxl: sin set_column
+        else:
+            assert round(dimension.width) == ancho + 1, nombre  # xlsxwriter guarda ancho + relleno (~0.71)
+
+
+def test_lima_centra_las_cabeceras():
+    hoja = _hoja_reporte(False)
+    assert {celda.alignment.horizontal for celda in hoja[1]} == {'center'}
+
+
+def test_si_falla_el_formato_quedan_datos_y_cabecera():
+    columnas = pd.MultiIndex.from_tuples([('Unnamed: 0_level_0', 'RUC'), ('PENALIDAD 1', 'CHURN 4.5%')])
+    plan = compilar_plan_lima_corte_2(columnas)
+    plan.estilos = {}  # ningún estilo registrado: la cabecera no encuentra el suyo
+    salida = io.BytesIO()
+    with pd.ExcelWriter(salida, engine='xlsxwriter') as writer:
+        escribir_reporte_con_plan(writer, 'Reporte CORTE 2', pd.DataFrame([[1, 0.5]], columns=columnas), plan)
+    hoja = openpyxl.load_workbook(salida)['Reporte CORTE 2']
+    assert [[c.value for c in fila] for fila in hoja.iter_rows()] == [['RUC', 'PENALIDAD 1 - CHURN 4.5%'], [1, 0.5]]
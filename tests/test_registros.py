@@ -0,0 +1,73 @@
+# tests/test_registros.py
+"""Bitácora de registros por agencia (segmentador/registros.py): resumen, exportación y persistencia."""
+import codecs
+import csv
+import io
+import json
+
+import numpy as np
+
+from segmentador.registros import DESCUADRE, ERROR, OK, SIN_VALIDAR, Bitacora, RegistroAgencia
+
+
+def _bitacora():
+    bitacora = Bitacora(formatear=lambda r: f"{r.agencia}: {r.estado}", lineas=["--- INICIO ---"])
+    bitacora.registrar(RegistroAgencia('Agencia Ñandú S.A.C.', clave='AGENCIA NANDU SAC', zona='NORTE',
+                                       altas=np.int64(3), filas_base=3, estado=OK, segundos_render=0.1234,
+                                       bytes_salida=1000, archivo='Reporte Agencia Ñandú SAC.xlsx'))
+    bitacora.append("línea suelta")
+    bitacora.registrar(RegistroAgencia('Agencia Dos', clave='AGENCIA DOS', zona='NORTE', altas=5,
+                                       filas_base=np.int64(4), estado=DESCUADRE, segundos_render=0.2,
+                                       bytes_salida=2000, detalle='faltan 1'))
+    bitacora.registrar(RegistroAgencia('Agencia Tres', estado=ERROR, detalle='hoja vacía'))
+    bitacora.registrar(RegistroAgencia('Agencia Cuatro', estado=SIN_VALIDAR))
+    return bitacora
+
+
+def test_lineas_en_orden():
+    assert _bitacora().lineas_log() == [
+        "--- INICIO ---", "Agencia Ñandú S.A.C.: OK", "línea suelta", "Agencia Dos: DESCUADRE",
+        "Agencia Tres: ERROR", "Agencia Cuatro: SIN_VALIDAR",
+    ]
+
+
+def test_resumen():
+    assert _bitacora().resumen() == {
+        'agencias': 4, 'ok': 1, 'descuadres': 1, 'errores': 1, 'segundos_render': 0.323, 'bytes_salida': 3000,
+    }
+    assert Bitacora().resumen() == {
+        'agencias': 0, 'ok': 0, 'descuadres': 0, 'errores': 0, 'segundos_render': 0, 'bytes_salida': 0,
+    }
+
+
+def test_exportacion_json():
+    registros = json.loads(_bitacora().a_json())
+    assert [r['estado'] for r in registros] == [OK, DESCUADRE, ERROR, SIN_VALIDAR]
+    assert registros[0]['agencia'] == 'Agencia Ñandú S.A.C.'
+    assert (registros[0]['altas'], registros[1]['filas_base']) == (3, 4)  # sin tipos de numpy
+    assert list(registros[0]) == ['agencia', 'clave', 'zona', 'altas', 'filas_base', 'estado', 'segundos_render',
+                                  'bytes_salida', 'archivo', 'detalle']
+
+
+def test_exportacion_csv():
+    datos = _bitacora().a_csv()
+    assert datos.startswith(codecs.BOM_UTF8)  # BOM para que Excel abra bien las tildes
+    filas = list(csv.DictReader(io.StringIO(datos.decode('utf-8-sig'))))
+    assert len(filas) == 4
+    assert filas[1] == {
+        'agencia': 'Agencia Dos', 'clave': 'AGENCIA DOS', 'zona': 'NORTE', 'altas': '5', 'filas_base': '4',
+        'estado': DESCUADRE, 'segundos_render': '0.2', 'bytes_salida': '2000', 'archivo': '', 'detalle': 'faltan 1',
+    }
+    assert filas[2]['altas'] == ''
+
+
+def test_ida_y_vuelta_por_dict():
+    original = _bitacora()
+    # Como en la caché de resultados: el dict pasa por JSON
+    copia = Bitacora.desde_dict(json.loads(json.dumps(original.a_dict())))
+    assert copia.lineas_log() == original.lineas_log()
+    assert copia.registros == [RegistroAgencia(**r) for r in original.registros_dict()]
+    assert copia.resumen() == original.resumen()
+    assert copia.a_csv() == original.a_csv()
+    assert copia.texto() == original.texto()
+    assert Bitacora.desde_dict({}).lineas_log() == []
@@ -0,0 +1,39 @@
+# tests/test_salida.py
+"""Carpeta destino de SalidaDirectorio: solo dentro de SEGMENTADOR_DESTINO."""
+import os
+
+import pytest
+
+from segmentador.salida import DestinoNoPermitido, SalidaDirectorio, resolver_destino
+
+
+def test_sin_raiz_no_se_escribe_en_carpetas(monkeypatch, tmp_path):
+    monkeypatch.delenv('SEGMENTADOR_DESTINO', raising=False)
+    with pytest.raises(DestinoNoPermitido):
+        resolver_destino(str(tmp_path))
+
+
+def test_destino_dentro_de_la_raiz(monkeypatch, tmp_path):
+    monkeypatch.setenv('SEGMENTADOR_DESTINO', str(tmp_path))
+    raiz = os.path.realpath(tmp_path)
+    assert resolver_destino(str(tmp_path)) == raiz
+    assert resolver_destino('periodo') == os.path.join(raiz, 'periodo')
+    assert resolver_destino(os.path.join(str(tmp_path), 'a', '..', 'b')) == os.path.join(raiz, 'b')
+
+
+@pytest.mark.parametrize('destino', ['/etc', '..', 'a/../../fuera'])
+def test_destino_fuera_de_la_raiz(monkeypatch, tmp_path, destino):
+    monkeypatch.setenv('SEGMENTADOR_DESTINO', str(tmp_path / 'raiz'))
+    with pytest.raises(DestinoNoPermitido):
+        resolver_destino(destino)
+    with pytest.raises(DestinoNoPermitido):
+        SalidaDirectorio(destino, 'Lima', 'LIMA')
+
+
+def test_enlace_simbolico_que_sale_de_la_raiz(monkeypatch, tmp_path):
+    raiz = tmp_path / 'raiz'
+    raiz.mkdir()
+    (raiz / 'enlace').symlink_to(tmp_path)
+    monkeypatch.setenv('SEGMENTADOR_DESTINO', str(raiz))
+    with pytest.raises(DestinoNoPermitido):
+        resolver_destino('enlace')
@@ -0,0 +1,145 @@
+# tests/test_sugerencias_alias.py
+"""Sugerencias de alias (segmentador/sugerencias_alias.py) y alias aceptados (segmentador/alias.py)."""
+import importlib
+import io
+import os
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from herramientas.sinteticos import CABECERAS_BASE, CABECERAS_CORTE_1
+from segmentador import alias, cache_base
+from segmentador.alias import ALIAS_LIMA, aceptar_alias, mapeo_alias, version_alias
+from segmentador.lima_corte_1 import procesar_archivos_excel
+from segmentador.registros import DESCUADRE, OK, Bitacora, RegistroAgencia
+from segmentador.sugerencias_alias import IndiceTrigramas, clave_comparacion, sugerir_alias
+
+
+@pytest.fixture(autouse=True)
+def _alias_en_tmp(tmp_path, monkeypatch):
+    """Los alias aceptados de cada prueba van a un JSON propio, nunca al del servidor."""
+    monkeypatch.setattr(alias, 'RUTA_ALIAS_ACEPTADOS', str(tmp_path / 'estado' / 'alias_aceptados.json'))
+    cache_base.vaciar()
+    yield
+    cache_base.vaciar()
+
+
+def test_clave_comparacion_sin_tildes_ni_forma_societaria():
+    assert clave_comparacion('Agencia Núñez S. A. C.') == 'AGENCIA NUNEZ'
+    assert clave_comparacion('Agencia Núñez S.A.C.', frozenset(['AGENCIA'])) == 'NUNEZ'
+
+
+def test_indice_ordena_por_puntaje():
+    indice = IndiceTrigramas(['COMERCIAL ANDINA SRL', 'COMERCIAL ANDINO', 'TELECOM DEL SUR', 'ANDINA'])
+    resultados = indice.buscar('Comercial Andina S.A.C.', limite=3)
+    assert [nombre for nombre, _ in resultados] == ['COMERCIAL ANDINA SRL', 'COMERCIAL ANDINO', 'ANDINA']
+    puntajes = [puntaje for _, puntaje in resultados]
+    assert puntajes == sorted(puntajes, reverse=True) and puntajes[0] == 1.0
+    assert indice.buscar('Comercial Andina S.A.C.', limite=1) == resultados[:1]
+
+
+def test_indice_sin_candidatos():
+    indice = IndiceTrigramas(['COMERCIAL ANDINA SRL', 'TELECOM DEL SUR'])
+    assert indice.buscar('XYZ QWV') == []
+    assert indice.buscar('COMERCIAL ANDINA', minimo=1.01) == []
+    assert IndiceTrigramas([]).buscar('COMERCIAL ANDINA') == []
+
+
+def _datos(asesores):
+    return {'base': pd.DataFrame({'ASESOR_NORMALIZADO': asesores})}
+
+
+def _bitacora(*registros):
+    bitacora = Bitacora()
+    for registro in registros:
+        bitacora.registrar(registro)
+    return bitacora
+
+
+def test_sugiere_solo_a_agencias_a_las_que_les_faltan_filas():
+    datos = _datos(['AGENCIA NUNEZ SAC'] * 2 + ['AGENCIA LOPEZ EIRL'])
+    bitacora = _bitacora(
+        RegistroAgencia('Agencia Núñez S.A.C.', clave='AGENCIA NÚÑEZ S.A.C.', altas=2, estado=DESCUADRE),
+        RegistroAgencia('Agencia López', clave='AGENCIA LOPEZ EIRL', altas=1, filas_base=1, estado=OK),
+    )
+    sugerencias = sugerir_alias(datos, bitacora, {})
+    assert [(s.clave, s.asesor, s.filas_asesor, s.faltan, s.cuadra) for s in sugerencias] == [
+        ('AGENCIA NÚÑEZ S.A.C.', 'AGENCIA NUNEZ SAC', 2, 2, True)]
+
+
+def test_sin_huerfanos_no_hay_sugerencias():
+    datos = _datos(['AGENCIA NUNEZ SAC'])
+    bitacora = _bitacora(RegistroAgencia('Núñez', clave='AGENCIA NUNEZ SAC', altas=3, filas_base=1,
+                                         estado=DESCUADRE))
+    assert sugerir_alias(datos, bitacora, {}) == []
+    assert sugerir_alias(_datos(['TELECOM DEL SUR']), bitacora, {}) == []
+
+
+def test_no_sugiere_asesores_tomados_por_otra_agencia():
+    datos = _datos(['AGENCIA NUNEZ SAC', 'AGENCIA NUNES SAC', 'AGENCIA NUNEZ SAC'])
+    bitacora = _bitacora(
+        RegistroAgencia('Núñez', clave='AGENCIA NÚÑEZ', altas=2, estado=DESCUADRE),
+        RegistroAgencia('Otra', clave='OTRA SAC', altas=2, filas_base=2, estado=OK),
+    )
+    libres = sugerir_alias(datos, bitacora, {})
+    assert [s.asesor for s in libres] == ['AGENCIA NUNEZ SAC', 'AGENCIA NUNES SAC']
+    # Con AGENCIA NUNEZ SAC como alias de OTRA SAC, solo queda el otro asesor
+    tomados = sugerir_alias(datos, bitacora, {'OTRA SAC': ['OTRA SAC', 'AGENCIA NUNEZ SAC']})
+    assert [s.asesor for s in tomados] == ['AGENCIA NUNES SAC']
+
+
+def test_alias_aceptado_entra_en_el_mapeo(tmp_path):
+    ruta = str(tmp_path / 'otra' / 'carpeta' / 'alias.json')
+    version = version_alias(ruta)
+    aceptar_alias(ALIAS_LIMA, 'EXPORTEL S.A.C.', ['EXPORTEL NORTE'], ruta=ruta)
+    aceptar_alias(ALIAS_LIMA, 'EXPORTEL S.A.C.', ['EXPORTEL NORTE'], ruta=ruta)
+    aceptar_alias(ALIAS_LIMA, 'NUEVA SAC', ['NUEVA'], ruta=ruta)
+    mapeo = mapeo_alias(ALIAS_LIMA, ruta=ruta)
+    assert mapeo['EXPORTEL S.A.C.'] == ['EXPORTEL S.A.C.', 'EXPORTEL PROVINCIA', 'EXPORTEL NORTE']
+    assert mapeo['NUEVA SAC'] == ['NUEVA SAC', 'NUEVA']
+    assert version_alias(ruta) != version
+    assert 'NUEVA SAC' not in mapeo_alias(ALIAS_LIMA)
+
+
+def test_ruta_por_defecto_fuera_del_repositorio(monkeypatch):
+    monkeypatch.delenv('SEGMENTADOR_ALIAS', raising=False)
+    ruta = importlib.reload(alias).RUTA_ALIAS_ACEPTADOS
+    repositorio = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert os.path.basename(os.path.dirname(ruta)) == 'segmentador_estado'
+    assert not os.path.abspath(ruta).startswith(repositorio + os.sep)
+
+
+# --- De la sugerencia a la siguiente corrida ---
+
+def _consolidado():
+    """Lima Corte 1: la agencia del reporte no coincide con el asesor de la BASE."""
+    libro = openpyxl.Workbook()
+    ws = libro.active
+    ws.title = 'Reporte CORTE 1'
+    ws.append(CABECERAS_CORTE_1)
+    ws.append([20100000001, 'Agencia Núñez S.A.C.', 100, 'A', 2, 50.5, 1000.0, 0.85, 'NO', 1.2, 10.0, 1.1, 1234.5])
+    ws.append([20100000002, 'AGENCIA LOPEZ', 100, 'A', 1, 50.5, 1000.0, 0.85, 'NO', 1.2, 10.0, 1.1, 1234.5])
+    base = libro.create_sheet('BASE')
+    base.append(CABECERAS_BASE)
+    for i, asesor in enumerate(['AGENCIA NUNEZ SAC', 'AGENCIA LOPEZ', 'AGENCIA NUNEZ SAC']):
+        base.append([f"P{i:04d}", asesor, 'LIMA', 'LIMA', '2026-01-01', 'FIBRA', 79.9, '40000000', 'SI', ''])
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def _estados(bitacora):
+    return {r.clave: (r.estado, r.filas_base) for r in bitacora.registros}
+
+
+def test_alias_aceptado_llega_a_la_siguiente_corrida():
+    archivo = _consolidado()
+    datos, bitacora = procesar_archivos_excel(io.BytesIO(archivo), solo_validar=True)
+    assert _estados(bitacora) == {'AGENCIA NÚÑEZ S.A.C.': (DESCUADRE, 0), 'AGENCIA LOPEZ': (OK, 1)}
+    sugerencias = sugerir_alias(datos, bitacora, mapeo_alias(ALIAS_LIMA))
+    assert [(s.clave, s.asesor) for s in sugerencias] == [('AGENCIA NÚÑEZ S.A.C.', 'AGENCIA NUNEZ SAC')]
+
+    aceptar_alias(ALIAS_LIMA, sugerencias[0].clave, [sugerencias[0].asesor])
+    _, bitacora = procesar_archivos_excel(io.BytesIO(archivo), solo_validar=True)
+    assert _estados(bitacora) == {'AGENCIA NÚÑEZ S.A.C.': (OK, 2), 'AGENCIA LOPEZ': (OK, 1)}
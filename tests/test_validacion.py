@@ -0,0 +1,78 @@
+# tests/test_validacion.py
+"""Validación en seco (`solo_validar=True`): no escribe nada y concilia igual que la corrida completa."""
+import importlib
+import io
+import zipfile
+
+import pytest
+
+from herramientas.sinteticos import PERFILES, generar
+from segmentador import cache_base
+from segmentador.api import TIPOS
+from segmentador.registros import DESCUADRE, OK
+from segmentador.salida import SalidaDirectorio, SalidaValidacion
+
+ZONA = 'NORTE'
+DESCUADRES = 2
+
+
+@pytest.fixture(scope='module')
+def consolidados(tmp_path_factory):
+    carpeta = tmp_path_factory.mktemp('consolidados')
+    rutas = {}
+    for perfil in PERFILES:
+        rutas[perfil] = carpeta / f"{perfil}.xlsx"
+        # Las primeras agencias quedan con una ALTA de más (y en Provincia, repartidas entre zonas)
+        generar(perfil, str(rutas[perfil]), filas=300, agencias=8, descuadres=DESCUADRES)
+    return rutas
+
+
+@pytest.fixture(autouse=True)
+def _sin_cache():
+    cache_base.vaciar()
+    yield
+    cache_base.vaciar()
+
+
+def _proceso(perfil):
+    _, funcion, pide_zona = TIPOS[perfil]
+    proceso = getattr(importlib.import_module(f"segmentador.{perfil}"), funcion)
+    return proceso, ((ZONA,) if pide_zona else ())
+
+
+def _estados(bitacora):
+    return {r.clave: (r.estado, r.altas, r.filas_base) for r in bitacora.registros}
+
+
+@pytest.mark.parametrize('perfil', PERFILES)
+def test_validacion_no_escribe_nada(consolidados, perfil, tmp_path, monkeypatch):
+    monkeypatch.setenv('SEGMENTADOR_DESTINO', str(tmp_path))
+    agregados = []
+    monkeypatch.setattr(SalidaValidacion, 'agregar', lambda self, *archivo: agregados.append(archivo))
+    proceso, zona = _proceso(perfil)
+    # Aunque se pase un destino en carpeta, la validación no lo usa
+    salida = SalidaDirectorio('compartida', TIPOS[perfil][0], ZONA)
+    datos, bitacora = proceso(io.BytesIO(consolidados[perfil].read_bytes()), *zona, salida, solo_validar=True,
+                              resumen=True)
+    assert isinstance(datos, dict) and 'base' in datos
+    assert agregados == []
+    assert list(tmp_path.iterdir()) == []
+    assert bitacora.registros
+    assert all(r.segundos_render == 0 and r.bytes_salida == 0 and not r.archivo for r in bitacora.registros)
+
+
+@pytest.mark.parametrize('perfil', PERFILES)
+def test_validacion_concilia_igual_que_la_corrida_completa(consolidados, perfil):
+    proceso, zona = _proceso(perfil)
+    archivo = consolidados[perfil].read_bytes()
+    datos, validacion = proceso(io.BytesIO(archivo), *zona, solo_validar=True)
+    cache_base.vaciar()
+    zip_memoria, completa = proceso(io.BytesIO(archivo), *zona)
+
+    assert _estados(validacion) == _estados(completa)
+    assert validacion.contar(DESCUADRE) > 0 and validacion.contar(OK) > 0
+    assert len(zipfile.ZipFile(zip_memoria).namelist()) == len(completa.registros)
+
+    # "Generar ahora": la corrida con los datos ya validados concilia igual
+    _, desde_datos = proceso(io.BytesIO(archivo), *zona, datos=datos)
+    assert _estados(desde_datos) == _estados(completa)
@@ -0,0 +1,100 @@
+# tests/test_xlsx_rapido.py
+"""Paridad del lector por streaming (segmentador/xlsx_rapido.py) con pd.read_excel."""
+import datetime
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+import xlsxwriter
+
+from segmentador import lectura, xlsx_rapido
+from segmentador.xlsx_rapido import FormatoNoSoportado, leer_excel
+
+CABECERA = ['RUC', 'AGENCIA', 'ALTAS', 'ARPU', 'FECHA', 'ACTIVO']
+FILAS = [
+    ['20100000001', 'AGENCIA 001 S.A.C.', 10, 35.5, datetime.datetime(2024, 5, 1), True],
+    ['20100000002', 'AGENCIA 002', 0, None, datetime.datetime(2024, 5, 2, 13, 30), False],
+    [None, 'AGENCIA 001 S.A.C.', 7, 12.0, None, None],
+    ['20100000004', '', 3, -1.25, datetime.datetime(1999, 12, 31), True],
+]
+
+
+def _libro_openpyxl():
+    libro = openpyxl.Workbook()
+    ws = libro.active
+    ws.title = 'BASE'
+    ws.append(CABECERA)
+    for fila in FILAS:
+        ws.append(fila)
+    ws.append([])  # fila vacía al final: ambos lectores la recortan
+    reporte = libro.create_sheet('Reporte')
+    reporte.append(['', '', 'CORTE 1', 'CORTE 1'])
+    reporte.append(['RUC', 'AGENCIA', 'ALTAS', 'TOTAL'])
+    reporte.append(['20100000001', 'AGENCIA 001', 5, 100.5])
+    reporte['A5'] = '20100000009'  # fila 4 ausente en el XML
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def _libro_xlsxwriter():
+    salida = io.BytesIO()
+    libro = xlsxwriter.Workbook(salida, {'in_memory': True})
+    ws = libro.add_worksheet('BASE')
+    fecha = libro.add_format({'num_format': 'dd/mm/yyyy'})
+    ws.write_row(0, 0, CABECERA)
+    for i, fila in enumerate(FILAS, start=1):
+        for j, valor in enumerate(fila):
+            if isinstance(valor, datetime.datetime):
+                ws.write_datetime(i, j, valor, fecha)
+            elif valor is not None:
+                ws.write(i, j, valor)
+    ws.write_formula(len(FILAS) + 1, 1, '="AGENCIA "&"005"', None, 'AGENCIA 005')
+    libro.add_worksheet('Reporte')
+    libro.close()
+    return salida.getvalue()
+
+
+LIBROS = {'openpyxl': _libro_openpyxl, 'xlsxwriter': _libro_xlsxwriter}
+ARGUMENTOS = [
+    {'sheet_name': 'BASE'},
+    {'sheet_name': 'BASE', 'dtype': str},
+    {'sheet_name': 0, 'nrows': 2},
+    {'sheet_name': 'BASE', 'usecols': ['AGENCIA', 'ALTAS'], 'dtype': str},
+    {'sheet_name': 'BASE', 'skiprows': [1], 'na_values': ['AGENCIA 002']},
+    {'sheet_name': 'BASE', 'header': None},
+    {'sheet_name': 'Reporte', 'header': [0, 1]},
+]
+
+
+@pytest.mark.parametrize('argumentos', ARGUMENTOS, ids=repr)
+@pytest.mark.parametrize('origen', sorted(LIBROS))
+def test_mismo_dataframe_que_read_excel(origen, argumentos):
+    if origen == 'xlsxwriter' and argumentos['sheet_name'] == 'Reporte':
+        pytest.skip("hoja vacía")
+    datos = LIBROS[origen]()
+    esperado = pd.read_excel(io.BytesIO(datos), engine='openpyxl', **argumentos)
+    pd.testing.assert_frame_equal(leer_excel(datos, **argumentos), esperado)
+
+
+def test_hoja_inexistente_falla_como_pandas():
+    datos = _libro_openpyxl()
+    with pytest.raises(ValueError):
+        pd.read_excel(io.BytesIO(datos), sheet_name='NO EXISTE')
+    with pytest.raises(ValueError):
+        leer_excel(datos, sheet_name='NO EXISTE')
+
+
+def test_no_xlsx_no_soportado():
+    with pytest.raises(FormatoNoSoportado):
+        leer_excel(b'esto no es un excel')
+
+
+def test_sin_lector_privado_de_pandas_usa_read_excel(monkeypatch):
+    monkeypatch.setattr(xlsx_rapido, 'OpenpyxlReader', None)
+    datos = _libro_openpyxl()
+    with pytest.raises(FormatoNoSoportado):
+        leer_excel(datos, sheet_name='BASE')
+    esperado = pd.read_excel(io.BytesIO(datos), sheet_name='BASE', dtype=str)
+    pd.testing.assert_frame_equal(lectura.leer_hoja(datos, sheet_name='BASE', dtype=str), esperado)
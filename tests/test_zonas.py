@@ -0,0 +1,125 @@
+# tests/test_zonas.py
+"""Filtro del reporte de Provincia por zona (segmentador/zonas.py) y agencias sin asesores."""
+import io
+import zipfile
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from herramientas.sinteticos import CABECERAS_BASE, CABECERAS_CORTE_1, CABECERAS_CORTE_2
+from segmentador import cache_base
+from segmentador.provincia_corte_1 import procesar_reportes_provincia
+from segmentador.provincia_corte_2 import procesar_provincia_corte_2
+from segmentador.registros import DESCUADRE
+from segmentador.sugerencias_alias import sugerir_alias
+from segmentador.zonas import agencias_sin_asesores, claves_con_asesores, departamento_de_agencia
+
+
+def test_departamento_de_agencia():
+    departamentos = ['PIURA', 'LA LIBERTAD', 'LIBERTAD']
+    assert departamento_de_agencia('AGENCIA X S.A.C. La Libertad', departamentos) == 'LA LIBERTAD'
+    assert departamento_de_agencia('AGENCIA X SAC', departamentos) is None
+    assert departamento_de_agencia(None, departamentos) is None
+
+
+def test_claves_con_asesores_incluye_principales_de_alias():
+    claves = claves_con_asesores({'AGENCIA UNO SAC', 'CUATRO ALIAS'},
+                                 {'AGENCIA CUATRO SAC': ['CUATRO ALIAS'], 'PRINCIPAL SAC': ['OTRO ALIAS']})
+    assert claves == {'AGENCIA UNO SAC', 'CUATRO ALIAS', 'AGENCIA CUATRO SAC'}
+
+
+def test_agencias_sin_asesores():
+    reporte = pd.DataFrame({
+        'AGENCIA': ['AGENCIA UNO SAC PIURA', 'AGENCIA DOS SAC PIURA', 'AGENCIA DOS SAC PIURA',
+                    'AGENCIA TRES SAC CUSCO', 'AGENCIA CUATRO SAC'],
+        'CLAVE': ['AGENCIA UNO SAC', 'AGENCIA DOS SAC', 'AGENCIA DOS SAC', 'AGENCIA TRES SAC', 'AGENCIA CUATRO SAC'],
+        'ALTAS': ['3', '2', '4', '1', '5'],
+    })
+    registros = agencias_sin_asesores(reporte, 'CLAVE', 'AGENCIA', 'ALTAS', {'AGENCIA UNO SAC'}, ['PIURA'], 'NORTE')
+    assert [(r.clave, r.altas, r.filas_base, r.estado, r.zona) for r in registros] == [
+        ('AGENCIA DOS SAC', 6, 0, DESCUADRE, 'NORTE')]
+    assert agencias_sin_asesores(reporte, 'CLAVE', 'AGENCIA', 'ALTAS', set(reporte['CLAVE']), ['PIURA'], 'NORTE') == []
+
+
+# --- Procesos de Provincia: las agencias sin asesores no se generan, solo se sugieren ---
+
+# (agencia en el reporte, departamento, asesor en la BASE, filas)
+AGENCIAS = [
+    ('AGENCIA 001 SAC', 'PIURA', 'AGENCIA 001 SAC', 3),
+    ('AGENCIA 002 SAC', 'PIURA', 'AGENCIA 002 SR', 2),        # asesor con otro nombre: sin asesores
+    ('AGENCIA 003 SAC', 'LAMBAYEQUE', 'AGENCIA 003 SAC', 1),
+    ('AGENCIA 004 SAC', 'CUSCO', 'AGENCIA 004 SAC', 2),       # otra zona
+    ('AGENCIA 005 SAC', 'ANCASH', None, 0),                   # NORTE por homologación, sin filas en la BASE
+]
+
+
+def _base():
+    filas = []
+    for agencia, departamento, asesor, cantidad in AGENCIAS:
+        zona = 'SUR' if departamento == 'CUSCO' else 'NORTE'
+        for i in range(cantidad):
+            filas.append([f"P{len(filas):04d}", asesor, zona, departamento, '2026-01-01', 'FIBRA', 79.9,
+                          '40000000', 'SI', ''])
+    return filas
+
+
+def _altas(agencia, cantidad):
+    return 4 if agencia == 'AGENCIA 002 SAC' else max(cantidad, 1)
+
+
+def _consolidado(corte_2):
+    libro = openpyxl.Workbook()
+    ws = libro.active
+    if corte_2:
+        ws.title = 'Reporte CORTE 2'
+        ws.append([n1 for n1, _ in CABECERAS_CORTE_2])
+        ws.append([n2 for _, n2 in CABECERAS_CORTE_2])
+        for i, (agencia, departamento, _, cantidad) in enumerate(AGENCIAS):
+            ws.append([20100000000 + i, f"{agencia} {departamento}", 100, 'A', _altas(agencia, cantidad), 0.85,
+                       0.045, 3, 1, -50.0, 0.9, 0.8, 1.0, -20.0, 900.0])
+    else:
+        ws.title = 'Reporte CORTE 1'
+        ws.append(CABECERAS_CORTE_1)
+        for i, (agencia, departamento, _, cantidad) in enumerate(AGENCIAS):
+            ws.append([20100000000 + i, f"{agencia} {departamento}", 100, 'A', _altas(agencia, cantidad), 50.5,
+                       1000.0, 0.85, 'NO', 1.2, 10.0, 1.1, 1234.5])
+    base = libro.create_sheet('BASE')
+    base.append(CABECERAS_BASE)
+    for fila in _base():
+        base.append(fila)
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def _sin_cache():
+    cache_base.vaciar()
+    yield
+    cache_base.vaciar()
+
+
+@pytest.mark.parametrize('proceso, corte_2', [(procesar_reportes_provincia, False), (procesar_provincia_corte_2, True)],
+                         ids=['corte_1', 'corte_2'])
+def test_sin_asesores_solo_para_sugerencias(proceso, corte_2):
+    datos_archivo = _consolidado(corte_2)
+    datos, bitacora = proceso(io.BytesIO(datos_archivo), 'NORTE', solo_validar=True)
+    assert datos is not None, bitacora.lineas_log()
+    # Se concilian y generan solo las agencias con asesores en la BASE de la zona
+    assert sorted(r.clave for r in bitacora.registros) == ['AGENCIA 001 SAC', 'AGENCIA 003 SAC']
+    # AGENCIA 005 (ANCASH) no tiene filas: en Corte 1 la zona sale de la columna ZONA de la BASE,
+    # no de la homologación de Corte 2, así que solo Corte 2 la reconoce como de la zona (con el
+    # departamento en la clave: el nombre solo se limpia con los departamentos que trae la BASE)
+    esperadas = ['AGENCIA 002 SAC', 'AGENCIA 005 SAC ANCASH'] if corte_2 else ['AGENCIA 002 SAC']
+    assert [r.clave for r in datos['sin_asesores']] == esperadas
+    assert datos['sin_asesores'][0].altas == 4
+    assert any('sin asesores en la BASE' in linea for linea in bitacora.lineas_log())
+
+    sugerencias = sugerir_alias(datos, bitacora, {})
+    assert [(s.clave, s.asesor, s.filas_asesor) for s in sugerencias] == [('AGENCIA 002 SAC', 'AGENCIA 002 SR', 2)]
+
+    zip_memoria, _ = proceso(io.BytesIO(datos_archivo), 'NORTE')
+    nombres = zipfile.ZipFile(zip_memoria).namelist()
+    assert not any('002' in n or '005' in n for n in nombres)
+    assert any('001' in n for n in nombres) and any('003' in n for n in nombres)